@@ -0,0 +1,43 @@
+"""v0.1.2.0 Indexes
+
+Revision ID: 5f0d7e2c9a41
+Revises: 34a151505735
+Create Date: 2026-10-18 09:12:03.418220+00:00
+
+"""
+# pylint: skip-file
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f0d7e2c9a41'
+down_revision = '34a151505735'
+branch_labels = None
+depends_on = None
+
+_GUILD_INDEXES = {
+    'ix_ticket_bots_guild_id': 'ticket_bots',
+    'ix_ticket_types_guild_id': 'ticket_types',
+    'ix_staff_roles_guild_id': 'staff_roles',
+    'ix_observer_roles_guild_id': 'observer_roles',
+    'ix_community_roles_guild_id': 'community_roles',
+    'ix_community_pings_guild_id': 'community_pings',
+}
+
+
+def upgrade() -> None:
+    # Built concurrently, so large tables stay writable while the bot runs.
+    with op.get_context().autocommit_block():
+        for name, table in _GUILD_INDEXES.items():
+            op.create_index(name, table, ['guild_id'], schema='tickets_plus', postgresql_concurrently=True)
+        op.create_index('ix_tickets_pending', 'tickets', ['guild_id', 'last_response'], schema='tickets_plus', postgresql_where=sa.text('notified = false'), postgresql_concurrently=True)
+        op.create_index('ix_members_status_till', 'members', ['status_till'], schema='tickets_plus', postgresql_where=sa.text('status <> 0'), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_members_status_till', table_name='members', schema='tickets_plus', postgresql_concurrently=True)
+        op.drop_index('ix_tickets_pending', table_name='tickets', schema='tickets_plus', postgresql_concurrently=True)
+        for name, table in _GUILD_INDEXES.items():
+            op.drop_index(name, table_name=table, schema='tickets_plus', postgresql_concurrently=True)
@@ -0,0 +1,24 @@
+"""Benchmarks for the database layer.
+
+Seeds a synthetic dataset of the given sizes, and times every
+`tickets_plus.database.layer.OnlineConfig` method against it,
+including the queries of the status and autoclose routines.
+Runs on SQLite and PostgreSQL. The results are written as JSON,
+and compared to a stored baseline, if there is one.
+
+Everything is done in a single transaction per size, which is rolled
+back at the end, so the database is left untouched. Still, to get
+comparable numbers, use a database of its own.
+
+Typical usage example:
+    $ python3 -m benchmarks --sizes 1000 100000
+    OR
+    $ poetry run bench --url sqlite+aiosqlite:///bench.db --save-baseline
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
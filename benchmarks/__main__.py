@@ -0,0 +1,165 @@
+"""Runs the database layer benchmarks.
+
+For every size, seeds the dataset, times the cases and rolls back.
+The results are written to a JSON file, and compared to the baseline
+of the same database dialect. Exits with status 1 if any case
+regressed by more than the threshold.
+Uses the database from the config, unless a URL is given.
+
+Typical usage example:
+    $ python3 -m benchmarks --sizes 1000 100000 1000000
+    OR
+    $ poetry run bench --url sqlite+aiosqlite:///bench.db --save-baseline
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import pathlib
+import platform
+import sys
+import time
+from typing import Any, Dict, List
+
+import discord
+import sqlalchemy
+from discord.ext import commands
+from sqlalchemy.ext import asyncio as sa_asyncio
+
+from benchmarks import datagen, suite
+from tickets_plus import bot
+from tickets_plus.database import models
+from tickets_plus.database.config import MiniConfig
+
+_PKG_DIR = pathlib.Path(__file__).parent.absolute()
+"""The directory of the benchmarks."""
+_SIZES = [1_000, 100_000, 1_000_000]
+"""The default dataset sizes."""
+
+
+async def _bench(engine: sa_asyncio.AsyncEngine, sizes: List[int], repeat: int) -> Dict[str, suite.Timings]:
+    """Seeds and times every size, rolling back after each.
+
+    Args:
+        engine: The engine to connect with.
+        sizes: The numbers of tickets and members to seed.
+        repeat: How many runs of each case are timed.
+
+    Returns:
+        Dict[str, suite.Timings]: The timings, keyed by size.
+    """
+    bot_instance = bot.TicketsPlusBot(db_engine=engine,
+                                      intents=discord.Intents.none(),
+                                      command_prefix=commands.when_mentioned)
+    results = {}
+    for size in sizes:
+        async with engine.connect() as conn:
+            trans = await conn.begin()
+            try:
+                if conn.dialect.name == "postgresql":
+                    await conn.execute(sqlalchemy.schema.CreateSchema("tickets_plus", if_not_exists=True))
+                await conn.run_sync(models.Base.metadata.create_all)
+                print(f"Seeding {size} rows...")
+                start = time.perf_counter()
+                dataset = await datagen.generate(conn, size)
+                print(f"Seeded in {time.perf_counter() - start:.1f}s, timing...")
+                bot_instance.sessions = sa_asyncio.async_sessionmaker(conn,
+                                                                      expire_on_commit=False,
+                                                                      join_transaction_mode="create_savepoint")
+                results[str(size)] = await suite.run(bot_instance, dataset, repeat)
+            finally:
+                await trans.rollback()
+    await engine.dispose()
+    return results
+
+
+def _load(path: pathlib.Path) -> Dict[str, Any]:
+    """Load a JSON file, if it exists.
+
+    Args:
+        path: The path of the file.
+
+    Returns:
+        Dict[str, Any]: The contents, or an empty dictionary.
+    """
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _dump(path: pathlib.Path, data: Dict[str, Any]) -> None:
+    """Write a JSON file.
+
+    Args:
+        path: The path of the file.
+        data: The contents.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+        file.write("\n")
+
+
+def main():
+    """Benchmarks the database layer, and checks for regressions.
+
+    Exits with status 1 if any case regressed.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the database layer on synthetic data.")
+    parser.add_argument("--url", default=None, help="Database URL to use instead of the configured one.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=_SIZES, help="Numbers of tickets and members to seed.")
+    parser.add_argument("--repeat", type=int, default=20, help="How many runs of each case are timed.")
+    parser.add_argument("--output", type=pathlib.Path, default=_PKG_DIR / "results.json", help="Where to write to.")
+    parser.add_argument("--baseline", type=pathlib.Path, default=_PKG_DIR / "baseline.json", help="Baseline to use.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, as a fraction.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+    url = sqlalchemy.make_url(args.url or MiniConfig().get_url())
+    if url.get_backend_name() == "sqlite":
+        # SQLite has no schemas.
+        engine = sa_asyncio.create_async_engine(url, execution_options={"schema_translate_map": {"tickets_plus": None}})
+    else:
+        engine = sa_asyncio.create_async_engine(url)
+    dialect = engine.dialect.name
+    results = asyncio.run(_bench(engine, args.sizes, args.repeat))
+    _dump(
+        args.output, {
+            "dialect": dialect,
+            "created": datetime.datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+            "results": results,
+        })
+    baseline = _load(args.baseline).get(dialect, {})
+    print(f"\n{'Size':>8} {'Case':<40} {'Median':>9} {'Baseline':>9}")
+    for size, timings in results.items():
+        for name, stats in timings.items():
+            known = baseline.get(size, {}).get(name)
+            shown = f"{known['median']:>7.2f}ms" if known else f"{'-':>9}"
+            print(f"{size:>8} {name:<40} {stats['median']:>7.2f}ms {shown}")
+    if args.save_baseline:
+        stored = _load(args.baseline)
+        stored[dialect] = {**stored.get(dialect, {}), **results}
+        _dump(args.baseline, stored)
+        print(f"Stored the {dialect} baseline in {args.baseline}.")
+        return
+    regressions = suite.compare(results, baseline, args.threshold)
+    if regressions:
+        for reg in regressions:
+            print(f"Regression at {reg.size} rows: {reg.name} {reg.baseline:.2f}ms -> {reg.median:.2f}ms")
+        sys.exit(1)
+    print("No regressions." if baseline else f"No {dialect} baseline to compare to.")
+
+
+if __name__ == "__main__":
+    main()
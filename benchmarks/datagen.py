@@ -0,0 +1,203 @@
+"""Synthetic data for the benchmarks.
+
+Generates guilds with tickets, tags, roles and penalized members,
+in a shape resembling a real deployment. The data is deterministic,
+so runs of the same size are comparable.
+
+Typical usage example:
+    ```py
+    from benchmarks import datagen
+    async with engine.begin() as conn:
+        dataset = await datagen.generate(conn, 100_000)
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import datetime
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple
+
+from sqlalchemy import sql
+from sqlalchemy.ext import asyncio as sa_asyncio
+
+from tickets_plus.database import models
+
+_ID_OFFSET = 10**15
+"""Offset for synthetic IDs, so they don't collide with real snowflakes."""
+_ROWS_PER_GUILD = 100
+"""How many tickets and members each synthetic guild gets."""
+_PER_GUILD = 5
+"""How many roles, pings, ticket bots, ticket types and tags each guild gets."""
+_CHUNK = 10_000
+"""How many rows are inserted per statement."""
+
+
+class Dataset(NamedTuple):
+    """A generated dataset, and IDs to look up in it.
+
+    The sample IDs all belong to the first guild,
+    which has a ticket, a member, roles, a ticket bot,
+    a ticket type and a tag.
+
+    Attributes:
+        rows: The number of tickets, and of members.
+        guilds: The number of guilds.
+        guild_id: The sample guild.
+        channel_id: A ticket in the sample guild.
+        thread_id: The staff notes thread of that ticket.
+        user_id: A member of the sample guild, who opened that ticket.
+        role_id: A role of the sample guild, in every role table.
+        bot_id: A ticket bot of the sample guild.
+        name: The prefix of a ticket type, and the name of a tag,
+            of the sample guild.
+    """
+
+    rows: int
+    guilds: int
+    guild_id: int
+    channel_id: int
+    thread_id: int
+    user_id: int
+    role_id: int
+    bot_id: int
+    name: str
+
+
+def _chunks(count: int, row: Callable[[int], Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    """Generate rows, a chunk at a time.
+
+    Args:
+        count: The number of rows.
+        row: Builds the row with the given number, starting at 1.
+
+    Yields:
+        List[Dict[str, Any]]: The next chunk of rows.
+    """
+    for start in range(1, count + 1, _CHUNK):
+        yield [row(num) for num in range(start, min(start + _CHUNK, count + 1))]
+
+
+async def _insert(conn: sa_asyncio.AsyncConnection, model: type[models.Base], count: int,
+                  row: Callable[[int], Dict[str, Any]]) -> None:
+    """Insert generated rows into a table.
+
+    Args:
+        conn: The connection to insert with.
+        model: The model of the table.
+        count: The number of rows.
+        row: Builds the row with the given number, starting at 1.
+    """
+    for chunk in _chunks(count, row):
+        await conn.execute(sql.insert(model), chunk)
+
+
+async def generate(conn: sa_asyncio.AsyncConnection, rows: int) -> Dataset:
+    """Seed a synthetic dataset.
+
+    Creates one guild per _ROWS_PER_GUILD rows, every tenth of them
+    with autoclose warnings enabled, the sample guild included.
+    Then creates the users, members and tickets. One percent of
+    the members are penalized, half of them with an expired penalty.
+    Two percent of the tickets are not notified yet, their last
+    responses are spread over three days, so some of them are due
+    for a warning.
+    Every guild gets a few roles, pings, ticket bots, ticket types
+    and tags. Nothing is committed.
+
+    Args:
+        conn: The connection to seed with.
+        rows: The number of tickets, and of members.
+
+    Returns:
+        Dataset: The sizes of the dataset, and sample IDs.
+    """
+    guilds = max(rows // _ROWS_PER_GUILD, 1)
+    now = datetime.datetime.utcnow()
+    hour = datetime.timedelta(hours=1)
+
+    # Row n belongs to the guild n % guilds, so n = guilds is in the first one.
+    def guild_of(num: int) -> int:
+        return _ID_OFFSET + 1 + num % guilds
+
+    # Every tenth guild from the first on, so tickets not notified yet are in them.
+    await _insert(conn, models.Guild, guilds, lambda num: {
+        "guild_id": _ID_OFFSET + num,
+        "warn_autoclose": hour * 24 if num % 10 == 1 else None,
+    })
+    for model in (models.StaffRole, models.ObserversRole, models.CommunityRole, models.CommunityPing):
+        await _insert(conn, model, guilds * _PER_GUILD, lambda num: {
+            "role_id": _ID_OFFSET + num,
+            "guild_id": guild_of(num)
+        })
+    await _insert(conn, models.TicketBot, guilds * _PER_GUILD, lambda num: {
+        "user_id": _ID_OFFSET + num,
+        "guild_id": guild_of(num)
+    })
+    await _insert(conn, models.TicketType, guilds * _PER_GUILD, lambda num: {
+        "prefix": str(num),
+        "guild_id": guild_of(num)
+    })
+    await _insert(conn, models.Tag, guilds * _PER_GUILD, lambda num: {
+        "tag_name": str(num),
+        "guild_id": guild_of(num),
+        "description": "Synthetic tag",
+    })
+    await _insert(conn, models.User, rows, lambda num: {"user_id": _ID_OFFSET + num})
+    await _insert(
+        conn, models.Member, rows, lambda num: {
+            "user_id": _ID_OFFSET + num,
+            "guild_id": guild_of(num),
+            "status": 1 if num % 100 == 0 else 0,
+            "status_till": (now - hour if num % 200 == 0 else now + hour * 24) if num % 100 == 0 else None,
+        })
+    await _insert(
+        conn, models.Ticket, rows, lambda num: {
+            "channel_id": _ID_OFFSET + num,
+            "guild_id": guild_of(num),
+            "user_id": _ID_OFFSET + num,
+            "staff_note_thread": _ID_OFFSET + rows + num,
+            "date_created": now - hour * (num % 72),
+            "last_response": now - hour * (num % 72),
+            "notified": num % 50 != 0,
+        })
+    return Dataset(rows=rows,
+                   guilds=guilds,
+                   guild_id=guild_of(guilds),
+                   channel_id=_ID_OFFSET + guilds,
+                   thread_id=_ID_OFFSET + rows + guilds,
+                   user_id=_ID_OFFSET + guilds,
+                   role_id=_ID_OFFSET + guilds,
+                   bot_id=_ID_OFFSET + guilds,
+                   name=str(guilds))
+
+
+def is_synthetic(column: sql.ColumnElement[int]) -> sql.ColumnElement[bool]:
+    """Filter for the generated rows.
+
+    Args:
+        column: An ID column, like a guild ID.
+
+    Returns:
+        sql.ColumnElement[bool]: True for the IDs used by generated rows.
+    """
+    return column >= _ID_OFFSET
+
+
+async def remove(conn: sa_asyncio.AsyncConnection) -> None:
+    """Delete the generated rows, if they were committed.
+
+    Rows referring to other rows are deleted first.
+    Nothing is committed.
+
+    Args:
+        conn: The connection to delete with.
+    """
+    for table in reversed(models.Base.metadata.sorted_tables):
+        column = table.c.get("guild_id", table.c.get("user_id"))
+        if column is not None:
+            await conn.execute(sql.delete(table).where(is_synthetic(column)))
@@ -0,0 +1,384 @@
+"""A stand-in for Discord, to run the bot without connecting to it.
+
+The gateway side builds synthetic event payloads, and feeds them to
+the bot's connection state, just like the websocket would. So the
+events are parsed, cached and dispatched to the loaded cogs as usual.
+The REST side replaces the bot's HTTP client requests. Every request
+is recorded, waits for a configurable latency, and gets a plausible
+response, without leaving the process.
+
+Typical usage example:
+    ```py
+    from benchmarks import fakediscord
+    rest = fakediscord.FakeREST(latency=0.05)
+    bot_instance = fakediscord.HarnessBot(db_engine=engine, ...)
+    gateway = fakediscord.FakeGateway(bot_instance, rest)
+    await gateway.connect()
+    gateway.add_guild(guild_id, channel_ids=[...], role_ids=[...])
+    await asyncio.gather(*gateway.dispatch(*gateway.member_join(guild_id, user_id)))
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import asyncio
+import collections
+import datetime
+import itertools
+import random
+from typing import Any, Callable, Dict, List, Tuple
+
+import discord
+from discord import http
+
+from tickets_plus import bot
+
+_BOT_ID = 3 * 10**15
+"""The user ID of the bot itself."""
+_SNOWFLAKES = 4 * 10**15
+"""Where the IDs of created channels, messages and log entries start."""
+_CHANNEL_CREATE = 10
+"""The audit log action type of created channels."""
+
+Event = Tuple[str, Dict[str, Any]]
+"""A gateway event, its name and its payload."""
+
+
+def _now() -> str:
+    """The current time, as Discord formats it.
+
+    Returns:
+        str: The time, in ISO 8601.
+    """
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _user(user_id: int, is_bot: bool = False) -> Dict[str, Any]:
+    """The payload of a user.
+
+    Args:
+        user_id: The ID of the user.
+        is_bot: Whether the user is a bot.
+
+    Returns:
+        Dict[str, Any]: The payload.
+    """
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id}",
+        "discriminator": "0",
+        "global_name": None,
+        "avatar": None,
+        "bot": is_bot,
+    }
+
+
+class HarnessBot(bot.TicketsPlusBot):
+    """The bot, keeping track of the event handlers it runs.
+
+    Attributes:
+        scheduled: The handler tasks started since it was last emptied.
+        errors: The number of handlers that raised.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Initialises the bot, without handlers.
+
+        Args:
+            *args: The arguments to pass to the superclass.
+            **kwargs: The keyword arguments to pass to the superclass.
+        """
+        super().__init__(*args, **kwargs)
+        self.scheduled: List[asyncio.Task] = []
+        self.errors = 0
+
+    def _schedule_event(self, coro: Callable[..., Any], event_name: str, *args: Any, **kwargs: Any) -> asyncio.Task:
+        task = super()._schedule_event(coro, event_name, *args, **kwargs)
+        self.scheduled.append(task)
+        return task
+
+    async def on_error(self, event_method: str, /, *args: Any, **kwargs: Any) -> None:
+        self.errors += 1
+        await super().on_error(event_method, *args, **kwargs)
+
+
+class FakeREST:
+    """Answers the REST requests of the bot, after a delay.
+
+    Attributes:
+        calls: The number of requests, keyed by method and route.
+        audit_log: The channel creation entries, keyed by guild ID.
+        channels: The payloads of the known channels, keyed by ID.
+    """
+
+    def __init__(self, latency: float, jitter: float = 0.0) -> None:
+        """Initialises the stand-in, without any requests.
+
+        Args:
+            latency: How long each request takes, in seconds.
+            jitter: How much the latency varies, in seconds, either way.
+        """
+        self._latency = latency
+        self._jitter = jitter
+        self._ids = itertools.count(_SNOWFLAKES)
+        self.calls: collections.Counter[str] = collections.Counter()
+        self.audit_log: Dict[int, List[Dict[str, Any]]] = collections.defaultdict(list)
+        self.channels: Dict[int, Dict[str, Any]] = {}
+        self._routes: Dict[Tuple[str, str], Callable[[http.Route, Dict[str, Any]], Any]] = {
+            ("GET", "/guilds/{guild_id}/audit-logs"): self._audit_logs,
+            ("PATCH", "/channels/{channel_id}"): self._edit_channel,
+            ("POST", "/channels/{channel_id}/messages"): self._send_message,
+        }
+
+    @property
+    def total(self) -> int:
+        """The number of requests made."""
+        return sum(self.calls.values())
+
+    def snowflake(self) -> int:
+        """Get a new, unique ID.
+
+        Returns:
+            int: The ID.
+        """
+        return next(self._ids)
+
+    async def request(self, route: http.Route, **kwargs: Any) -> Any:
+        """Record a request, and answer it once the latency passed.
+
+        Replaces `discord.http.HTTPClient.request`.
+        Requests without a known answer get an empty response,
+        like the 204 responses of Discord.
+
+        Args:
+            route: The route of the request.
+            **kwargs: The options of the request, like its JSON body.
+
+        Returns:
+            Any: The response, as decoded JSON.
+        """
+        self.calls[f"{route.method} {route.path}"] += 1
+        await asyncio.sleep(max(self._latency + random.uniform(-self._jitter, self._jitter), 0))
+        answer = self._routes.get((route.method, route.path))
+        return None if answer is None else answer(route, kwargs)
+
+    def _audit_logs(self, route: http.Route, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer an audit log fetch, newest entries first."""
+        entries = self.audit_log[int(route.guild_id or 0)]
+        limit = int(options.get("params", {}).get("limit", 100))
+        shown = entries[:-limit - 1:-1]
+        return {
+            "audit_log_entries": shown,
+            "users": [_user(int(entry["user_id"]), True) for entry in shown],
+        }
+
+    def _edit_channel(self, route: http.Route, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a channel edit, with the edited channel."""
+        channel = self.channels[int(route.channel_id or 0)]
+        channel.update(options.get("json") or {})
+        return channel
+
+    def _send_message(self, route: http.Route, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a sent message, with the message."""
+        body = options.get("json") or {}
+        return {
+            "id": str(self.snowflake()),
+            "channel_id": str(route.channel_id),
+            "author": _user(_BOT_ID, True),
+            "content": body.get("content") or "",
+            "timestamp": _now(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": body.get("embeds") or [],
+            "pinned": False,
+            "type": 0,
+        }
+
+
+class FakeGateway:
+    """Feeds synthetic events to the bot, as the gateway would."""
+
+    def __init__(self, bot_instance: HarnessBot, rest: FakeREST) -> None:
+        """Initialises the stand-in, and routes the bot's requests to the REST one.
+
+        Args:
+            bot_instance: The bot.
+            rest: Answers the requests of the bot.
+        """
+        self._bt = bot_instance
+        self._rest = rest
+        bot_instance.http.request = rest.request  # type: ignore
+
+    # pylint: disable=protected-access # We are the gateway.
+    async def connect(self) -> None:
+        """Prepare the bot, as if it logged in.
+
+        Must be called from a running event loop, before any events.
+        Doesn't run the setup hook of the bot, so load the cogs
+        and the ticket index yourself.
+        """
+        await self._bt._async_setup_hook()
+        self._bt._connection.user = discord.ClientUser(state=self._bt._connection, data=_user(_BOT_ID, True))
+
+    def add_guild(self, guild_id: int, channel_ids: List[int], role_ids: List[int]) -> None:
+        """Make the bot aware of a guild, as if it was in it already.
+
+        Args:
+            guild_id: The ID of the guild.
+            channel_ids: The IDs of its text channels.
+            role_ids: The IDs of its roles, besides the default one.
+        """
+        channels = [self._channel(guild_id, channel_id, f"channel-{channel_id}") for channel_id in channel_ids]
+        roles = [{
+            "id": str(role_id),
+            "name": f"role-{role_id}",
+            "color": 0,
+            "hoist": False,
+            "position": position,
+            "permissions": "0",
+            "managed": False,
+            "mentionable": False,
+        } for position, role_id in enumerate([guild_id, *role_ids])]
+        self._bt._connection._add_guild_from_data({  # type: ignore
+            "id": str(guild_id),
+            "name": f"guild-{guild_id}",
+            "owner_id": str(_BOT_ID),
+            "roles": roles,
+            "channels": channels,
+            "members": [],
+            "member_count": 1,
+            "emojis": [],
+            "stickers": [],
+            "features": [],
+            "threads": [],
+        })
+
+    def message(self, guild_id: int, channel_id: int, user_id: int, content: str = "Hello") -> Event:
+        """A message sent by a member.
+
+        Args:
+            guild_id: The ID of the guild.
+            channel_id: The ID of the channel.
+            user_id: The ID of the author.
+            content: The content of the message.
+
+        Returns:
+            Event: The MESSAGE_CREATE event.
+        """
+        return ("message_create", {
+            "id": str(self._rest.snowflake()),
+            "channel_id": str(channel_id),
+            "guild_id": str(guild_id),
+            "author": _user(user_id),
+            "member": {
+                "roles": [],
+                "joined_at": _now(),
+                "deaf": False,
+                "mute": False,
+                "flags": 0,
+            },
+            "content": content,
+            "timestamp": _now(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+        })
+
+    def channel_create(self, guild_id: int, creator_id: int, name: str) -> Event:
+        """A text channel created by a user, like a ticket bot.
+
+        The creation is added to the audit log of the guild.
+
+        Args:
+            guild_id: The ID of the guild.
+            creator_id: The ID of the user who created the channel.
+            name: The name of the channel.
+
+        Returns:
+            Event: The CHANNEL_CREATE event.
+        """
+        channel_id = self._rest.snowflake()
+        self._rest.audit_log[guild_id].append({
+            "id": str(self._rest.snowflake()),
+            "user_id": str(creator_id),
+            "target_id": str(channel_id),
+            "action_type": _CHANNEL_CREATE,
+            "changes": [],
+        })
+        return ("channel_create", self._channel(guild_id, channel_id, name))
+
+    @staticmethod
+    def member_join(guild_id: int, user_id: int) -> Event:
+        """A user joining a guild.
+
+        Args:
+            guild_id: The ID of the guild.
+            user_id: The ID of the user.
+
+        Returns:
+            Event: The GUILD_MEMBER_ADD event.
+        """
+        return ("guild_member_add", {
+            "guild_id": str(guild_id),
+            "user": _user(user_id),
+            "roles": [],
+            "joined_at": _now(),
+            "deaf": False,
+            "mute": False,
+            "flags": 0,
+        })
+
+    def dispatch(self, name: str, data: Dict[str, Any]) -> List[asyncio.Task]:
+        """Feed an event to the bot.
+
+        Args:
+            name: The name of the event, in lower case.
+            data: The payload of the event.
+
+        Returns:
+            List[asyncio.Task]: The handlers the event started.
+        """
+        self._bt.scheduled = []
+        getattr(self._bt._connection, f"parse_{name}")(data)
+        return self._bt.scheduled
+
+    def _channel(self, guild_id: int, channel_id: int, name: str) -> Dict[str, Any]:
+        """The payload of a text channel, which is kept for edits.
+
+        Args:
+            guild_id: The ID of the guild.
+            channel_id: The ID of the channel.
+            name: The name of the channel.
+
+        Returns:
+            Dict[str, Any]: The payload.
+        """
+        channel = {
+            "id": str(channel_id),
+            "type": 0,
+            "guild_id": str(guild_id),
+            "name": name,
+            "position": 0,
+            "permission_overwrites": [],
+            "nsfw": False,
+            "parent_id": None,
+            "topic": None,
+            "rate_limit_per_user": 0,
+        }
+        self._rest.channels[channel_id] = channel
+        return channel
@@ -0,0 +1,204 @@
+"""The benchmark cases, and how they are timed and compared.
+
+Every case is a call of an `OnlineConfig` method, with the sample IDs
+of a `datagen.Dataset`. Each run gets a fresh session, and the caches
+of the bot are emptied first, so the database is always hit.
+The session is rolled back after each run, so writes don't pile up.
+
+Typical usage example:
+    ```py
+    from benchmarks import suite
+    results = await suite.run(bot_instance, dataset, repeat=20)
+    regressions = suite.compare(results, baseline, threshold=0.25)
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import datetime
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple
+
+from benchmarks import datagen
+from tickets_plus import bot
+from tickets_plus.database import cache, layer
+
+_STATUS_CHUNK = 500
+"""How many expired statuses the status routine clears per query."""
+_NOISE_FLOOR = 0.5
+"""Slowdowns smaller than this many milliseconds are never regressions."""
+
+Timings = Dict[str, Dict[str, float]]
+"""The timings of the cases, in milliseconds, keyed by case and statistic."""
+
+
+class Case(NamedTuple):
+    """A timed call of the database layer.
+
+    Attributes:
+        name: The name of the case.
+        run: The call, given a session and the dataset.
+        check: Checks the result of the untimed run, if given.
+            So a broken query fails the run, instead of timing nothing.
+    """
+
+    name: str
+    run: Callable[[layer.OnlineConfig, datagen.Dataset], Awaitable[Any]]
+    check: Callable[[Any], bool] | None = None
+
+
+class Regression(NamedTuple):
+    """A case slower than in the baseline.
+
+    Attributes:
+        size: The size of the dataset.
+        name: The name of the case.
+        baseline: The baseline median, in milliseconds.
+        median: The current median, in milliseconds.
+    """
+
+    size: str
+    name: str
+    baseline: float
+    median: float
+
+
+CASES = [
+    Case("get_guild", lambda db, data: db.get_guild(data.guild_id)),
+    Case("get_user", lambda db, data: db.get_user(data.user_id)),
+    Case("fetch_member", lambda db, data: db.fetch_member(data.user_id, data.guild_id)),
+    Case("get_member", lambda db, data: db.get_member(data.user_id, data.guild_id)),
+    Case("get_status_deadlines", lambda db, data: db.get_status_deadlines()),
+    Case("get_ticket_bot", lambda db, data: db.get_ticket_bot(data.bot_id, data.guild_id)),
+    Case("check_ticket_bot", lambda db, data: db.check_ticket_bot(data.bot_id, data.guild_id)),
+    Case("get_ticket_bot_ids", lambda db, data: db.get_ticket_bot_ids(data.guild_id)),
+    Case("get_ticket_type", lambda db, data: db.get_ticket_type(data.guild_id, data.name)),
+    Case("get_ticket_types", lambda db, data: db.get_ticket_types(data.guild_id)),
+    Case("fetch_ticket", lambda db, data: db.fetch_ticket(data.channel_id)),
+    Case("fetch_ticket_record", lambda db, data: db.fetch_ticket_record(data.channel_id)),
+    Case("fetch_thread_record", lambda db, data: db.fetch_thread_record(data.thread_id)),
+    Case("update_ticket", lambda db, data: db.update_ticket(data.channel_id, notified=True)),
+    Case("set_notified", lambda db, data: db.set_notified([data.channel_id])),
+    Case("update_responses", lambda db, data: db.update_responses({data.channel_id: datetime.datetime.utcnow()})),
+    Case("get_ticket", lambda db, data: db.get_ticket(data.channel_id, data.guild_id, data.user_id)),
+    Case("load_ticket_index", lambda db, data: db.load_ticket_index()),
+    Case("get_warning_deadlines", lambda db, data: db.get_warning_deadlines()),
+    Case("fetch_tag", lambda db, data: db.fetch_tag(data.guild_id, data.name)),
+    Case("get_tag", lambda db, data: db.get_tag(data.guild_id, data.name, "Synthetic tag")),
+    Case("get_tags", lambda db, data: db.get_tags(data.guild_id)),
+    Case("get_staff_role", lambda db, data: db.get_staff_role(data.role_id, data.guild_id)),
+    Case("get_all_staff_roles", lambda db, data: db.get_all_staff_roles(data.guild_id)),
+    Case("get_staff_role_ids", lambda db, data: db.get_staff_role_ids(data.guild_id)),
+    Case("check_staff_role", lambda db, data: db.check_staff_role(data.role_id)),
+    Case("get_observers_role", lambda db, data: db.get_observers_role(data.role_id, data.guild_id)),
+    Case("get_all_observers_roles", lambda db, data: db.get_all_observers_roles(data.guild_id)),
+    Case("check_observers_role", lambda db, data: db.check_observers_role(data.role_id)),
+    Case("get_community_role", lambda db, data: db.get_community_role(data.role_id, data.guild_id)),
+    Case("get_all_community_roles", lambda db, data: db.get_all_community_roles(data.guild_id)),
+    Case("check_community_role", lambda db, data: db.check_community_role(data.role_id)),
+    Case("get_community_ping", lambda db, data: db.get_community_ping(data.role_id, data.guild_id)),
+    Case("get_all_community_pings", lambda db, data: db.get_all_community_pings(data.guild_id)),
+    Case("check_community_ping", lambda db, data: db.check_community_ping(data.role_id)),
+    # The queries of the routines, over the whole dataset
+    Case("routine: clear_expired_statuses", lambda db, data: db.clear_expired_statuses(_STATUS_CHUNK), bool),
+    Case("routine: get_pending_tickets", lambda db, data: db.get_pending_tickets(), bool),
+]
+"""The cases, in the order they are run."""
+
+
+def _reset_caches(bot_instance: bot.TicketsPlusBot) -> None:
+    """Empty the caches of the bot, so the next run hits the database.
+
+    Args:
+        bot_instance: The bot.
+    """
+    bot_instance.guild_cache.clear()
+    bot_instance.ticket_bot_cache.clear()
+    bot_instance.staff_role_cache.clear()
+    bot_instance.ticket_index = cache.TicketIndex(cache.GuildFeature.MSG_DISCOVERY)
+
+
+async def _time(bot_instance: bot.TicketsPlusBot, case: Case, dataset: datagen.Dataset, repeat: int) -> List[float]:
+    """Time the runs of a case.
+
+    Args:
+        bot_instance: The bot, with its sessions bound to the dataset.
+        case: The case.
+        dataset: The dataset.
+        repeat: How many runs are timed, after an untimed one.
+
+    Returns:
+        List[float]: The duration of each timed run, in milliseconds.
+
+    Raises:
+        RuntimeError: The case has a check, which its result failed.
+    """
+    durations = []
+    for num in range(repeat + 1):
+        _reset_caches(bot_instance)
+        async with bot_instance.get_connection() as db:
+            start = time.perf_counter()
+            result = await case.run(db, dataset)
+            if num:
+                durations.append((time.perf_counter() - start) * 1000)
+            elif case.check is not None and not case.check(result):
+                raise RuntimeError(f"Unexpected result of {case.name}: {result!r}")
+    return durations
+
+
+async def run(bot_instance: bot.TicketsPlusBot, dataset: datagen.Dataset, repeat: int) -> Timings:
+    """Time all cases.
+
+    The sessions of the bot must be bound to a connection
+    that can see the dataset, and must not commit to it.
+
+    Args:
+        bot_instance: The bot.
+        dataset: The dataset.
+        repeat: How many runs of each case are timed.
+
+    Returns:
+        Timings: The minimum, median and 95th percentile
+            duration of each case.
+    """
+    timings: Timings = {}
+    for case in CASES:
+        durations = sorted(await _time(bot_instance, case, dataset, repeat))
+        timings[case.name] = {
+            "min": durations[0],
+            "median": statistics.median(durations),
+            "p95": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+        }
+    return timings
+
+
+def compare(results: Dict[str, Timings], baseline: Dict[str, Timings], threshold: float) -> List[Regression]:
+    """Find the cases slower than in the baseline.
+
+    Medians are compared, and only cases and sizes
+    present in both are considered.
+
+    Args:
+        results: The timings, keyed by the size of the dataset.
+        baseline: The baseline timings, keyed the same way.
+        threshold: How much slower a case may be, as a fraction.
+
+    Returns:
+        List[Regression]: The regressed cases.
+    """
+    regressions = []
+    for size, timings in results.items():
+        for name, stats in timings.items():
+            known = baseline.get(size, {}).get(name)
+            if known is None:
+                continue
+            limit = max(known["median"] * (1 + threshold), known["median"] + _NOISE_FLOOR)
+            if stats["median"] > limit:
+                regressions.append(Regression(size, name, known["median"], stats["median"]))
+    return regressions
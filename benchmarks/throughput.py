@@ -0,0 +1,282 @@
+"""Measures how many gateway events the bot handles per second.
+
+Seeds a synthetic dataset and commits it, starts the bot against
+a `fakediscord` stand-in, and feeds it batches of events, a scenario
+at a time, with a bounded number of events in flight. Reports the
+events per second, the handler latency percentiles, and the REST
+requests per event of every scenario.
+
+Only the events cog is loaded. The routines run on timers,
+and would skew the numbers.
+
+The seeded rows are deleted at the end. On SQLite, a temporary
+database is used, unless a URL is given. SQLite serializes writes,
+getting or creating a row included, so use PostgreSQL for numbers
+comparable to production.
+
+Typical usage example:
+    $ python3 -m benchmarks.throughput --events 2000 --latency 50
+    OR
+    $ poetry run throughput --url postgresql+asyncpg://... --concurrency 100
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import pathlib
+import tempfile
+import time
+from typing import Any, Dict, List, NamedTuple
+
+import sqlalchemy
+from discord.ext import commands
+from sqlalchemy import sql
+from sqlalchemy.ext import asyncio as sa_asyncio
+
+from benchmarks import datagen, fakediscord
+from tickets_plus.database import config, const, models
+
+_AUTOCLOSE = datetime.timedelta(days=3)
+"""The autoclose time of the synthetic guilds, so messages update the topics."""
+
+
+class Result(NamedTuple):
+    """The measurements of a scenario.
+
+    Attributes:
+        name: The name of the scenario.
+        events: The number of events fed.
+        seconds: How long it took to handle all of them.
+        p50: The median handler latency, in milliseconds.
+        p99: The 99th percentile handler latency, in milliseconds.
+        rest_calls: The number of REST requests made.
+        errors: The number of handlers that raised.
+    """
+
+    name: str
+    events: int
+    seconds: float
+    p50: float
+    p99: float
+    rest_calls: int
+    errors: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the result, with the derived rates.
+
+        Returns:
+            Dict[str, Any]: The result, as a JSON serializable dictionary.
+        """
+        return {
+            **self._asdict(),
+            "events_per_second": self.events / self.seconds,
+            "rest_calls_per_event": self.rest_calls / self.events,
+        }
+
+
+async def _feed(gateway: fakediscord.FakeGateway, bot_instance: fakediscord.HarnessBot, rest: fakediscord.FakeREST,
+                name: str, events: List[fakediscord.Event], concurrency: int) -> Result:
+    """Feed events to the bot, and measure how it handles them.
+
+    Args:
+        gateway: The gateway to dispatch with.
+        bot_instance: The bot.
+        rest: The REST stand-in, to count the requests of.
+        name: The name of the scenario.
+        events: The events, in the order they are fed.
+        concurrency: How many events are handled at once, at most.
+
+    Returns:
+        Result: The measurements.
+    """
+    limiter = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def handle(event: fakediscord.Event) -> None:
+        async with limiter:
+            start = time.perf_counter()
+            await asyncio.gather(*gateway.dispatch(*event))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    calls, errors = rest.total, bot_instance.errors
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(event) for event in events))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return Result(name, len(events), seconds, latencies[len(latencies) // 2],
+                  latencies[min(len(latencies) - 1,
+                                int(len(latencies) * 0.99))], rest.total - calls, bot_instance.errors - errors)
+
+
+async def _prepare(conn: sa_asyncio.AsyncConnection, rows: int, gateway: fakediscord.FakeGateway,
+                   rest: fakediscord.FakeREST) -> Dict[int, int]:
+    """Seed the dataset, and make the bot aware of its guilds.
+
+    Every guild gets a general channel, and a support block role.
+    The guilds get an autoclose time, so messages in tickets
+    update the topics.
+
+    Args:
+        conn: The connection to seed with.
+        rows: The number of tickets, and of members.
+        gateway: The gateway to add the guilds to.
+        rest: The REST stand-in, for new IDs.
+
+    Returns:
+        Dict[int, int]: The general channel of each guild, keyed by guild ID.
+    """
+    await datagen.generate(conn, rows)
+    guild_ids = (await
+                 conn.scalars(sql.select(models.Guild.guild_id).where(datagen.is_synthetic(models.Guild.guild_id))
+                             )).all()
+    roles = {guild_id: rest.snowflake() for guild_id in guild_ids}
+    await conn.execute(
+        sql.update(models.Guild).where(models.Guild.guild_id == sql.bindparam("gid")).values(
+            support_block=sql.bindparam("role"), any_autoclose=_AUTOCLOSE), [{
+                "gid": guild_id,
+                "role": role_id
+            } for guild_id, role_id in roles.items()])
+    tickets: Dict[int, List[int]] = {guild_id: [] for guild_id in guild_ids}
+    for channel_id, guild_id in await conn.execute(
+            sql.select(models.Ticket.channel_id,
+                       models.Ticket.guild_id).where(datagen.is_synthetic(models.Ticket.guild_id))):
+        tickets[guild_id].append(channel_id)
+    general = {guild_id: rest.snowflake() for guild_id in guild_ids}
+    for guild_id in guild_ids:
+        gateway.add_guild(guild_id, [general[guild_id], *tickets[guild_id]], [roles[guild_id]])
+    return general
+
+
+async def _scenarios(conn: sa_asyncio.AsyncConnection, gateway: fakediscord.FakeGateway, general: Dict[int, int],
+                     count: int) -> Dict[str, List[fakediscord.Event]]:
+    """Build the events of every scenario.
+
+    Args:
+        conn: The connection to read the dataset with.
+        gateway: The gateway to build the events with.
+        general: The general channel of each guild, keyed by guild ID.
+        count: How many events each scenario gets.
+
+    Returns:
+        Dict[str, List[fakediscord.Event]]: The events, keyed by scenario.
+    """
+    members = (await conn.execute(
+        sql.select(models.Member.user_id, models.Member.guild_id).where(datagen.is_synthetic(
+            models.Member.guild_id)).order_by(models.Member.user_id).limit(count))).all()
+    tickets = (await conn.execute(
+        sql.select(models.Ticket.guild_id, models.Ticket.channel_id, models.Ticket.user_id).where(
+            datagen.is_synthetic(models.Ticket.guild_id)).order_by(models.Ticket.channel_id).limit(count))).all()
+    bots = dict((await conn.execute(
+        sql.select(models.TicketBot.guild_id, sql.func.min(models.TicketBot.user_id)).where(
+            datagen.is_synthetic(models.TicketBot.guild_id)).group_by(models.TicketBot.guild_id))).all())
+    guild_ids = list(bots)
+    return {
+        "on_message": [gateway.message(guild_id, general[guild_id], user_id) for user_id, guild_id in members],
+        "on_message (ticket)": [
+            gateway.message(guild_id, channel_id, user_id) for guild_id, channel_id, user_id in tickets
+        ],
+        "on_guild_channel_create (ticket)": [
+            gateway.channel_create(guild_ids[num % len(guild_ids)], bots[guild_ids[num % len(guild_ids)]],
+                                   f"ticket-{num}") for num in range(count)
+        ],
+        "on_member_join": [gateway.member_join(guild_id, user_id) for user_id, guild_id in members],
+    }
+
+
+async def throwaway(engine: sa_asyncio.AsyncEngine, rows: int, count: int, concurrency: int, latency: float,
+                    jitter: float) -> List[Result]:
+    """Runs everything that needs async.
+
+    This is a throwaway function to run the async stuff.
+    The seeded rows are always deleted.
+
+    Args:
+        engine: The engine to connect with.
+        rows: The number of tickets and members to seed.
+        count: How many events each scenario gets.
+        concurrency: How many events are handled at once, at most.
+        latency: How long each REST request takes, in seconds.
+        jitter: How much the latency varies, in seconds, either way.
+
+    Returns:
+        List[Result]: The measurements of every scenario.
+    """
+    rest = fakediscord.FakeREST(latency, jitter)
+    bot_instance = fakediscord.HarnessBot(db_engine=engine,
+                                          intents=const.INTENTS,
+                                          command_prefix=commands.when_mentioned,
+                                          chunk_guilds_at_startup=False)
+    gateway = fakediscord.FakeGateway(bot_instance, rest)
+    results = []
+    try:
+        async with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                await conn.execute(sqlalchemy.schema.CreateSchema("tickets_plus", if_not_exists=True))
+            await conn.run_sync(models.Base.metadata.create_all)
+            print(f"Seeding {rows} rows...")
+            general = await _prepare(conn, rows, gateway, rest)
+            scenarios = await _scenarios(conn, gateway, general, count)
+        await gateway.connect()
+        async with bot_instance.get_connection() as db:
+            await db.load_ticket_index()
+        await bot_instance.load_extension("tickets_plus.cogs.events")
+        for name, events in scenarios.items():
+            print(f"Feeding {len(events)} events: {name}...")
+            results.append(await _feed(gateway, bot_instance, rest, name, events, concurrency))
+    finally:
+        await bot_instance.jobs.close(config.RuntimeConfig().jobs_drain_timeout)
+        async with engine.begin() as conn:
+            await datagen.remove(conn)
+        await engine.dispose()
+    return results
+
+
+def main():
+    """Measures the event throughput of the bot, without Discord.
+
+    Prints the measurements, and optionally writes them as JSON.
+    """
+    parser = argparse.ArgumentParser(description="Measure the event throughput of the bot against a fake Discord.")
+    parser.add_argument("--url", default=None, help="Database URL, a temporary SQLite database by default.")
+    parser.add_argument("--rows", type=int, default=10_000, help="Number of tickets and members to seed.")
+    parser.add_argument("--events", type=int, default=1000, help="How many events each scenario gets.")
+    parser.add_argument("--concurrency", type=int, default=50, help="How many events are handled at once.")
+    parser.add_argument("--latency", type=float, default=50.0, help="Latency of the REST requests, in milliseconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="How much the latency varies, in milliseconds.")
+    parser.add_argument("--output", type=pathlib.Path, default=None, help="Where to write the JSON results to.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = sqlalchemy.make_url(args.url or f"sqlite+aiosqlite:///{tmp}/throughput.db")
+        if url.get_backend_name() == "sqlite":
+            # SQLite has no schemas.
+            engine = sa_asyncio.create_async_engine(url,
+                                                    execution_options={"schema_translate_map": {
+                                                        "tickets_plus": None
+                                                    }})
+        else:
+            engine = sa_asyncio.create_async_engine(url)
+        results = asyncio.run(
+            throwaway(engine, args.rows, args.events, args.concurrency, args.latency / 1000, args.jitter / 1000))
+    print(f"\n{'Scenario':<34} {'Events/s':>9} {'p50':>9} {'p99':>9} {'REST/event':>10} {'Errors':>6}")
+    for result in results:
+        stats = result.to_dict()
+        print(f"{result.name:<34} {stats['events_per_second']:>9.1f} {result.p50:>7.2f}ms {result.p99:>7.2f}ms"
+              f" {stats['rest_calls_per_event']:>10.3f} {result.errors:>6}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump([result.to_dict() for result in results], file, indent=2)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
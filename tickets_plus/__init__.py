@@ -42,6 +42,7 @@ from sqlalchemy.ext import asyncio as sa_asyncio
 from tickets_plus import bot
 from tickets_plus.api import routes
 from tickets_plus.database import config, const, models
+from tickets_plus.ext import metrics
 
 
 # pylint: disable=unused-argument
@@ -112,6 +113,7 @@ async def start_bot(stat_data: config.MiniConfig = config.MiniConfig()) -> None:
         logging.info("Creating engine...")
         if "asyncpg" in stat_data.getitem("dbtype"):
             engine = sa_asyncio.create_async_engine(stat_data.get_url(),
+                                                    poolclass=metrics.TimedQueuePool,
                                                     pool_size=10,
                                                     max_overflow=-1,
                                                     pool_recycle=600,
@@ -121,6 +123,7 @@ async def start_bot(stat_data: config.MiniConfig = config.MiniConfig()) -> None:
         else:
             engine = sa_asyncio.create_async_engine(
                 stat_data.get_url(),
+                poolclass=metrics.TimedQueuePool,
                 pool_size=10,
                 max_overflow=-1,
                 pool_recycle=600,
@@ -20,7 +20,10 @@ Typical usage example:
 # in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
 # If later approved by the Initial Contributor, GPL-3.0-or-later.
 
+import asyncio
 import json
+import logging
+from typing import Any, Dict, List, Set, Tuple
 
 import discord
 from sqlalchemy import orm
@@ -29,6 +32,41 @@ from tornado import web
 from tickets_plus import bot
 from tickets_plus.cogs import events
 from tickets_plus.database import models
+from tickets_plus.ext import metrics
+
+_MAX_BATCH = 1000
+"""The most ticket events accepted in a single batch."""
+_GUILD_OPTIONS = (
+    orm.selectinload(models.Guild.observers_roles),
+    orm.selectinload(models.Guild.community_roles),
+    orm.selectinload(models.Guild.community_pings),
+)
+"""The relationships loaded with a guild for ticket creation."""
+_RETRY_AFTER = 5
+"""Seconds the client should wait, when the job queue is full."""
+
+
+def _parse_ticket(args: Any) -> Tuple[int, int, int, bool]:
+    """Parse a ticket event.
+
+    Args:
+        args: The decoded JSON of the event.
+
+    Returns:
+        Tuple[int, int, int, bool]: The guild ID, the user ID,
+            the ticket channel ID, and whether it's a new ticket.
+
+    Raises:
+        ValueError: A parameter is invalid.
+        KeyError: A parameter is missing.
+        TypeError: The event is not an object.
+    """
+    return (
+        int(args["guild_id"]),
+        int(args["user_id"]),
+        int(args["ticket_channel_id"]),
+        bool(args["is_new_ticket"]),
+    )
 
 
 class BotHandler(web.RequestHandler):
@@ -64,6 +102,64 @@ class BotHandler(web.RequestHandler):
             "manifest-src 'none'")
         self.set_header("X-Content-Type-Options", "nosniff")
 
+    def _authorized(self) -> bool:
+        """Check the authentication token of the request.
+
+        Responds with an error if it's missing or invalid.
+
+        Returns:
+            bool: Whether the request is authorized.
+        """
+        if self.request.headers.get("ticketsplus-api-auth") is None:
+            self.set_status(401, "No authentication token provided.")
+            self.write({"error": "No authentication token provided."})
+            self.finish()
+            return False
+        if self.request.headers.get("ticketsplus-api-auth") != self._bt.stat_confg.getitem("auth_token"):
+            self.set_status(401, "Invalid authentication token.")
+            self.write({"error": "Invalid authentication token."})
+            self.finish()
+            return False
+        return True
+
+    async def _create_tickets(self, guild: discord.Guild, channels: List[Tuple[discord.TextChannel,
+                                                                               discord.User | None]]) -> None:
+        """Create the tickets of a guild, one after another.
+
+        Run as a background job, see `tickets_plus.ext.jobs`.
+        The tickets share a session, and the guild configuration
+        loaded in it. A failed ticket is logged,
+        and doesn't stop the others.
+
+        Args:
+            guild: The guild.
+            channels: The ticket channels, with the users who opened them.
+
+        Raises:
+            RuntimeError: Some of the tickets failed.
+        """
+        failed = 0
+        async with self._bt.get_connection() as db:
+            gld = await db.get_guild(guild.id, _GUILD_OPTIONS)
+            for channel, user in channels:
+                try:
+                    await events.Events.ticket_creation(self, db, (guild, gld), channel, user)
+                except Exception:  # pylint: disable=broad-exception-caught # skipcq: PYL-W0718
+                    logging.exception("Failed to create ticket %s.", channel.id)
+                    failed += 1
+                    # The rollback expires the configuration, load it again.
+                    await db.rollback()
+                    gld = await db.get_guild(guild.id, _GUILD_OPTIONS)
+        if failed:
+            raise RuntimeError(f"{failed} of {len(channels)} tickets failed.")
+
+    def _busy(self) -> None:
+        """Respond that the job queue is full."""
+        self.set_status(503, "Too many queued jobs.")
+        self.set_header("Retry-After", str(_RETRY_AFTER))
+        self.write({"error": "Too many queued jobs."})
+        self.finish()
+
     # pylint: disable=invalid-overridden-method
     async def prepare(self) -> None:
         """Prepare the handler.
@@ -75,15 +171,7 @@ class BotHandler(web.RequestHandler):
             self.write({"error": "No data provided."})
             self.finish()
             return
-        if self.request.headers.get("ticketsplus-api-auth") is None:
-            self.set_status(401, "No authentication token provided.")
-            self.write({"error": "No authentication token provided."})
-            self.finish()
-            return
-        if self.request.headers.get("ticketsplus-api-auth") != self._bt.stat_confg.getitem("auth_token"):
-            self.set_status(401, "Invalid authentication token.")
-            self.write({"error": "Invalid authentication token."})
-            self.finish()
+        if not self._authorized():
             return
         if self.request.headers.get("Content-Type") is None:
             self.set_status(400, "No Content-Type header provided.")
@@ -112,58 +200,220 @@ class TicketHandler(BotHandler):
         """Handle the request.
 
         Handle the request and create the ticket.
-        Parses the POST data.
+        Parses the POST data. The ticket is created by a background
+        job, the response has its ID, see `JobHandler`.
+        If too many jobs are queued, responds with a 503.
 
         Args:
             guild_id (str): The discord ID of the guild.
             user_id (str): The user ID of the user.
             ticket_channel_id (str): The ID of the channel
         """
+        try:
+            guild_id, user_id, ticket_channel_id, is_new_ticket = _parse_ticket(self.args)
+        except (ValueError, KeyError, TypeError):
+            self.set_status(400, "Missing or invalid parameters.")
+            self.write({"error": "Missing or invalid parameters."})
+            self.finish()
+            return
+        if not is_new_ticket:
+            self.set_status(202, "Not a new ticket.")
+            self.write({"notice": "Not a new ticket."})
+            self.finish()
+            return
+        guild = self._bt.get_guild(guild_id)
+        if guild is None:
+            self.set_status(404, "Guild not found.")
+            self.write({"error": "Guild not found."})
+            self.finish()
+            return
         async with self._bt.get_connection() as db:
+            # Served from the guild cache, the job loads the rest.
+            gld = await db.fetch_guild(guild_id)
+            integrated = gld is not None and gld.integrated
+        if not integrated:
+            self.set_status(409, "Guild not integrated.")
+            self.write({"error": "Guild not integrated."})
+            self.finish()
+            return
+        channel = guild.get_channel(ticket_channel_id)
+        if channel is None or not isinstance(channel, discord.TextChannel):
+            self.set_status(404, "Channel not found.")
+            self.write({"error": "Channel not found."})
+            self.finish()
+            return
+        user = self._bt.get_user(user_id)
+        try:
+            job = self._bt.jobs.submit(f"Ticket {channel.id}", self._create_tickets, guild, [(channel, user)])
+        except asyncio.QueueFull:
+            self._busy()
+            return
+        self.set_status(200, "OK")
+        self.finish({"job_id": job.job_id})
+
+
+class BatchHandler(BotHandler):
+    """Handles integration-based ticket creation, in batches.
+
+    The batch version of `TicketHandler`, for replaying a backlog
+    of ticket events. Takes a JSON array of the events
+    `TicketHandler` takes. The events are grouped by guild,
+    and the configuration of each guild is loaded once.
+    """
+
+    async def post(self) -> None:
+        """Handle the request.
+
+        Checks all events, and responds with a result per event,
+        in the order of the events. Each result has the status code
+        `TicketHandler` would have responded with, and an error,
+        a notice or the ID of the job creating the ticket.
+        The tickets of a guild are created by a single background job,
+        one at a time. Guilds that don't fit in the job queue
+        get a 503.
+
+        Args:
+            events (list): The ticket events.
+                See `TicketHandler.post` for the parameters of each event.
+        """
+        if not isinstance(self.args, list):
+            self.set_status(400, "Expected an array of ticket events.")
+            self.write({"error": "Expected an array of ticket events."})
+            self.finish()
+            return
+        if len(self.args) > _MAX_BATCH:
+            self.set_status(413, "Too many ticket events.")
+            self.write({"error": f"At most {_MAX_BATCH} ticket events per batch."})
+            self.finish()
+            return
+        results: List[Dict[str, Any]] = [{"status": 200} for _ in self.args]
+        # Ticket events by guild ID, as (index, user ID, channel ID).
+        by_guild: Dict[int, List[Tuple[int, int, int]]] = {}
+        seen: Set[int] = set()
+        for index, args in enumerate(self.args):
             try:
-                guild_id = int(self.args["guild_id"])
-                user_id = int(self.args["user_id"])
-                ticket_channel_id = int(self.args["ticket_channel_id"])
-                is_new_ticket = bool(self.args["is_new_ticket"])
-            except (ValueError, KeyError):
-                self.set_status(400, "Missing or invalid parameters.")
-                self.write({"error": "Missing or invalid parameters."})
-                self.finish()
-                return
+                guild_id, user_id, ticket_channel_id, is_new_ticket = _parse_ticket(args)
+            except (ValueError, KeyError, TypeError):
+                results[index] = {"status": 400, "error": "Missing or invalid parameters."}
+                continue
             if not is_new_ticket:
-                self.set_status(202, "Not a new ticket.")
-                self.write({"notice": "Not a new ticket."})
-                self.finish()
-                return
+                results[index] = {"status": 202, "notice": "Not a new ticket."}
+                continue
+            if ticket_channel_id in seen:
+                results[index] = {"status": 202, "notice": "Duplicate ticket event."}
+                continue
+            seen.add(ticket_channel_id)
+            by_guild.setdefault(guild_id, []).append((index, user_id, ticket_channel_id))
+        accepted: List[Tuple[discord.Guild, List[Tuple[int, discord.TextChannel, discord.User | None]]]] = []
+        for guild_id, tickets in by_guild.items():
             guild = self._bt.get_guild(guild_id)
             if guild is None:
-                self.set_status(404, "Guild not found.")
-                self.write({"error": "Guild not found."})
-                self.finish()
-                return
-            gld = await db.get_guild(
-                guild_id,
-                (
-                    orm.selectinload(models.Guild.observers_roles),
-                    orm.selectinload(models.Guild.community_roles),
-                    orm.selectinload(models.Guild.community_pings),
-                ),
-            )
-            if not gld.integrated:
-                self.set_status(409, "Guild not integrated.")
-                self.write({"error": "Guild not integrated."})
-                self.finish()
-                return
-            channel = guild.get_channel(ticket_channel_id)
-            if channel is None or not isinstance(channel, discord.TextChannel):
-                self.set_status(404, "Channel not found.")
-                self.write({"error": "Channel not found."})
-                self.finish()
-                return
-            user = self._bt.get_user(user_id)
-            self.set_status(200, "OK")
+                for index, _, _ in tickets:
+                    results[index] = {"status": 404, "error": "Guild not found."}
+                continue
+            channels = []
+            for index, user_id, ticket_channel_id in tickets:
+                channel = guild.get_channel(ticket_channel_id)
+                if channel is None or not isinstance(channel, discord.TextChannel):
+                    results[index] = {"status": 404, "error": "Channel not found."}
+                    continue
+                channels.append((index, channel, self._bt.get_user(user_id)))
+            if channels:
+                accepted.append((guild, channels))
+        async with self._bt.get_connection() as db:
+            # Served from the guild cache, the jobs load the rest.
+            integrated = {}
+            for guild, _ in accepted:
+                gld = await db.fetch_guild(guild.id)
+                integrated[guild.id] = gld is not None and gld.integrated
+        busy = False
+        for guild, channels in accepted:
+            if not integrated[guild.id]:
+                for index, _, _ in channels:
+                    results[index] = {"status": 409, "error": "Guild not integrated."}
+                continue
+            try:
+                job = self._bt.jobs.submit(f"Batch of {len(channels)} tickets in {guild.id}", self._create_tickets,
+                                           guild, [(chan, user) for _, chan, user in channels])
+            except asyncio.QueueFull:
+                busy = True
+                for index, _, _ in channels:
+                    results[index] = {"status": 503, "error": "Too many queued jobs."}
+                continue
+            for index, _, _ in channels:
+                results[index]["job_id"] = job.job_id
+        if busy:
+            self.set_header("Retry-After", str(_RETRY_AFTER))
+        self.set_status(200, "OK")
+        self.finish({"results": results})
+
+
+class StatusHandler(BotHandler):
+    """Base for the handlers reporting on the bot.
+
+    Those only answer GET requests, and expect no data.
+    They still require the authentication token.
+    """
+
+    def initialize(self, bot_instance: bot.TicketsPlusBot) -> None:
+        """Initialize the handler.
+
+        Initialize the handler with the bot object.
+
+        Args:
+            bot_instance: The bot object.
+        """
+        super().initialize(bot_instance)
+        self.SUPPORTED_METHODS = ("GET",)  # pylint: disable=invalid-name
+
+    # pylint: disable=invalid-overridden-method
+    async def prepare(self) -> None:
+        """Prepare the handler.
+
+        Check if the request is authorized.
+        """
+        self._authorized()
+
+
+class JobHandler(StatusHandler):
+    """Reports the status of background jobs.
+
+    The ticket handlers respond with the ID of the job
+    that creates the tickets. This handler looks those up.
+    """
+
+    async def get(self, job_id: str) -> None:
+        """Handle the request.
+
+        Responds with the job, see `tickets_plus.ext.jobs.Job.to_dict`.
+
+        Args:
+            job_id: The ID of the job, from the path.
+        """
+        job = self._bt.jobs.get(job_id)
+        if job is None:
+            self.set_status(404, "Job not found.")
+            self.write({"error": "Job not found."})
             self.finish()
-            await events.Events.ticket_creation(self, db, (guild, gld), channel, user)
+            return
+        self.set_status(200, "OK")
+        self.finish(job.to_dict())
+
+
+class MetricsHandler(StatusHandler):
+    """Exposes the metrics of the bot.
+
+    In the Prometheus text format, see `tickets_plus.ext.metrics`.
+    """
+
+    async def get(self) -> None:
+        """Handle the request.
+
+        Responds with all metrics.
+        """
+        self.set_header("Content-Type", metrics.CONTENT_TYPE)
+        self.set_status(200, "OK")
+        self.finish(metrics.REGISTRY.render())
 
 
 class OverrideHandler(BotHandler):
@@ -39,6 +39,9 @@ def make_app(bot_instance: bot.TicketsPlusBot) -> web.Application:
     data = {"bot_instance": bot_instance}
     routes = [
         (r"/", handlers.TicketHandler, data),
+        (r"/batch", handlers.BatchHandler, data),
         (r"/override", handlers.OverrideHandler, data),
+        (r"/jobs/([0-9a-f]{32})", handlers.JobHandler, data),
+        (r"/metrics", handlers.MetricsHandler, data),
     ]
     return web.Application(routes)
@@ -18,14 +18,48 @@ Typical usage example:
 # in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
 # If later approved by the Initial Contributor, GPL-3.0-or-later.
 
+import asyncio
 import logging
+import math
+import time
+from typing import Callable, FrozenSet, Tuple
 
 import discord
+import sqlalchemy
+from discord import app_commands
 from discord.ext import commands
 from sqlalchemy.ext import asyncio as sa_asyncio
 
 from tickets_plus import cogs
-from tickets_plus.database import config, const, layer
+from tickets_plus.database import cache, config, const, layer
+from tickets_plus.ext import discovery, jobs, metrics, querylog, scheduler, topics
+
+
+class TicketsPlusTree(app_commands.CommandTree):
+    """The command tree of Tickets+.
+
+    Runs each slash command as a `tickets_plus.ext.querylog` operation,
+    so the statements it issues are attributed to it.
+    """
+
+    async def interaction_check(self, interaction: discord.Interaction, /) -> bool:
+        """Starts the operation of a slash command.
+
+        Called in the task running the command,
+        the operation is finished once the task is done.
+
+        Args:
+            interaction: The interaction of the command.
+
+        Returns:
+            bool: Always True, the command may run.
+        """
+        name = f"/{interaction.command.qualified_name}" if interaction.command else "interaction"
+        operation = querylog.begin(name)
+        task = asyncio.current_task()
+        if task is not None:
+            task.add_done_callback(lambda _: operation.finish())
+        return True
 
 
 class TicketsPlusBot(commands.AutoShardedBot):
@@ -39,10 +73,43 @@ class TicketsPlusBot(commands.AutoShardedBot):
     Attributes:
         stat_confg: The config for the bot.
         sessions: The database session maker.
+        guild_cache: The per-process cache of guild configurations.
+            Used by `tickets_plus.database.layer.OnlineConfig.get_guild`.
+        ticket_bot_cache: The per-process cache of ticket bot IDs,
+            keyed by guild ID.
+            Used by `tickets_plus.database.layer.OnlineConfig.get_ticket_bot_ids`.
+        staff_role_cache: The per-process cache of staff role IDs,
+            keyed by guild ID.
+            Used by `tickets_plus.database.layer.OnlineConfig.get_staff_role_ids`.
+        discovery: The message discovery engine.
+            Used by `tickets_plus.cogs.events.Events.message_discovery`.
+        ticket_index: The index of ticket channels and guild features.
+            Used to skip the database for messages that don't need it.
+        response_buffer: The ticket response times not yet written.
+            Flushed by `flush_responses`.
+        status_deadlines: The status expiry times of members,
+            keyed by user ID and guild ID.
+            Used by the status cleanup routine.
+        warning_deadlines: The times at which ticket users should be
+            warned about the ticket closing, keyed by channel ID.
+            Used by the ticket warning routine.
+        topic_writer: The channel topics not yet written.
+            Written by the topic routine.
+        jobs: The background jobs, submitted by the API.
     """
 
     stat_confg: config.MiniConfig
     sessions: sa_asyncio.async_sessionmaker
+    guild_cache: cache.LRUCache[int, dict]
+    ticket_bot_cache: cache.LRUCache[int, FrozenSet[int]]
+    staff_role_cache: cache.LRUCache[int, FrozenSet[int]]
+    discovery: discovery.MessageDiscovery
+    ticket_index: cache.TicketIndex
+    response_buffer: cache.ResponseBuffer
+    status_deadlines: scheduler.DeadlineScheduler[Tuple[int, int]]
+    warning_deadlines: scheduler.DeadlineScheduler[int]
+    topic_writer: topics.TopicWriter
+    jobs: jobs.JobQueue
 
     def __init__(self,
                  *args,
@@ -53,6 +120,10 @@ class TicketsPlusBot(commands.AutoShardedBot):
 
         This function is used to initialize the bot instance.
         We create prep some stuff for the bot to use.
+        The REST requests and the database engine are instrumented,
+        see `tickets_plus.ext.metrics`.
+        Requests that would wait longer than `timeout_ratelimit` on
+        a rate limit raise `discord.RateLimited`, instead of sleeping.
 
         Args:
             *args: The arguments to pass to the superclass.
@@ -61,10 +132,35 @@ class TicketsPlusBot(commands.AutoShardedBot):
                 Defaults to `tickets_plus.statvars.MiniConfig`.
             **kwargs: The keyword arguments to pass to the superclass.
         """
+        rt_cnfg = config.RuntimeConfig()
+        kwargs.setdefault("http_trace", metrics.http_trace())
+        kwargs.setdefault("max_ratelimit_timeout", rt_cnfg.timeout_ratelimit)
+        kwargs.setdefault("tree_cls", TicketsPlusTree)
         super().__init__(*args, **kwargs)
         self._db_engine = db_engine
+        # Removed again in close, the registry outlives the bot.
+        self._collectors: Tuple[Callable[[], None], ...] = (metrics.pool_collector(db_engine), self._collect_metrics)
+        for collector in self._collectors:
+            metrics.REGISTRY.add_collector(collector)
         self.stat_confg = confg
         self.sessions = sa_asyncio.async_sessionmaker(self._db_engine, expire_on_commit=False)
+        querylog.instrument_engine(db_engine, rt_cnfg.querylog_slow, rt_cnfg.querylog_max_statements,
+                                   rt_cnfg.querylog_explain)
+        self.guild_cache = cache.LRUCache(rt_cnfg.cache_guilds, rt_cnfg.cache_ttl)
+        self.ticket_bot_cache = cache.LRUCache(rt_cnfg.cache_ticket_bots, rt_cnfg.cache_ttl)
+        self.staff_role_cache = cache.LRUCache(rt_cnfg.cache_staff_roles, rt_cnfg.cache_ttl)
+        self.discovery = discovery.MessageDiscovery(self, rt_cnfg.discovery_cache_size, rt_cnfg.discovery_ttl,
+                                                    rt_cnfg.discovery_max_links)
+        self._owner_ids: FrozenSet[int] | None = None
+        self._owners_expire = 0.0
+        self._owners_lock = asyncio.Lock()
+        # New guilds have message discovery enabled by default.
+        self.ticket_index = cache.TicketIndex(cache.GuildFeature.MSG_DISCOVERY)
+        self.response_buffer = cache.ResponseBuffer()
+        self.status_deadlines = scheduler.DeadlineScheduler()
+        self.warning_deadlines = scheduler.DeadlineScheduler()
+        self.topic_writer = topics.TopicWriter()
+        self.jobs = jobs.JobQueue(rt_cnfg.jobs_workers, rt_cnfg.jobs_depth, rt_cnfg.jobs_history)
 
     async def setup_hook(self) -> None:
         """Runs just before the bot connects to Discord.
@@ -75,6 +171,11 @@ class TicketsPlusBot(commands.AutoShardedBot):
         """
         logging.info("Bot version: %s", const.VERSION)
         logging.info("Discord.py version: %s", discord.__version__)
+        logging.info("Loading ticket index...")
+        async with self.get_connection() as conn:
+            await conn.load_ticket_index()
+        logging.info("Indexed %i tickets.", len(self.ticket_index))
+        self.jobs.start()
         logging.info("Loading cogs...")
         for extension in cogs.EXTENSIONS:
             try:
@@ -83,6 +184,24 @@ class TicketsPlusBot(commands.AutoShardedBot):
                 logging.error("Failed to load cog %s: %s", extension, err)
         logging.info("Finished loading cogs.")
 
+    def _collect_metrics(self) -> None:
+        """Copies the statistics the bot keeps into the metrics.
+
+        Registered as a collector, see `tickets_plus.ext.metrics`.
+        """
+        for shard_id, latency in self.latencies:
+            if not math.isnan(latency):
+                metrics.GATEWAY_LATENCY_SECONDS.set(latency, str(shard_id))
+        metrics.DISCOVERY_LOOKUPS.set(self.discovery.cache_hits, "cache")
+        metrics.DISCOVERY_LOOKUPS.set(self.discovery.local_hits, "local")
+        metrics.DISCOVERY_LOOKUPS.set(self.discovery.rest_calls, "rest")
+        metrics.JOBS.set(len(self.jobs), "queued")
+        metrics.JOBS.set(self.jobs.running, "running")
+        metrics.JOBS_FINISHED.set(self.jobs.succeeded, "succeeded")
+        metrics.JOBS_FINISHED.set(self.jobs.failed, "failed")
+        metrics.JOBS_FINISHED.set(self.jobs.rejected, "rejected")
+        metrics.JOBS_FINISHED.set(self.jobs.cancelled, "cancelled")
+
     def get_connection(self) -> layer.OnlineConfig:
         """Gets a connection from the database pool.
 
@@ -97,12 +216,66 @@ class TicketsPlusBot(commands.AutoShardedBot):
         """
         return layer.OnlineConfig(self, self.sessions())
 
+    async def get_owner_ids(self) -> FrozenSet[int]:
+        """Gets the IDs of the users who own the bot.
+
+        That is the application owner, and the members of the team
+        owning the application, if any. Fetching the application info
+        is a request to Discord, so the IDs are cached
+        for `cache_owners_ttl` seconds.
+
+        Returns:
+            FrozenSet[int]: The user IDs of the owners.
+        """
+        if self._owner_ids is not None and time.monotonic() < self._owners_expire:
+            return self._owner_ids
+        async with self._owners_lock:
+            # Someone else may have refreshed it while we waited.
+            if self._owner_ids is None or time.monotonic() >= self._owners_expire:
+                app = await self.application_info()
+                owners = {app.owner.id}
+                if app.team:
+                    owners.update(member.id for member in app.team.members)
+                self._owner_ids = frozenset(owners)
+                self._owners_expire = time.monotonic() + config.RuntimeConfig().cache_owners_ttl
+            return self._owner_ids
+
+    async def flush_responses(self) -> None:
+        """Writes the buffered ticket responses to the database.
+
+        All pending response times are written in one transaction.
+        If that fails, they are put back into the buffer,
+        so they are retried on the next flush.
+        """
+        pending = self.response_buffer.drain()
+        if not pending:
+            return
+        try:
+            async with self.get_connection() as conn:
+                await conn.update_responses(pending)
+                await conn.commit()
+        except BaseException:
+            self.response_buffer.restore(pending)
+            raise
+        logging.debug("Flushed %i ticket responses.", len(pending))
+
     async def close(self) -> None:
         """Closes the bot.
 
         This function is used to close the bot.
-        We additionally clean up the database engine/pool.
+        We additionally stop the background jobs, waiting for the
+        running ones for `jobs_drain_timeout` seconds, flush the buffered
+        writes, remove the metrics collectors,
+        and clean up the database engine/pool.
         """
         logging.info("Closing bot...")
+        await self.jobs.close(config.RuntimeConfig().jobs_drain_timeout)
+        try:
+            await self.flush_responses()
+        except sqlalchemy.exc.SQLAlchemyError:
+            logging.exception("Failed to flush %i ticket responses.", len(self.response_buffer))
+        for collector in self._collectors:
+            metrics.REGISTRY.remove_collector(collector)
+        self._collectors = ()
         await self._db_engine.dispose()
         return await super().close()
@@ -22,18 +22,24 @@ from __future__ import annotations
 
 import asyncio
 import datetime
+import functools
 import logging
 import re
-from typing import Any, Tuple
+import time
+from typing import Any, Dict, FrozenSet, Sequence, Set, Tuple
 
 import discord
-from discord import abc, utils
+from discord import utils
 from discord.ext import commands
 from sqlalchemy import orm
 
 from tickets_plus import bot
-from tickets_plus.database import layer, models
-from tickets_plus.ext import legacy
+from tickets_plus.database import cache, config, layer, models
+from tickets_plus.ext import auditlog, checks, legacy, metrics, pipeline, querylog
+
+_CNFG = config.RuntimeConfig()
+_STRIPS: Set[asyncio.Task[None]] = set()
+"""The running button strips, kept so they aren't garbage collected."""
 
 
 class Events(commands.Cog, name="Events"):
@@ -52,6 +58,7 @@ class Events(commands.Cog, name="Events"):
             bot_instance: The bot instance.
         """
         self._bt = bot_instance
+        self._creators = auditlog.ChannelCreators()
         logging.info("Loaded %s", self.__class__.__name__)
 
     async def ticket_creation(
@@ -64,7 +71,25 @@ class Events(commands.Cog, name="Events"):
         """Main ticket creation function.
 
         Creates db and does some other stuff.
+        Everything that needs the database is read first.
+        Then the session is committed, and the requests to Discord
+        are run as a `pipeline.Pipeline`, concurrently where
+        they don't depend on each other.
+        A failed step is logged and doesn't stop the other steps.
+        The permission overwrites and the topic are set
+        in a single channel edit. The edit replaces all overwrites,
+        so ours are merged into the channel's current ones right
+        before it. If those changed since the ticket was seen,
+        the ticket bot may still be setting them, so ours are set
+        one target at a time instead, leaving the others alone.
+        The time it took for the ticket to be ready is logged.
+        The staff notes thread is saved
+        as soon as it's created. If enabled, the buttons are stripped
+        from the ticket bot messages among the first two in the ticket,
+        or from the first one it sends. That runs in the background,
+        as it may wait for the ticket bot.
         """
+        started = time.perf_counter()
         gld, guild = guilded
         ttypes = await confg.get_ticket_types(gld.id)
         ticket_type = models.TicketType.default()
@@ -73,28 +98,22 @@ class Events(commands.Cog, name="Events"):
                 ticket_type = ttype
         if ticket_type.ignore:
             return
-        nts_thrd = None
-        if guild.legacy_threads:
-            nts_thrd = await legacy.thread_create(channel, guild, confg)
         user_id = user.id if user else None
-        thr_id = nts_thrd.id if nts_thrd else None
-        await confg.get_ticket(channel.id, gld.id, user_id, thr_id)
+        new, _ = await confg.get_ticket(channel.id, gld.id, user_id)
+        # Only the targets we change, merged in when the channel is edited.
+        seen = dict(channel.overwrites)
+        overwrites: Dict[discord.Role, discord.PermissionOverwrite] = {}
         if guild.helping_block:
-            overwrite = discord.PermissionOverwrite(
-                view_channel=False,
-                add_reactions=False,
-                send_messages=False,
-                read_messages=False,
-                read_message_history=False,
-            )
             rol = gld.get_role(guild.helping_block)
             if rol is None:
                 guild.helping_block = None
             else:
-                await channel.set_permissions(
-                    rol,
-                    overwrite=overwrite,
-                    reason="Penalty Enforcement",
+                overwrites[rol] = discord.PermissionOverwrite(
+                    view_channel=False,
+                    add_reactions=False,
+                    send_messages=False,
+                    read_messages=False,
+                    read_message_history=False,
                 )
         if guild.community_roles and ticket_type.comaccs:
             comm_roles = await confg.get_all_community_roles(gld.id)
@@ -112,16 +131,7 @@ class Events(commands.Cog, name="Events"):
                 rle = gld.get_role(role.role_id)
                 if rle is None:
                     continue
-                await channel.set_permissions(
-                    rle,
-                    overwrite=overwrite,
-                    reason="Community Support Access",
-                )
-        if guild.community_pings and ticket_type.comping:
-            comm_pings = await confg.get_all_community_pings(gld.id)
-            inv = await channel.send(" ".join([f"<@&{role.role_id}>" for role in comm_pings]))
-            await asyncio.sleep(0.25)
-            await inv.delete()
+                overwrites[rle] = overwrite
         descr = (f"Ticket {channel.name}\n"
                  "Opened at "
                  f"<t:{int(channel.created_at.timestamp())}:f>")
@@ -132,63 +142,123 @@ class Events(commands.Cog, name="Events"):
             descr += f"\nCloses <t:{int((channel.created_at + guild.first_autoclose).timestamp())}:R>"
             # skipcq: FLK-E501 # pylint: disable=line-too-long
             descr += "\nIf no one responds, the ticket will be closed automatically. Thank you for your patience!"
-        await channel.edit(topic=descr, reason="More information for the ticket.")
-        if guild.strip_buttons and ticket_type.strpbuttns:
-            await asyncio.sleep(5)
-            async for msg in channel.history(oldest_first=True, limit=2):
-                if await confg.check_ticket_bot(msg.author.id, gld.id):
+
+        async def setup_channel() -> discord.TextChannel:
+            # The cached channel is kept up to date by the gateway.
+            if channel.overwrites == seen:
+                # A single request for the permissions and the topic,
+                # instead of one per role.
+                await channel.edit(overwrites={**channel.overwrites, **overwrites}, topic=descr, reason="Ticket setup.")
+            else:
+                for target, overwrite in overwrites.items():
+                    await channel.set_permissions(target, overwrite=overwrite, reason="Ticket setup.")
+                await channel.edit(topic=descr, reason="Ticket setup.")
+            self._bt.topic_writer.record(channel.id)
+            logging.info("Ticket %s ready in %.2fs (%.2fs after creation).", channel.id,
+                         time.perf_counter() - started, (utils.utcnow() - channel.created_at).total_seconds())
+            return channel
+
+        async def ping_community(comm_pings: Sequence[models.CommunityPing], chan: discord.TextChannel) -> None:
+            inv = await chan.send(" ".join([f"<@&{role.role_id}>" for role in comm_pings]))
+            await asyncio.sleep(0.25)
+            await inv.delete()
+
+        async def strip_buttons(bot_ids: FrozenSet[int]) -> None:
+            # Listen first, so a message sent during the history check isn't missed.
+            waiter = asyncio.ensure_future(
+                self._bt.wait_for("message",
+                                  check=lambda msg: msg.channel.id == channel.id and msg.author.id in bot_ids,
+                                  timeout=_CNFG.timeout_strip_buttons))
+            try:
+                found = [msg async for msg in channel.history(oldest_first=True, limit=2) if msg.author.id in bot_ids]
+                if not found:
+                    found.append(await waiter)
+                for msg in found:
                     await channel.send(embeds=msg.embeds)
                     await msg.delete()
+            except asyncio.TimeoutError:
+                logging.debug("No ticket bot message to strip in %s.", channel.id)
+            except (discord.HTTPException, discord.RateLimited):
+                # Nothing awaits us, so log it here.
+                logging.exception("Failed to strip the buttons in %s.", channel.id)
+            finally:
+                waiter.cancel()
+
+        async def notes_thread() -> discord.Thread:
+            thread = await legacy.thread_create(channel, guild)
+            if new:
+                # Saved right away, the staff commands look tickets up by it.
+                await confg.update_ticket(channel.id, staff_note_thread=thread.id)
+                await confg.commit()
+            return thread
+
+        steps = pipeline.Pipeline(f"Ticket {channel.id} setup")
+        steps.add("setup", setup_channel)
+        if guild.legacy_threads:
+            steps.add("thread", notes_thread)
+            if guild.observers_roles:
+                observer_ids = await confg.get_all_observers_roles(gld.id)
+                steps.add("observers",
+                          functools.partial(legacy.observers_ping, observer_ids=observer_ids),
+                          after=("thread",))
+        if guild.community_pings and ticket_type.comping:
+            comm_pings = await confg.get_all_community_pings(gld.id)
+            # The pinged roles must be able to see the channel.
+            steps.add("community", functools.partial(ping_community, comm_pings), after=("setup",))
+        bot_ids = None
+        if guild.strip_buttons and ticket_type.strpbuttns:
+            bot_ids = await confg.get_ticket_bot_ids(gld.id)
+        # Don't hold the connection while we wait for Discord.
         await confg.commit()
+        if guild.warn_autoclose:
+            self._bt.warning_deadlines.schedule(channel.id, datetime.datetime.utcnow() + guild.warn_autoclose)
+        if bot_ids is not None:
+            # May wait for the ticket bot for a while, so it doesn't hold up the setup.
+            strip = asyncio.create_task(strip_buttons(bot_ids), name=f"Ticket {channel.id} strip")
+            _STRIPS.add(strip)
+            strip.add_done_callback(_STRIPS.discard)
+        await steps.run()
 
     async def message_discovery(self, message: discord.Message) -> None:
-        """Discovers the message linked to.
+        """Discovers the messages linked to.
 
-        Fetches a message from its discord link and responds with the
-        message content.
+        Resolves the discord links in a message, and responds with
+        the content of the linked messages, in a single reply.
+        See `tickets_plus.ext.discovery.MessageDiscovery`
+        for how the messages are looked up.
 
         Args:
             message: The message to check for links
         """
-        alpha = re.search(
-            # skipcq: FLK-E501 # pylint: disable=line-too-long
-            r"https://(?:canary\.)?discord\.com/channels/(?P<srv>\d*)/(?P<cha>\d*)/(?P<msg>\d*)",
-            message.content,
-        )
-        if alpha:
-            # We do not check any types in try as we are catching.
-            try:
-                gld = self._bt.get_guild(int(alpha.group("srv")))
-                chan: abc.GuildChannel = (
-                    gld.get_channel_or_thread(  # type: ignore
-                        int(alpha.group("cha"))))
-                got_msg = await chan.fetch_message(  # type: ignore
-                    int(alpha.group("msg")))
-            except (
-                    AttributeError,
-                    discord.HTTPException,
-            ):
+        discovered = []
+        for link in self._bt.discovery.find_links(message.content):
+            got_msg = await self._bt.discovery.resolve(link)
+            if got_msg is None:
                 logging.warning("Message discovery failed.")
+                continue
+            chan = got_msg.channel
+            sent_at = got_msg.created_at.strftime("%d/%m/%Y %H:%M:%S")
+            if not got_msg.content and got_msg.embeds:
+                # A copy, the embed belongs to the cached message.
+                discovered_result = discord.Embed.from_dict(got_msg.embeds[0].to_dict())
+                discovered_result.set_footer(text="[EMBED CAPTURED] Sent in"
+                                             f" {chan.name}"  # type: ignore
+                                             f" at {sent_at}")
             else:
-                time = got_msg.created_at.strftime("%d/%m/%Y %H:%M:%S")
-                if not got_msg.content and got_msg.embeds:
-                    discovered_result = got_msg.embeds[0]
-                    discovered_result.set_footer(text="[EMBED CAPTURED] Sent in"
-                                                 f" {chan.name}"
-                                                 f" at {time}")
-                else:
-                    discovered_result = discord.Embed(description=got_msg.content, color=0x0D0EB4)
-                    discovered_result.set_footer(text="Sent in "
-                                                 f"{chan.name} at {time}"  # type: ignore
-                                                )
-                discovered_result.set_author(
-                    name=got_msg.author.name,
-                    icon_url=got_msg.author.display_avatar.url,
-                )
-                discovered_result.set_image(url=got_msg.attachments[0].url if got_msg.attachments else None)
-                await message.reply(embed=discovered_result)
+                discovered_result = discord.Embed(description=got_msg.content, color=0x0D0EB4)
+                discovered_result.set_footer(text="Sent in "
+                                             f"{chan.name} at {sent_at}"  # type: ignore
+                                            )
+            discovered_result.set_author(
+                name=got_msg.author.name,
+                icon_url=got_msg.author.display_avatar.url,
+            )
+            discovered_result.set_image(url=got_msg.attachments[0].url if got_msg.attachments else None)
+            discovered.append(discovered_result)
+        if discovered:
+            await message.reply(embeds=discovered)
 
-    async def handle_anon(self, message: discord.Message, ticket: models.Ticket, cnfg: layer.OnlineConfig,
+    async def handle_anon(self, message: discord.Message, ticket: cache.TicketRecord, cnfg: layer.OnlineConfig,
                           guild: models.Guild) -> None:
         """Handles ticket anon messages.
 
@@ -203,16 +273,9 @@ class Events(commands.Cog, name="Events"):
         if ticket.anonymous:
             if ticket.user_id == message.author.id:
                 return
-            staff = False
-            staff_roles = await cnfg.get_all_staff_roles(guild.guild_id)
-            for role in staff_roles:
-                parsed_role = message.guild.get_role(  # type: ignore
-                    role.role_id)
-                if parsed_role in message.author.roles:  # type: ignore
-                    # Already checked for member
-                    staff = True
-                    break
-            if not staff:
+            staff_roles = await cnfg.get_staff_role_ids(guild.guild_id)
+            # Already checked for member
+            if not checks.is_staff_member(message.author, staff_roles):  # type: ignore
                 return
             await message.channel.send(
                 f"**{guild.staff_team_name}:** "
@@ -221,8 +284,7 @@ class Events(commands.Cog, name="Events"):
             )
             await message.delete()
 
-    async def update_autoclose(self, message: discord.Message, ticket: models.Ticket, guild: models.Guild,
-                               cnfg: layer.OnlineConfig) -> None:
+    async def update_autoclose(self, message: discord.Message, ticket: cache.TicketRecord, guild: models.Guild) -> None:
         """Updates channel topic autoclose time.
 
         Changes the channel topic to reflect the new autoclose time.
@@ -231,13 +293,12 @@ class Events(commands.Cog, name="Events"):
             message: The message to check.
             ticket: The ticket updated.
             guild: The guild settings.
-            cnfg: The database connection.
         """
         chan = message.channel
         if guild.any_autoclose:
             time_since_update = datetime.datetime.utcnow() - ticket.last_response
             if time_since_update >= datetime.timedelta(minutes=5):
-                crrnt = chan.topic  # type: ignore
+                crrnt = self._bt.topic_writer.topic(chan)  # type: ignore
                 if crrnt is None:
                     # pylint: disable=line-too-long
                     crrnt = (
@@ -251,40 +312,57 @@ class Events(commands.Cog, name="Events"):
                         # skipcq: FLK-E501
                         f"<t:{int((message.created_at + guild.any_autoclose).timestamp())}:R>",
                         crrnt)
-                await chan.edit(topic=crrnt)  # type: ignore
-                ticket.last_response = datetime.datetime.utcnow()
-                await cnfg.commit()
+                # Written in the background, see Routines.write_topics.
+                self._bt.topic_writer.set(chan, crrnt)  # type: ignore
+                # Written to the database later, see Routines.flush_responses.
+                now = datetime.datetime.utcnow()
+                self._bt.ticket_index.update_ticket(ticket.channel_id, last_response=now)
+                self._bt.response_buffer.bump(ticket.channel_id, now)
+                if guild.warn_autoclose and not ticket.notified:
+                    self._bt.warning_deadlines.schedule(ticket.channel_id, now + guild.warn_autoclose)
 
     @commands.Cog.listener(name="on_guild_channel_create")
+    @metrics.timed(metrics.EVENT_SECONDS, "on_guild_channel_create")
+    @querylog.tracked("on_guild_channel_create")
     async def on_channel_create(self, channel: discord.abc.GuildChannel) -> None:
         """Runs when a channel is created.
 
         Handles the checking and facilitating of ticket creation.
         This is the main event that handles the creation of tickets.
+        Guilds without ticket bots never touch the audit log.
+        Otherwise, the creator is looked up in the audit log,
+        channels created during a fetch share the next one.
+        No connection is held while we wait for the audit log.
 
         Args:
             channel: The channel that was created.
         """
+        if not isinstance(channel, discord.channel.TextChannel):
+            return
+        gld = channel.guild
         async with self._bt.get_connection() as confg:
-            if isinstance(channel, discord.channel.TextChannel):
-                gld = channel.guild
-                guild = await confg.get_guild(
-                    gld.id,
-                    (
-                        orm.selectinload(models.Guild.observers_roles),
-                        orm.selectinload(models.Guild.community_roles),
-                        orm.selectinload(models.Guild.community_pings),
-                    ),
-                )
-                if guild.integrated:
-                    return
-                async for entry in gld.audit_logs(limit=3, action=discord.AuditLogAction.channel_create):
-                    if not entry.user:
-                        continue
-                    if entry.target == channel and await confg.check_ticket_bot(entry.user.id, gld.id):
-                        await self.ticket_creation(confg, (gld, guild), channel)
+            bot_ids = await confg.get_ticket_bot_ids(gld.id)
+            if not bot_ids:
+                return
+            guild = await confg.fetch_guild(gld.id)
+            if guild is None or guild.integrated:
+                return
+        if await self._creators.resolve(channel) not in bot_ids:
+            return
+        async with self._bt.get_connection() as confg:
+            guild = await confg.get_guild(
+                gld.id,
+                (
+                    orm.selectinload(models.Guild.observers_roles),
+                    orm.selectinload(models.Guild.community_roles),
+                    orm.selectinload(models.Guild.community_pings),
+                ),
+            )
+            await self.ticket_creation(confg, (gld, guild), channel)
 
     @commands.Cog.listener(name="on_guild_channel_delete")
+    @metrics.timed(metrics.EVENT_SECONDS, "on_guild_channel_delete")
+    @querylog.tracked("on_guild_channel_delete")
     async def on_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
         """Cleanups for when a ticket channel is deleted.
 
@@ -295,6 +373,11 @@ class Events(commands.Cog, name="Events"):
             channel: The channel that was deleted.
         """
         if isinstance(channel, discord.channel.TextChannel):
+            index = self._bt.ticket_index
+            if index.ready and not index.is_ticket(channel.id):
+                return
+            index.remove_ticket(channel.id)
+            self._bt.topic_writer.forget(channel.id)
             async with self._bt.get_connection() as confg:
                 ticket = await confg.fetch_ticket(channel.id)
                 if ticket:
@@ -303,6 +386,8 @@ class Events(commands.Cog, name="Events"):
                     await confg.commit()
 
     @commands.Cog.listener(name="on_member_join")
+    @metrics.timed(metrics.EVENT_SECONDS, "on_member_join")
+    @querylog.tracked("on_member_join")
     async def on_member_join(self, member: discord.Member) -> None:
         """Ensures penalty roles are sticky.
 
@@ -313,8 +398,8 @@ class Events(commands.Cog, name="Events"):
             member: The member that joined.
         """
         async with self._bt.get_connection() as cnfg:
-            actv_member = await cnfg.get_member(member.id, member.guild.id)
-            if actv_member.status:
+            actv_member = await cnfg.fetch_member(member.id, member.guild.id)
+            if actv_member is not None and actv_member.status:
                 if actv_member.status_till is not None:
                     # Split this up to avoid None comparison.
                     # pylint: disable=line-too-long
@@ -348,6 +433,8 @@ class Events(commands.Cog, name="Events"):
                         await member.add_roles(role)
 
     @commands.Cog.listener(name="on_message")
+    @metrics.timed(metrics.EVENT_SECONDS, "on_message")
+    @querylog.tracked("on_message")
     async def on_message(self, message: discord.Message) -> None:
         """Handles all message-related features.
 
@@ -356,21 +443,33 @@ class Events(commands.Cog, name="Events"):
         sending their contents as a reply.
         Also handles anonymous mode for tickets. Resending
         staff messages as the bot.
+        The ticket index is checked first, so messages that hit
+        no feature don't touch the database at all.
 
         Args:
             message: The message that was sent.
         """
-        async with self._bt.get_connection() as cnfg:
-            if message.author.bot or message.guild is None:
+        if message.author.bot or message.guild is None:
+            return
+        features = self._bt.ticket_index.features(message.guild.id)
+        if features is not None:
+            if features & cache.GuildFeature.MSG_DISCOVERY:
+                await self.message_discovery(message)
+            ticket_features = cache.GuildFeature.ANONYMOUS | cache.GuildFeature.AUTOCLOSE
+            if not (features & ticket_features and self._bt.ticket_index.is_ticket(message.channel.id)):
                 return
-            guild = await cnfg.get_guild(message.guild.id)
-            if guild.msg_discovery:
+        async with self._bt.get_connection() as cnfg:
+            guild = await cnfg.fetch_guild(message.guild.id)
+            if features is None and (guild is None or guild.msg_discovery):
                 await self.message_discovery(message)
-            ticket = await cnfg.fetch_ticket(message.channel.id)
+            if guild is None:
+                # Not configured, so it has no tickets either.
+                return
+            ticket = await cnfg.fetch_ticket_record(message.channel.id)
             if ticket:
                 # Make sure the ticket exists
                 await self.handle_anon(message, ticket, cnfg, guild)
-                await self.update_autoclose(message, ticket, guild, cnfg)
+                await self.update_autoclose(message, ticket, guild)
 
 
 async def setup(bot_instance: bot.TicketsPlusBot) -> None:
@@ -20,12 +20,32 @@ Typical usage example:
 # in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
 # If later approved by the Initial Contributor, GPL-3.0-or-later.
 
+import asyncio
+import datetime
+import logging
+import time
+from typing import Dict, List, Sequence, Tuple
+
+import discord
 from discord.ext import commands, tasks
 
 from tickets_plus import bot
 from tickets_plus.database import config
+from tickets_plus.ext import metrics
 
 _CNFG = config.RuntimeConfig()
+_RETRY_DELAY = datetime.timedelta(seconds=1)
+"""The minimum delay before a ticket that wasn't due is checked again."""
+_NOTIFY_BATCH = 500
+"""How many tickets to mark as warned per transaction."""
+_STATUS_CHUNK = 500
+"""How many expired statuses to clear per transaction."""
+_STATUS_RETRY = datetime.timedelta(minutes=1)
+"""The delay before the roles of a cleared status are removed again, if that failed."""
+_DM_ATTEMPTS = 5
+"""How many times a rate limited warning is sent before giving up."""
+_DM_BACKOFF = 1.0
+"""The initial delay in seconds before retrying a rate limited warning."""
 
 
 class Routines(commands.Cog):
@@ -49,6 +69,8 @@ class Routines(commands.Cog):
         self._bt = bot_instance
         self.clean_status.start()
         self.notify_users.start()
+        self.flush_responses.start()
+        self.write_topics.start()
 
     async def cog_unload(self):
         """Cancel all tasks when the cog is unloaded.
@@ -58,58 +80,135 @@ class Routines(commands.Cog):
         """
         self.clean_status.cancel()
         self.notify_users.cancel()
+        self.flush_responses.cancel()
+        self.write_topics.cancel()
 
-    @tasks.loop(seconds=_CNFG.spt_clean_usr)
+    @tasks.loop()
     async def clean_status(self):
         """Remove all status roles from users whose status has expired.
 
-        This task runs every minute, and checks if any users have a
-        status role that has expired. If so, it removes the role from
-        the user.
+        This task sleeps until the next status expires,
+        see `tickets_plus.bot.TicketsPlusBot.status_deadlines`.
+        Then it clears the expired statuses in chunks.
+        Each chunk is cleared in its own short transaction,
+        after which the roles are removed from the users concurrently.
+        A failed role removal is logged, and doesn't affect the others.
+        The statuses of the failed removals are restored,
+        and expire again after `_STATUS_RETRY`, so they are retried.
         """
-        async with self._bt.get_connection() as conn:
-            rehabilitated = await conn.get_expired_members()
-            for member in rehabilitated:
-                gld = member.guild
-                usr_id = member.user_id
-                actv_guild = self._bt.get_guild(gld.guild_id)
-                if actv_guild is None:
-                    continue
-                actv_member = actv_guild.get_member(usr_id)
-                if actv_member is None:
-                    continue
-                rles = []
-                if gld.helping_block:
-                    rles.append(actv_guild.get_role(gld.helping_block))
-                if gld.support_block:
-                    rles.append(actv_guild.get_role(gld.support_block))
+        await self._bt.status_deadlines.wait_due()
+        with metrics.ROUTINE_SECONDS.time("clean_status"):
+            limiter = asyncio.Semaphore(_CNFG.roles_concurrency)
+            cleared = _STATUS_CHUNK
+            while cleared == _STATUS_CHUNK:
+                started = time.perf_counter()
+                async with self._bt.get_connection() as conn:
+                    members = await conn.clear_expired_statuses(_STATUS_CHUNK)
+                    await conn.commit()
+                cleared = len(members)
+                if not cleared:
+                    break
+                failed = await self._lift_statuses(limiter, members)
+                if failed:
+                    retry_at = datetime.datetime.utcnow() + _STATUS_RETRY
+                    async with self._bt.get_connection() as conn:
+                        await conn.restore_statuses(failed, retry_at)
+                        await conn.commit()
+                    for user_id, guild_id, _ in failed:
+                        self._bt.status_deadlines.schedule((user_id, guild_id), retry_at)
+                elapsed = time.perf_counter() - started
+                logging.info("Cleared %i expired statuses in %.2fs (%.1f/s), %i role removals failed.", cleared,
+                             elapsed, cleared / elapsed, len(failed))
+
+    async def _lift_statuses(
+            self, limiter: asyncio.Semaphore, members: Sequence[Tuple[int, int, int, int | None,
+                                                                      int | None]]) -> List[Tuple[int, int, int]]:
+        """Removes the block roles from users whose status was cleared.
+
+        Args:
+            limiter: The semaphore shared by all removals of the run.
+            members: The cleared members,
+                see `tickets_plus.database.layer.OnlineConfig.clear_expired_statuses`.
+
+        Returns:
+            List[Tuple[int, int, int]]: The user ID, guild ID and old status
+                of each member whose roles could not be removed.
+        """
+        results = await asyncio.gather(
+            *(self._lift_status(limiter, usr, gld, support, helping) for usr, gld, _, support, helping in members))
+        return [(usr, gld, sts) for (usr, gld, sts, *_), lifted in zip(members, results) if not lifted]
+
+    async def _lift_status(self, limiter: asyncio.Semaphore, user_id: int, guild_id: int, support_block: int | None,
+                           helping_block: int | None) -> bool:
+        """Removes the block roles from a user whose status expired.
+
+        Args:
+            limiter: The semaphore shared by all removals of the run.
+            user_id: The user ID.
+            guild_id: The guild ID.
+            support_block: The support block role ID of the guild.
+            helping_block: The helping block role ID of the guild.
+
+        Returns:
+            bool: False if the roles could not be removed.
+                Users who left the guild are not a failure.
+        """
+        actv_guild = self._bt.get_guild(guild_id)
+        if actv_guild is None:
+            return True
+        actv_member = actv_guild.get_member(user_id)
+        if actv_member is None:
+            return True
+        rles = [actv_guild.get_role(rle) for rle in (helping_block, support_block) if rle]
+        rles = [rle for rle in rles if rle is not None and rle in actv_member.roles]
+        if not rles:
+            return True
+        async with limiter:
+            try:
                 await actv_member.remove_roles(*rles, reason="Status expired")
-                member.status = 0
-                member.status_till = None
-            await conn.commit()
+            except (discord.HTTPException, discord.RateLimited) as exc:
+                logging.warning("Failed to lift the status of %s in %s: %s", user_id, guild_id, exc)
+                return False
+        return True
 
     @clean_status.before_loop
     async def before_clean_status(self):
         """Delay the first run till the bot is ready.
 
         Ensures that the bot is ready before the first run of the
-        task.
+        task. Then schedules the status expiry times of all members.
         """
         await self._bt.wait_until_ready()
+        async with self._bt.get_connection() as conn:
+            deadlines = await conn.get_status_deadlines()
+        for user_id, guild_id, status_till in deadlines:
+            self._bt.status_deadlines.schedule((user_id, guild_id), status_till)
 
-    @tasks.loop(seconds=_CNFG.spt_notif_usr)
+    @tasks.loop()
     async def notify_users(self):
         """Notifies users of their tickets closing soon.
 
-        Running every 2 minutes and 30 seconds, this task checks if
-        any tickets are lacking responses,
+        This task sleeps until the next ticket is due for a warning,
+        see `tickets_plus.bot.TicketsPlusBot.warning_deadlines`.
+        Then it checks if the due tickets are still lacking responses,
         (time since last message above warning threshold)
         and if so, sends a warning message to the user.
+        The buffered responses are flushed first, so the check
+        sees the latest response times.
+        Tickets that turn out not to be due are scheduled again.
+        Each user gets a single message listing all their due tickets.
+        The messages are sent concurrently, without holding
+        a database connection, see `_send_digest`.
         """
-        async with self._bt.get_connection() as conn:
-            tickets = await conn.get_pending_tickets()
+        due = await self._bt.warning_deadlines.wait_due()
+        with metrics.ROUTINE_SECONDS.time("notify_users"):
+            await self._bt.flush_responses()
+            digests: Dict[int, Tuple[discord.Member, List[str]]] = {}
+            async with self._bt.get_connection() as conn:
+                tickets = await conn.get_pending_tickets(due)
+                not_due = set(due).difference(ticket.channel_id for ticket in tickets)
+                deadlines = await conn.get_warning_deadlines(channel_ids=not_due) if not_due else {}
             for ticket in tickets:
-                ticket.notified = True
                 gld = ticket.guild
                 usr_id = ticket.user_id
                 if usr_id is None:
@@ -120,25 +219,100 @@ class Routines(commands.Cog):
                 actv_member = actv_guild.get_member(usr_id)
                 if actv_member is None:
                     continue
-                appnd = "Please respond soon, or it will be closed."
+                line = f"<#{ticket.channel_id}> in {actv_guild.name}"
                 if gld.any_autoclose:
-                    appnd = (
-                        "Please respond soon, or it will be closed "
-                        # pylint: disable=line-too-long # skipcq: FLK-E501
-                        f"<t:{int((ticket.last_response + gld.any_autoclose).timestamp())}:R>.")
-                txt = (f"Your ticket <#{ticket.channel_id}> in {actv_guild.name} "
-                       f"is still open. {appnd}")
-                await actv_member.send(txt)
-            await conn.commit()
+                    line += f" (closes <t:{int((ticket.last_response + gld.any_autoclose).timestamp())}:R>)"
+                digests.setdefault(usr_id, (actv_member, []))[1].append(line)
+            limiter = asyncio.Semaphore(_CNFG.dm_concurrency)
+            await asyncio.gather(*(self._send_digest(member, lines, limiter) for member, lines in digests.values()))
+            warned = [ticket.channel_id for ticket in tickets]
+            for start in range(0, len(warned), _NOTIFY_BATCH):
+                async with self._bt.get_connection() as conn:
+                    await conn.set_notified(warned[start:start + _NOTIFY_BATCH])
+                    await conn.commit()
+            retry = datetime.datetime.utcnow() + _RETRY_DELAY
+            for channel_id, when in deadlines.items():
+                self._bt.warning_deadlines.schedule(channel_id, max(when, retry))
+
+    @staticmethod
+    async def _send_digest(member: discord.Member, lines: List[str], limiter: asyncio.Semaphore) -> None:
+        """Sends a user the list of their tickets closing soon.
+
+        At most as many messages as the limiter allows are sent at once.
+        discord.py waits out short rate limits itself, holding the slot.
+        Longer ones, see `timeout_ratelimit`, raise `discord.RateLimited`,
+        and are retried here with an exponential backoff,
+        without holding the slot. So are rate limits discord.py gave up on.
+        Other failures are logged and dropped.
+
+        Args:
+            member: The user to warn.
+            lines: A line for each of their tickets.
+            limiter: The semaphore shared by all warnings of the run.
+        """
+        if len(lines) == 1:
+            txt = f"Your ticket {lines[0]} is still open. Please respond soon, or it will be closed."
+        else:
+            tckts = "\n".join(f"- {line}" for line in lines)
+            txt = f"Your tickets are still open:\n{tckts}\nPlease respond soon, or they will be closed."
+        delay = _DM_BACKOFF
+        for _ in range(_DM_ATTEMPTS):
+            async with limiter:
+                try:
+                    await member.send(txt)
+                    return
+                except discord.RateLimited as exc:
+                    # Raised instead of sleeping, as the client has a max_ratelimit_timeout.
+                    delay = max(delay, exc.retry_after)
+                except discord.HTTPException as exc:
+                    if exc.status != 429:
+                        logging.warning("Failed to warn %s about %i tickets: %s", member.id, len(lines), exc)
+                        return
+            # Sleep without holding the limiter, so other warnings go through.
+            await asyncio.sleep(delay)
+            delay *= 2
+        logging.warning("Gave up warning %s about %i tickets, rate limited.", member.id, len(lines))
 
     @notify_users.before_loop
     async def before_notify_users(self):
         """Delay the first run till the bot is ready.
 
         Ensures that the bot is ready before the first run of the
-        task.
+        task. Then schedules the warning times of all tickets.
         """
         await self._bt.wait_until_ready()
+        async with self._bt.get_connection() as conn:
+            deadlines = await conn.get_warning_deadlines()
+        for channel_id, when in deadlines.items():
+            self._bt.warning_deadlines.schedule(channel_id, when)
+
+    @tasks.loop(seconds=_CNFG.spt_flush_resp)
+    async def flush_responses(self):
+        """Writes the buffered ticket responses to the database.
+
+        Ticket response times are buffered in memory,
+        see `tickets_plus.database.cache.ResponseBuffer`.
+        This task writes them all in one batch.
+        The buffer is also flushed when the bot closes.
+        """
+        with metrics.ROUTINE_SECONDS.time("flush_responses"):
+            await self._bt.flush_responses()
+
+    @tasks.loop()
+    async def write_topics(self):
+        """Writes the pending channel topics, once they are due.
+
+        Topic edits are heavily rate limited by Discord,
+        see `tickets_plus.ext.topics.TopicWriter`.
+        This task waits for the next topics the limits allow,
+        and writes them.
+        """
+        await self._bt.topic_writer.write_due()
+
+    @write_topics.before_loop
+    async def before_write_topics(self):
+        """Delay the first run till the bot is ready."""
+        await self._bt.wait_until_ready()
 
 
 async def setup(bot_instance: bot.TicketsPlusBot):
@@ -39,6 +39,8 @@ class Settings(commands.GroupCog, name="settings", description="Settings for the
     We suggest the settings to be only changed by administrators;
     however, this can be changed discord-side.
     This is a group cog, so all commands are under the settings group.
+    All changes are committed through the database layer, which also
+    invalidates the cached configuration of the changed guild.
     """
 
     def __init__(self, bot_instance: bot.TicketsPlusBot):
@@ -387,6 +389,11 @@ class Settings(commands.GroupCog, name="settings", description="Settings for the
             else:
                 guild.first_autoclose = changed_close
             await conn.commit()
+            if category.value == 2 and changed_close is not None:
+                # Stale deadlines are harmless, the routine checks the database.
+                deadlines = await conn.get_warning_deadlines(guild_id=guild.guild_id)
+                for channel_id, when in deadlines.items():
+                    self._bt.warning_deadlines.schedule(channel_id, when)
         await ctx.followup.send(embed=emd, ephemeral=True)
 
     @app_commands.command(name="toggle", description="Toggle a specified True/False value.")
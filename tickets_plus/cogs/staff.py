@@ -75,10 +75,10 @@ class StaffCmmd(commands.Cog, name="StaffCommands"):
             if not ctx.user.resolved_permissions.mention_everyone:
                 message = utils.escape_mentions(message)
             if isinstance(ctx.channel, discord.Thread):
-                ticket = await confg.fetch_ticket(ctx.channel.parent.id)
-                if ticket is None:
-                    raise exceptions.InvalidLocation("The parent channel is not a ticket.")
-                if ticket.staff_note_thread != ctx.channel.id:
+                ticket = await confg.fetch_thread_record(ctx.channel.id)
+                if ticket is None or ticket.channel_id != ctx.channel.parent_id:
+                    if await confg.fetch_ticket_record(ctx.channel.parent_id) is None:
+                        raise exceptions.InvalidLocation("The parent channel is not a ticket.")
                     raise exceptions.InvalidLocation("This channel is not the designated staff"
                                                      " notes thread.")
                 await ctx.followup.send(f"Responding to ticket with message:\n{message}")
@@ -86,7 +86,7 @@ class StaffCmmd(commands.Cog, name="StaffCommands"):
                     f"**{guild.staff_team_name}:** {message}")
 
             elif isinstance(ctx.channel, discord.TextChannel):
-                ticket = await confg.fetch_ticket(ctx.channel.id)
+                ticket = await confg.fetch_ticket_record(ctx.channel.id)
                 if ticket is None:
                     raise exceptions.InvalidLocation("This channel is not a ticket."
                                                      " If it is, use /register.")
@@ -121,7 +121,7 @@ class StaffCmmd(commands.Cog, name="StaffCommands"):
         await ctx.response.defer(ephemeral=True)
         async with self._bt.get_connection() as confg:
             # We don't need an account for DMs here, due to the guild_only.
-            ticket = await confg.fetch_ticket(ctx.channel.id)  # type: ignore
+            ticket = await confg.fetch_ticket_record(ctx.channel.id)  # type: ignore
             if ticket is None:
                 raise exceptions.InvalidLocation("This channel is not a ticket."
                                                  " If it is, use /register.")
@@ -157,11 +157,11 @@ class StaffCmmd(commands.Cog, name="StaffCommands"):
         await ctx.response.defer(ephemeral=True)
         async with self._bt.get_connection() as confg:
             # Checked by discord in decorator
-            ticket = await confg.fetch_ticket(ctx.channel.id)  # type: ignore
+            ticket = await confg.fetch_ticket_record(ctx.channel.id)  # type: ignore
             if ticket is None:
                 raise exceptions.InvalidLocation("This channel is not a ticket.")
-            ticket.anonymous = not ticket.anonymous
-            status = ticket.anonymous
+            status = not ticket.anonymous
+            await confg.update_ticket(ticket.channel_id, anonymous=status)
             await confg.commit()
         emd = discord.Embed(title="Success!",
                             description=f"Anonymous staff responses are now {status}.",
@@ -309,6 +309,12 @@ class StaffCmmd(commands.Cog, name="StaffCommands"):
                         unpck = [discord.Object(rle.role_id) for rle in roles]
                         await target.remove_roles(*unpck, reason="Community Support Blocked")
             await confg.commit()
+        # Wake the status cleanup when the new status expires.
+        deadline_key = (target.id, interaction.guild_id)
+        if member.status and member.status_till is not None:
+            self._bt.status_deadlines.schedule(deadline_key, member.status_till)
+        else:
+            self._bt.status_deadlines.cancel(deadline_key)
         await interaction.followup.send(embed=emd, ephemeral=True)
         try:
             await target.send(embed=emd2)
@@ -0,0 +1,454 @@
+"""In-memory caches for frequently read database rows.
+
+This module contains the per-process caches used by the database layer.
+Those caches sit in front of the database and are used to avoid
+round trips for rows that are read on (almost) every event, but
+are rarely changed. Like the guild configuration.
+The caches do not store ORM objects, as those are bound to a session.
+Instead, they store plain snapshots of the column values, which the
+`tickets_plus.database.layer.OnlineConfig` turns back into objects.
+The ticket index is kept up to date by the same class on commit,
+and lets the event handlers skip the database for most messages.
+It also holds a compact record of every open ticket,
+so the hot paths don't have to load the ticket row.
+Finally, the response buffer holds ticket writes that are
+not urgent, until they are flushed to the database in one batch.
+
+Typical usage example:
+    ```py
+    from tickets_plus.database import cache
+    guilds = cache.LRUCache(maxsize=4096)
+    guilds.put(guild_id, snapshot)
+    snapshot = guilds.get(guild_id)
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import collections
+import datetime
+import enum
+import time
+from typing import Any, Dict, Generic, Hashable, TypeVar
+
+_KT = TypeVar("_KT", bound=Hashable)
+_VT = TypeVar("_VT")
+
+
+class LRUCache(Generic[_KT, _VT]):
+    """A bounded least-recently-used cache.
+
+    A simple mapping with a maximum size.
+    Once the maximum size is reached, the least recently used entry
+    is evicted to make room for the new one.
+    Entries can also be invalidated explicitly,
+    which is what the database layer does on commit.
+    Optionally, entries expire after a while, in case
+    a change was made without invalidating them.
+
+    A value read while an invalidation happens may already be outdated.
+    Take a `stamp` before reading the value, and pass it to `put`,
+    so the value is dropped if anything was invalidated in between.
+
+    Attributes:
+        maxsize: The maximum number of entries kept.
+        ttl: How long an entry is kept, in seconds, if at all.
+        hits: The number of lookups that found an entry.
+        misses: The number of lookups that did not find an entry.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        """Initialises the cache.
+
+        Args:
+            maxsize: The maximum number of entries kept.
+                Must be a positive integer.
+            ttl: How long an entry is kept, in seconds.
+                If None, entries are kept until evicted or invalidated.
+
+        Raises:
+            ValueError: The maximum size is not positive.
+        """
+        if maxsize <= 0:
+            raise ValueError("The cache size must be positive.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._invalidations = 0
+        self._data: collections.OrderedDict[_KT, _VT] = collections.OrderedDict()
+        self._expires: Dict[_KT, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: _KT) -> bool:
+        return key in self._data
+
+    def get(self, key: _KT) -> _VT | None:
+        """Get an entry from the cache.
+
+        Marks the entry as recently used.
+
+        Args:
+            key: The key of the entry.
+
+        Returns:
+            _VT | None: The cached value, or None if it is not cached.
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        if self.ttl is not None and self._expires[key] <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def stamp(self) -> int:
+        """Get a stamp, to tell if anything was invalidated since.
+
+        Returns:
+            int: The stamp, to pass to `put`.
+        """
+        return self._invalidations
+
+    def put(self, key: _KT, value: _VT, stamp: int | None = None) -> None:
+        """Put an entry into the cache.
+
+        Replaces the existing entry if there is one.
+        Evicts the least recently used entry if the cache is full.
+
+        Args:
+            key: The key of the entry.
+            value: The value to cache.
+            stamp: The stamp taken before the value was read.
+                If anything was invalidated since, the value may be
+                outdated, so it's not cached.
+        """
+        if stamp is not None and stamp != self._invalidations:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.ttl is not None:
+            self._expires[key] = time.monotonic() + self.ttl
+        if len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+
+    def invalidate(self, key: _KT) -> None:
+        """Remove an entry from the cache.
+
+        Does nothing if the entry is not cached.
+
+        Args:
+            key: The key of the entry.
+        """
+        self._invalidations += 1
+        self._remove(key)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        self._invalidations += 1
+        self._data.clear()
+        self._expires.clear()
+
+    def _remove(self, key: _KT) -> None:
+        """Remove an entry, and its expiry time.
+
+        Args:
+            key: The key of the entry.
+        """
+        self._data.pop(key, None)
+        self._expires.pop(key, None)
+
+
+class GuildFeature(enum.IntFlag):
+    """Guild features that need the database when a message is sent.
+
+    Attributes:
+        NONE: No features are enabled.
+        MSG_DISCOVERY: Message discovery is enabled.
+        ANONYMOUS: The guild has at least one anonymous ticket.
+        AUTOCLOSE: The guild closes tickets after the last response.
+    """
+
+    NONE = 0
+    MSG_DISCOVERY = enum.auto()
+    ANONYMOUS = enum.auto()
+    AUTOCLOSE = enum.auto()
+
+
+class TicketRecord:
+    """The frequently read columns of an open ticket.
+
+    A plain copy of part of a `tickets_plus.database.models.Ticket` row.
+    Uses slots, as we keep one for every open ticket.
+    The record must not be changed directly, write to the database
+    with `tickets_plus.database.layer.OnlineConfig.update_ticket`
+    instead. The record is updated once the change is committed.
+    The only exception is last_response, which is updated right away
+    and written to the database later, through the `ResponseBuffer`.
+
+    Attributes:
+        channel_id: The channel ID of the ticket.
+        guild_id: The guild ID of the ticket.
+        user_id: The user ID of the ticket owner, if known.
+        anonymous: Whether the ticket is in anonymous mode.
+        last_response: When the ticket was last responded to.
+        notified: Whether the user was warned about the autoclose.
+        staff_note_thread: The thread ID of the staff notes, if any.
+    """
+
+    __slots__ = ("channel_id", "guild_id", "user_id", "anonymous", "last_response", "notified", "staff_note_thread")
+
+    def __init__(self, channel_id: int, guild_id: int, user_id: int | None, anonymous: bool,
+                 last_response: datetime.datetime, notified: bool, staff_note_thread: int | None) -> None:
+        """Initialises the record.
+
+        Args:
+            channel_id: The channel ID of the ticket.
+            guild_id: The guild ID of the ticket.
+            user_id: The user ID of the ticket owner, if known.
+            anonymous: Whether the ticket is in anonymous mode.
+            last_response: When the ticket was last responded to.
+            notified: Whether the user was warned about the autoclose.
+            staff_note_thread: The thread ID of the staff notes, if any.
+        """
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.anonymous = anonymous
+        self.last_response = last_response
+        self.notified = notified
+        self.staff_note_thread = staff_note_thread
+
+    def __repr__(self) -> str:
+        return f"<TicketRecord channel_id={self.channel_id} guild_id={self.guild_id}>"
+
+
+class TicketIndex:
+    """An index of the open tickets and guild features.
+
+    Holds a record of every open ticket, keyed by channel ID and by
+    staff notes thread ID, and a bitmask of the features enabled in
+    each guild. This is enough to tell if a message needs
+    the database at all, which most messages do not.
+    Records are only evicted when the ticket is deleted.
+    The index is loaded from the database on startup, and afterwards
+    updated by `tickets_plus.database.layer.OnlineConfig` on commit.
+    Until it is loaded, it can't answer anything.
+
+    Attributes:
+        ready: Whether the index was loaded from the database.
+    """
+
+    def __init__(self, default: GuildFeature) -> None:
+        """Initialises the empty index.
+
+        Args:
+            default: The features of guilds without a configuration.
+                Should match the defaults of the guild table.
+        """
+        self.ready = False
+        self._default = default
+        self._tickets: Dict[int, TicketRecord] = {}
+        self._threads: Dict[int, TicketRecord] = {}
+        self._features: Dict[int, GuildFeature | None] = {}
+        self._anonymous: collections.Counter[int] = collections.Counter()
+
+    def __len__(self) -> int:
+        return len(self._tickets)
+
+    def is_ticket(self, channel_id: int) -> bool:
+        """Check if a channel is an open ticket.
+
+        Args:
+            channel_id: The channel ID.
+
+        Returns:
+            bool: Whether the channel is an indexed ticket.
+        """
+        return channel_id in self._tickets
+
+    def get_ticket(self, channel_id: int) -> TicketRecord | None:
+        """Get the record of a ticket by its channel.
+
+        Args:
+            channel_id: The channel ID.
+
+        Returns:
+            TicketRecord | None: The record, or None if not indexed.
+        """
+        return self._tickets.get(channel_id)
+
+    def get_thread(self, thread_id: int) -> TicketRecord | None:
+        """Get the record of a ticket by its staff notes thread.
+
+        Args:
+            thread_id: The thread ID.
+
+        Returns:
+            TicketRecord | None: The record, or None if not indexed.
+        """
+        return self._threads.get(thread_id)
+
+    def features(self, guild_id: int) -> GuildFeature | None:
+        """Get the features of a guild.
+
+        Args:
+            guild_id: The guild ID.
+
+        Returns:
+            GuildFeature | None: The enabled features,
+                or None if they are not known.
+        """
+        if not self.ready:
+            return None
+        features = self._features.get(guild_id, self._default)
+        if features is None:
+            return None
+        if self._anonymous[guild_id] > 0:
+            features |= GuildFeature.ANONYMOUS
+        return features
+
+    def add_ticket(self, record: TicketRecord) -> None:
+        """Add or replace a ticket.
+
+        Args:
+            record: The record of the ticket.
+        """
+        self.remove_ticket(record.channel_id)
+        self._tickets[record.channel_id] = record
+        if record.staff_note_thread is not None:
+            self._threads[record.staff_note_thread] = record
+        if record.anonymous:
+            self._anonymous[record.guild_id] += 1
+
+    def update_ticket(self, channel_id: int, **values: Any) -> None:
+        """Update the record of a ticket.
+
+        Does nothing if the ticket is not indexed.
+
+        Args:
+            channel_id: The channel ID of the ticket.
+            **values: The new values, keyed by attribute name.
+        """
+        record = self._tickets.get(channel_id)
+        if record is None:
+            return
+        self.remove_ticket(channel_id)
+        for key, value in values.items():
+            setattr(record, key, value)
+        self.add_ticket(record)
+
+    def remove_ticket(self, channel_id: int) -> None:
+        """Remove a ticket.
+
+        Does nothing if the ticket is not indexed.
+
+        Args:
+            channel_id: The channel ID of the ticket.
+        """
+        record = self._tickets.pop(channel_id, None)
+        if record is None:
+            return
+        if record.staff_note_thread is not None:
+            self._threads.pop(record.staff_note_thread, None)
+        if record.anonymous:
+            self._anonymous[record.guild_id] -= 1
+            if self._anonymous[record.guild_id] <= 0:
+                del self._anonymous[record.guild_id]
+
+    def update_guild(self, guild_id: int, msg_discovery: bool, autoclose: bool) -> None:
+        """Set the features of a guild.
+
+        Args:
+            guild_id: The guild ID.
+            msg_discovery: Whether message discovery is enabled.
+            autoclose: Whether tickets are closed after the last response.
+        """
+        features = GuildFeature.NONE
+        if msg_discovery:
+            features |= GuildFeature.MSG_DISCOVERY
+        if autoclose:
+            features |= GuildFeature.AUTOCLOSE
+        self._features[guild_id] = features
+
+    def forget_guild(self, guild_id: int) -> None:
+        """Mark the features of a guild as unknown.
+
+        Until they are set again, `features` returns None for the guild.
+
+        Args:
+            guild_id: The guild ID.
+        """
+        self._features[guild_id] = None
+
+    def clear(self) -> None:
+        """Remove everything from the index, and mark it as not ready."""
+        self.ready = False
+        self._tickets.clear()
+        self._threads.clear()
+        self._features.clear()
+        self._anonymous.clear()
+
+
+class ResponseBuffer:
+    """A write-behind buffer for ticket response times.
+
+    Tickets are responded to all the time, but the response time
+    is only needed for the autoclose warnings. So instead of a
+    transaction per response, we collect the latest response time of
+    each ticket here, and write them all at once every so often.
+    See `tickets_plus.bot.TicketsPlusBot.flush_responses`.
+    """
+
+    def __init__(self) -> None:
+        """Initialises the empty buffer."""
+        self._pending: Dict[int, datetime.datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def bump(self, channel_id: int, when: datetime.datetime) -> None:
+        """Record a response to a ticket.
+
+        Only the latest response of each ticket is kept.
+
+        Args:
+            channel_id: The channel ID of the ticket.
+            when: The time of the response, in naive UTC.
+        """
+        current = self._pending.get(channel_id)
+        if current is None or current < when:
+            self._pending[channel_id] = when
+
+    def drain(self) -> Dict[int, datetime.datetime]:
+        """Take all pending responses out of the buffer.
+
+        Returns:
+            Dict[int, datetime.datetime]: The response times,
+                keyed by channel ID.
+        """
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, pending: Dict[int, datetime.datetime]) -> None:
+        """Put drained responses back, after a failed write.
+
+        Responses recorded since the drain are kept if they are newer.
+
+        Args:
+            pending: The responses returned by `drain`.
+        """
+        for channel_id, when in pending.items():
+            self.bump(channel_id, when)
@@ -137,8 +137,26 @@ class RuntimeConfig:
     It is not meant to be edited by less experienced users.
 
     Parameters:
-        spt_clean_usr: Clean user roles seconds per tick
-        spt_notif_usr: Notify user seconds per tick
+        spt_flush_resp: Flush buffered ticket responses seconds per tick
+        cache_guilds: Maximum number of cached guild configurations
+        cache_ticket_bots: Maximum number of guilds with cached ticket bots
+        cache_staff_roles: Maximum number of guilds with cached staff roles
+        cache_owners_ttl: Seconds to cache the bot owners for
+        cache_ttl: Seconds to cache guild configurations, ticket bots and staff roles for
+        dm_concurrency: Maximum number of direct messages sent at once
+        roles_concurrency: Maximum number of role removals sent at once
+        timeout_strip_buttons: Seconds to wait for a ticket bot message to strip
+        timeout_ratelimit: Seconds a request may wait on a rate limit before it fails, at least 30
+        discovery_cache_size: Maximum number of messages cached for discovery
+        discovery_ttl: Seconds a message is cached for discovery
+        discovery_max_links: Maximum number of links discovered per message
+        jobs_workers: Number of background jobs run at once
+        jobs_depth: Maximum number of background jobs waiting to run
+        jobs_history: Maximum number of finished background jobs remembered
+        jobs_drain_timeout: Seconds to wait for running background jobs on shutdown
+        querylog_slow: Seconds after which a query is logged as slow
+        querylog_max_statements: Maximum number of statements per operation before it's flagged
+        querylog_explain: Whether to log the query plan of flagged operations
     """
 
     def __init__(self) -> None:
@@ -150,19 +168,181 @@ class RuntimeConfig:
         return self._config
 
     @property
-    def spt_clean_usr(self) -> int:
-        """Returns the clean user roles seconds per tick
+    def spt_flush_resp(self) -> int:
+        """Returns the flush buffered ticket responses seconds per tick
 
         Returns:
-            int: The clean user roles seconds per tick
+            int: The flush buffered ticket responses seconds per tick
         """
-        return self._config["spt"]["clean_usr"]
+        return self._config["spt"]["flush_resp"]
 
     @property
-    def spt_notif_usr(self) -> int:
-        """Returns the notify user seconds per tick
+    def cache_guilds(self) -> int:
+        """Returns the maximum number of cached guild configurations
 
         Returns:
-            int: The notify user seconds per tick
+            int: The maximum number of cached guild configurations
         """
-        return self._config["spt"]["notif_usr"]
+        return self._config["cache"]["guilds"]
+
+    @property
+    def cache_ticket_bots(self) -> int:
+        """Returns the maximum number of guilds with cached ticket bots
+
+        Returns:
+            int: The maximum number of guilds with cached ticket bots
+        """
+        return self._config["cache"]["ticket_bots"]
+
+    @property
+    def cache_staff_roles(self) -> int:
+        """Returns the maximum number of guilds with cached staff roles
+
+        Returns:
+            int: The maximum number of guilds with cached staff roles
+        """
+        return self._config["cache"]["staff_roles"]
+
+    @property
+    def cache_owners_ttl(self) -> int:
+        """Returns the seconds to cache the bot owners for
+
+        Returns:
+            int: The seconds to cache the bot owners for
+        """
+        return self._config["cache"]["owners_ttl"]
+
+    @property
+    def cache_ttl(self) -> int:
+        """Returns the seconds to cache guild configurations, ticket bots and staff roles for
+
+        Returns:
+            int: The seconds to cache guild configurations, ticket bots and staff roles for
+        """
+        return self._config["cache"]["ttl"]
+
+    @property
+    def dm_concurrency(self) -> int:
+        """Returns the maximum number of direct messages sent at once
+
+        Returns:
+            int: The maximum number of direct messages sent at once
+        """
+        return self._config["dm"]["concurrency"]
+
+    @property
+    def roles_concurrency(self) -> int:
+        """Returns the maximum number of role removals sent at once
+
+        Returns:
+            int: The maximum number of role removals sent at once
+        """
+        return self._config["roles"]["concurrency"]
+
+    @property
+    def timeout_strip_buttons(self) -> int:
+        """Returns the seconds to wait for a ticket bot message to strip
+
+        Returns:
+            int: The seconds to wait for a ticket bot message to strip
+        """
+        return self._config["timeout"]["strip_buttons"]
+
+    @property
+    def timeout_ratelimit(self) -> float:
+        """Returns the seconds a request may wait on a rate limit before it fails
+
+        Returns:
+            float: The seconds a request may wait on a rate limit before it fails
+        """
+        return self._config["timeout"]["ratelimit"]
+
+    @property
+    def discovery_cache_size(self) -> int:
+        """Returns the maximum number of messages cached for discovery
+
+        Returns:
+            int: The maximum number of messages cached for discovery
+        """
+        return self._config["discovery"]["cache_size"]
+
+    @property
+    def discovery_ttl(self) -> int:
+        """Returns the seconds a message is cached for discovery
+
+        Returns:
+            int: The seconds a message is cached for discovery
+        """
+        return self._config["discovery"]["ttl"]
+
+    @property
+    def discovery_max_links(self) -> int:
+        """Returns the maximum number of links discovered per message
+
+        Returns:
+            int: The maximum number of links discovered per message
+        """
+        return self._config["discovery"]["max_links"]
+
+    @property
+    def jobs_workers(self) -> int:
+        """Returns the number of background jobs run at once
+
+        Returns:
+            int: The number of background jobs run at once
+        """
+        return self._config["jobs"]["workers"]
+
+    @property
+    def jobs_depth(self) -> int:
+        """Returns the maximum number of background jobs waiting to run
+
+        Returns:
+            int: The maximum number of background jobs waiting to run
+        """
+        return self._config["jobs"]["depth"]
+
+    @property
+    def jobs_history(self) -> int:
+        """Returns the maximum number of finished background jobs remembered
+
+        Returns:
+            int: The maximum number of finished background jobs remembered
+        """
+        return self._config["jobs"]["history"]
+
+    @property
+    def jobs_drain_timeout(self) -> float:
+        """Returns the seconds to wait for running background jobs on shutdown
+
+        Returns:
+            float: The seconds to wait for running background jobs on shutdown
+        """
+        return self._config["jobs"]["drain_timeout"]
+
+    @property
+    def querylog_slow(self) -> float:
+        """Returns the seconds after which a query is logged as slow
+
+        Returns:
+            float: The seconds after which a query is logged as slow
+        """
+        return self._config["querylog"]["slow"]
+
+    @property
+    def querylog_max_statements(self) -> int:
+        """Returns the maximum number of statements per operation before it's flagged
+
+        Returns:
+            int: The maximum number of statements per operation before it's flagged
+        """
+        return self._config["querylog"]["max_statements"]
+
+    @property
+    def querylog_explain(self) -> bool:
+        """Returns whether to log the query plan of flagged operations
+
+        Returns:
+            bool: Whether to log the query plan of flagged operations
+        """
+        return self._config["querylog"]["explain"]
@@ -11,6 +11,18 @@ This is due to efficiency concerns.
 If you need to load a relationship, you can use the options argument, which
 is a list of `sqlalchemy.sql.base.ExecutableOption`s.
 For more information on `ExecutableOption`s, see the SQLAlchemy documentation.
+Guild configurations are additionally cached per-process, see
+`tickets_plus.database.cache`. Committing changes to a guild
+through this layer invalidates its cached configuration.
+Changes made around this layer, like bulk updates or another
+process, are picked up once the entry expires, see `cache.ttl`.
+The get-or-create methods look the row up first, so existing rows
+are only read. Missing rows are inserted with a single dialect-native
+`INSERT ... ON CONFLICT DO NOTHING ... RETURNING` statement,
+so they are safe to call concurrently. Only PostgreSQL and SQLite
+are supported. Use the fetch methods if you only read.
+The statements of the routine queries are built by module functions,
+so the toolbox explains the same statements the bot sends.
 
 Typical usage example:
     ```py
@@ -29,18 +41,264 @@ Typical usage example:
 # in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
 # If later approved by the Initial Contributor, GPL-3.0-or-later.
 
+from __future__ import annotations
+
 import datetime
+import itertools
 import types
-from typing import Any, Sequence, Tuple, Type
+from typing import (TYPE_CHECKING, Any, Collection, Dict, FrozenSet, Mapping, Sequence, Tuple, Type, TypeVar)
 
 import discord
+import sqlalchemy
 from discord import utils
-from discord.ext import commands
-from sqlalchemy import sql
+from sqlalchemy import event, orm, sql
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext import asyncio as sa_asyncio
 from sqlalchemy.sql import base
 
-from tickets_plus.database import models
+from tickets_plus.database import cache, models
+
+if TYPE_CHECKING:
+    from tickets_plus import bot
+
+_TOUCHED_GUILDS = "tickets_plus_touched_guilds"
+"""The session info key under which the changed guild IDs are kept."""
+_TOUCHED_TICKETS = "tickets_plus_touched_tickets"
+"""The session info key under which the changed tickets are kept."""
+_TICKET_UPDATES = "tickets_plus_ticket_updates"
+"""The session info key under which the updated ticket columns are kept."""
+_TOUCHED_BOTS = "tickets_plus_touched_ticket_bots"
+"""The session info key under which the guild IDs with changed ticket bots are kept."""
+_TOUCHED_STAFF = "tickets_plus_touched_staff_roles"
+"""The session info key under which the guild IDs with changed staff roles are kept."""
+_INDEX_BATCH = 10000
+"""How many rows to fetch at once when loading the ticket index."""
+_RESPONSE_BATCH = 5000
+"""How many tickets to update per statement when flushing responses."""
+_ModelT = TypeVar("_ModelT", bound=models.Base)
+
+
+@event.listens_for(orm.Session, "before_flush")
+# pylint: disable=unused-argument
+def _track_changes(session: orm.Session, flush_context: orm.UOWTransaction, instances: Any) -> None:
+    """Records the guilds, tickets, ticket bots and staff roles changed in a session.
+
+    Runs before every flush, including the one done by commit.
+    The records are used to invalidate the guild cache and
+    to update the ticket index, once the changes are actually committed.
+    The same goes for the ticket bot and staff role caches.
+
+    Args:
+        session: The flushed session.
+        flush_context: The unit of work. Unused.
+        instances: Deprecated by SQLAlchemy. Unused.
+    """
+    guilds = session.info.setdefault(_TOUCHED_GUILDS, set())
+    tickets = session.info.setdefault(_TOUCHED_TICKETS, set())
+    bots = session.info.setdefault(_TOUCHED_BOTS, set())
+    staff = session.info.setdefault(_TOUCHED_STAFF, set())
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, models.Guild):
+            guilds.add(obj.guild_id)
+        elif isinstance(obj, models.Ticket):
+            tickets.add(obj)
+        elif isinstance(obj, models.TicketBot):
+            bots.add(obj.guild_id)
+        elif isinstance(obj, models.StaffRole):
+            staff.add(obj.guild_id)
+
+
+def _snapshot(obj: models.Base) -> dict[str, Any]:
+    """Takes a snapshot of the column values of a row.
+
+    Args:
+        obj: The loaded row.
+
+    Returns:
+        dict[str, Any]: The column values, keyed by attribute name.
+    """
+    return {attr.key: getattr(obj, attr.key) for attr in obj.__mapper__.column_attrs}
+
+
+def _hydrate(model: Type[models.Base], snapshot: dict[str, Any]) -> Any:
+    """Turns a snapshot back into a row.
+
+    The returned row is detached, as if it was loaded from the database,
+    so it can be added to a session without emitting an INSERT.
+    Relationships are not loaded.
+
+    Args:
+        model: The model of the row.
+        snapshot: The column values, as returned by `_snapshot`.
+
+    Returns:
+        Any: The detached row.
+    """
+    obj = model(**snapshot)
+    orm.make_transient_to_detached(obj)
+    # Not all models implement the snowflake protocol.
+    reconstructor = getattr(obj, "init_on_load", None)
+    if reconstructor is not None:
+        reconstructor()
+    return obj
+
+
+def _is_loaded(obj: models.Base) -> bool:
+    """Checks if all column values of a row are loaded.
+
+    Args:
+        obj: The row in the session.
+
+    Returns:
+        bool: False if any column is expired or was deferred.
+    """
+    return sqlalchemy.inspect(obj).unloaded.isdisjoint(obj.__mapper__.column_attrs.keys())
+
+
+def _refresh(obj: models.Base, snapshot: dict[str, Any]) -> None:
+    """Loads the missing column values of a row from a snapshot.
+
+    Rows in the session are expired on rollback,
+    and partially loaded rows are missing the deferred columns.
+    As we can't lazy load in async, we fill them in from the snapshot.
+    Values that are already loaded are left as they are.
+
+    Args:
+        obj: The row in the session.
+        snapshot: The column values, as returned by `_snapshot`.
+    """
+    for key in sqlalchemy.inspect(obj).unloaded & snapshot.keys():
+        orm.attributes.set_committed_value(obj, key, snapshot[key])
+
+
+def _index_guild(index: cache.TicketIndex, guild: Any) -> None:
+    """Updates the ticket index with the features of a guild.
+
+    Args:
+        index: The ticket index.
+        guild: The guild, or any row with its feature columns.
+    """
+    index.update_guild(guild.guild_id, guild.msg_discovery, guild.any_autoclose is not None)
+
+
+def _record(ticket: Any) -> cache.TicketRecord:
+    """Copies the frequently read columns of a ticket into a record.
+
+    Args:
+        ticket: The ticket, or any row with the same columns.
+
+    Returns:
+        cache.TicketRecord: The record.
+    """
+    return cache.TicketRecord(**{key: getattr(ticket, key) for key in cache.TicketRecord.__slots__})
+
+
+def _is_expired(now: datetime.datetime) -> sql.ColumnElement[bool]:
+    """Build the condition matching the members whose status expired.
+
+    Args:
+        now: The current time, in naive UTC.
+
+    Returns:
+        sql.ColumnElement[bool]: The condition.
+    """
+    members = models.Member.__table__
+    # The status check lets the database use the partial index.
+    return sql.and_(members.c.status != 0, members.c.status_till <= now)
+
+
+def expired_statuses_query(now: datetime.datetime, limit: int, skip_locked: bool) -> sql.Select:
+    """Build the query selecting a chunk of expired member statuses.
+
+    Used by `OnlineConfig.clear_expired_statuses`,
+    and explained by the toolbox.
+
+    Args:
+        now: The current time, in naive UTC.
+        limit: The maximum number of members to select.
+        skip_locked: Whether to lock the selected members,
+            skipping those locked already. PostgreSQL only.
+
+    Returns:
+        sql.Select: The user ID, guild ID, status, support block role ID
+            and helping block role ID of the expired members.
+    """
+    members = models.Member.__table__
+    guilds = models.Guild.__table__
+    query = sql.select(members.c.user_id, members.c.guild_id, members.c.status, guilds.c.support_block,
+                       guilds.c.helping_block).join(guilds, guilds.c.guild_id == members.c.guild_id).where(
+                           _is_expired(now)).limit(limit)
+    if skip_locked:
+        query = query.with_for_update(of=members, skip_locked=True)
+    return query
+
+
+def clear_statuses_stmt(keys: Collection[Tuple[int, int]], now: datetime.datetime) -> sql.Update:
+    """Build the statement clearing the expired statuses of some members.
+
+    Used by `OnlineConfig.clear_expired_statuses`,
+    and explained by the toolbox.
+
+    Args:
+        keys: The user ID and guild ID of each member.
+        now: The current time, in naive UTC.
+            Members whose status doesn't expire by then are left alone.
+
+    Returns:
+        sql.Update: The statement, returning the keys of the cleared members.
+    """
+    members = models.Member.__table__
+    member_key = sql.tuple_(members.c.user_id, members.c.guild_id)
+    return sql.update(members).where(member_key.in_(keys),
+                                     _is_expired(now)).values(status=0, status_till=None).returning(
+                                         members.c.user_id, members.c.guild_id)
+
+
+def pending_tickets_query(channel_ids: Collection[int] | None = None) -> sql.Select:
+    """Build the query selecting the tickets that may need a close warning.
+
+    Those are the tickets not warned yet, in guilds with close warnings
+    enabled. Whether they are due is checked by the caller.
+    Used by `OnlineConfig.get_pending_tickets`,
+    and explained by the toolbox.
+
+    Args:
+        channel_ids: Only select these tickets.
+            If None, all tickets are selected.
+
+    Returns:
+        sql.Select: The tickets, with their guild loaded.
+    """
+    query = sql.select(models.Ticket).join(models.Guild).filter(models.Guild.warn_autoclose.isnot(None),
+                                                                models.Ticket.notified == sql.false()).options(
+                                                                    orm.contains_eager(models.Ticket.guild))
+    if channel_ids is not None:
+        query = query.filter(models.Ticket.channel_id.in_(channel_ids))
+    return query
+
+
+def warning_deadlines_query(guild_id: int | None = None, channel_ids: Collection[int] | None = None) -> sql.Select:
+    """Build the query selecting what the close warning times are computed from.
+
+    Used by `OnlineConfig.get_warning_deadlines`,
+    and explained by the toolbox.
+
+    Args:
+        guild_id: Only select the tickets of this guild.
+        channel_ids: Only select these tickets.
+
+    Returns:
+        sql.Select: The channel ID, last response time and warning delay
+            of the tickets not warned yet, in guilds with close warnings enabled.
+    """
+    query = sql.select(models.Ticket.channel_id, models.Ticket.last_response,
+                       models.Guild.warn_autoclose).join(models.Guild).filter(models.Guild.warn_autoclose.isnot(None),
+                                                                              models.Ticket.notified == sql.false())
+    if guild_id is not None:
+        query = query.filter(models.Ticket.guild_id == guild_id)
+    if channel_ids is not None:
+        query = query.filter(models.Ticket.channel_id.in_(channel_ids))
+    return query
 
 
 class OnlineConfig:
@@ -51,7 +309,7 @@ class OnlineConfig:
     Any and all commits have to be done manually.
     """
 
-    def __init__(self, bot_instance: commands.AutoShardedBot, session: sa_asyncio.AsyncSession) -> None:
+    def __init__(self, bot_instance: bot.TicketsPlusBot, session: sa_asyncio.AsyncSession) -> None:
         """Initialises the database session layer.
 
         Wraps the provided session in an async context manager.
@@ -110,8 +368,32 @@ class OnlineConfig:
         """Commit the database session.
 
         Commits the underlying SQLAlchemy session.
+        Afterwards, we drop the cached configurations
+        of all guilds changed in this session,
+        and update the ticket index with the changes.
+        The cached ticket bots and staff roles
+        of the changed guilds are dropped too.
         """
         await self._session.commit()
+        index = self._bot.ticket_index
+        for guild_id in self._session.info.pop(_TOUCHED_GUILDS, ()):
+            self._bot.guild_cache.invalidate(guild_id)
+            guild = self._session.identity_map.get(self._session.identity_key(models.Guild, guild_id))
+            if guild is None or sqlalchemy.inspect(guild).was_deleted or not _is_loaded(guild):
+                index.forget_guild(guild_id)
+            else:
+                _index_guild(index, guild)
+        for ticket in self._session.info.pop(_TOUCHED_TICKETS, ()):
+            if sqlalchemy.inspect(ticket).was_deleted:
+                index.remove_ticket(ticket.channel_id)
+            else:
+                index.add_ticket(_record(ticket))
+        for channel_id, values in self._session.info.pop(_TICKET_UPDATES, {}).items():
+            index.update_ticket(channel_id, **values)
+        for guild_id in self._session.info.pop(_TOUCHED_BOTS, ()):
+            self._bot.ticket_bot_cache.invalidate(guild_id)
+        for guild_id in self._session.info.pop(_TOUCHED_STAFF, ()):
+            self._bot.staff_role_cache.invalidate(guild_id)
 
     async def rollback(self) -> None:
         """Rollback the database session.
@@ -120,6 +402,11 @@ class OnlineConfig:
         This includes the flushed changes.
         """
         await self._session.rollback()
+        self._session.info.pop(_TOUCHED_GUILDS, None)
+        self._session.info.pop(_TOUCHED_TICKETS, None)
+        self._session.info.pop(_TICKET_UPDATES, None)
+        self._session.info.pop(_TOUCHED_BOTS, None)
+        self._session.info.pop(_TOUCHED_STAFF, None)
 
     async def delete(self, obj) -> None:
         """Delete a row from the database.
@@ -129,6 +416,203 @@ class OnlineConfig:
         """
         await self._session.delete(obj)
 
+    async def _get_id_set(self, model: Type[models.Base], column: orm.InstrumentedAttribute[int],
+                          id_cache: cache.LRUCache[int,
+                                                   FrozenSet[int]], touched_key: str, guild_id: int) -> FrozenSet[int]:
+        """Get a set of IDs belonging to a guild, through a cache.
+
+        Args:
+            model: The model, which must have a guild_id column.
+            column: The ID column of the model.
+            id_cache: The cache of the ID sets, keyed by guild ID.
+            touched_key: The session info key under which
+                the guilds with changed rows are kept.
+            guild_id: The guild ID.
+
+        Returns:
+            FrozenSet[int]: The IDs.
+        """
+        # The cache is outdated if the rows changed in this session.
+        touched = guild_id in self._session.info.get(touched_key, ())
+        ids = None if touched else id_cache.get(guild_id)
+        if ids is not None:
+            return ids
+        stamp = id_cache.stamp()
+        ids = frozenset(await self._session.scalars(sql.select(column).where(model.guild_id == guild_id)))
+        if not touched:
+            # Only cache what is known to be committed.
+            id_cache.put(guild_id, ids, stamp)
+        return ids
+
+    async def _get_or_create(self,
+                             model: Type[_ModelT],
+                             values: dict[str, Any],
+                             related: dict[str, Any] | None = None,
+                             guild_id: int | None = None) -> Tuple[bool, _ModelT]:
+        """Get or create a row.
+
+        Looks the row up by its primary key first, so getting a row
+        that exists is a single SELECT, and never writes.
+        Only if it's missing is it inserted, see `_create`.
+        Rows of a guild are loaded along with their guild,
+        which is only got or created if the row is missing.
+        The insert is not committed.
+
+        Args:
+            model: The model of the row.
+            values: The column values to insert.
+                Must contain the whole primary key.
+            related: Already loaded related rows, keyed by relationship name.
+            guild_id: The guild of the row, if it has a guild relationship.
+
+        Returns:
+            Tuple[bool, _ModelT]: A tuple containing a boolean
+                indicating if the row was created, and the row.
+        """
+        related = dict(related or {})
+        ident = tuple(values[col.key] for col in model.__mapper__.primary_key)
+        options = [] if guild_id is None else [orm.joinedload(model.guild)]  # type: ignore
+        obj = await self._session.get(model, ident, options=options)
+        if obj is None:
+            if guild_id is not None:
+                related["guild"] = await self.get_guild(guild_id)
+            return await self._create(model, values, related)
+        if guild_id is not None and "guild" in sqlalchemy.inspect(obj).unloaded:
+            # It was already in the session, without its guild.
+            related["guild"] = await self.get_guild(guild_id)
+        for key, value in related.items():
+            orm.attributes.set_committed_value(obj, key, value)
+        return False, obj
+
+    async def _create(self,
+                      model: Type[_ModelT],
+                      values: dict[str, Any],
+                      related: dict[str, Any] | None = None) -> Tuple[bool, _ModelT]:
+        """Create a row in a single statement, unless it exists.
+
+        Inserts the row unless a row with the same primary key exists,
+        and returns whichever row ends up in the database.
+        Use it once the row is known to be missing,
+        so a row created concurrently is still returned.
+        On PostgreSQL, this is a single round trip. The insert is done in
+        a CTE and the existing row is selected alongside it.
+        On SQLite, the select is only issued if nothing was inserted.
+        The row is added to the session, but only the relationships
+        provided in related are loaded. The insert is not committed.
+
+        Args:
+            model: The model of the row.
+            values: The column values to insert.
+                Must contain the whole primary key.
+            related: Already loaded related rows, keyed by relationship name.
+
+        Returns:
+            Tuple[bool, _ModelT]: A tuple containing a boolean
+                indicating if the row was created, and the row.
+        """
+        table = model.__table__
+        keys = model.__mapper__.primary_key
+        ident = tuple(values[col.key] for col in keys)
+        existing = sql.select(*table.c, sql.false().label("created")).where(*(col == values[col.key] for col in keys))
+        if self._session.bind.dialect.name == "postgresql":
+            inserted = postgresql.insert(table).values(**values).on_conflict_do_nothing().returning(*table.c)
+            created = inserted.cte("created")
+            query = sql.union_all(sql.select(*created.c, sql.true().label("created")), existing)
+            row = (await self._session.execute(query)).first()
+        else:
+            inserted = sqlite.insert(table).values(**values).on_conflict_do_nothing()
+            row = (await self._session.execute(inserted.returning(*table.c, sql.true().label("created")))).first()
+            if row is None:
+                row = (await self._session.execute(existing)).first()
+        if row is None:
+            # A concurrent insert was committed after our snapshot was taken.
+            row = (await self._session.execute(existing)).one()
+        new = bool(row.created)
+        snapshot = {col.key: getattr(row, col.name) for col in table.c}
+        obj = self._session.identity_map.get(self._session.identity_key(model, ident))
+        if obj is None:
+            obj = _hydrate(model, snapshot)
+            self._session.add(obj)
+        else:
+            _refresh(obj, snapshot)
+        for key, value in (related or {}).items():
+            orm.attributes.set_committed_value(obj, key, value)
+        return new, obj
+
+    async def _get_guild_rows(self, model: Type[_ModelT], guild_id: int) -> Sequence[_ModelT]:
+        """Get all rows of a guild, with the guild attached.
+
+        The guild relationship of the rows is a selectin load,
+        which does not look in the session for the guild.
+        So the guild is read with fetch_guild, usually from the cache,
+        and attached instead, rather than selecting it again.
+        Nothing is created, a guild without a row has no rows.
+
+        Args:
+            model: The model of the rows, which must have a guild relationship.
+            guild_id: The guild ID.
+
+        Returns:
+            Sequence[_ModelT]: The rows. Relationships are loaded.
+        """
+        guild = await self.fetch_guild(guild_id)
+        if guild is None:
+            return []
+        rows = (await self._session.scalars(
+            sql.select(model).where(model.guild_id == guild.guild_id).options(orm.raiseload(model.guild)))).all()
+        for row in rows:
+            orm.attributes.set_committed_value(row, "guild", guild)
+        return rows
+
+    async def fetch_guild(self,
+                          guild_id: int,
+                          options: Sequence[base.ExecutableOption] | None = None) -> models.Guild | None:
+        """Fetch a guild from the database.
+
+        Attempts to fetch a guild from the database.
+        If the guild does not exist, None is returned.
+        Nothing is created, so use this when you only need
+        to read the configuration. Guilds without a row
+        have the default configuration.
+        If no options are provided, the guild is served from the
+        guild cache when possible, without a database round trip.
+
+        Args:
+            guild_id: The guild ID.
+            options: The options to use when querying the database.
+                Those options are mostly used for relationship loading.
+                As in async, we can't use lazy loading.
+
+        Returns:
+            models.Guild | None: The guild.
+                With the relationships loaded if options are provided.
+                Otherwise, attempting to access the relationships will
+                result in an error.
+        """
+        known = self._session.identity_map.get(self._session.identity_key(models.Guild, guild_id))
+        query = sql.select(models.Guild).where(models.Guild.guild_id == guild_id)
+        if options:
+            query = query.options(*options)
+        else:
+            if known is not None and _is_loaded(known):
+                return known
+            snapshot = self._bot.guild_cache.get(guild_id)
+            if snapshot is not None:
+                if known is None:
+                    known = _hydrate(models.Guild, snapshot)
+                    self._session.add(known)
+                else:
+                    _refresh(known, snapshot)
+                return known
+        # A commit elsewhere while we read makes what we read outdated.
+        stamp = self._bot.guild_cache.stamp()
+        guild_conf = await self._session.scalar(query)
+        if guild_conf is not None and known is None and guild_id not in self._session.info.get(_TOUCHED_GUILDS, ()):
+            # Only cache what is known to be committed.
+            self._bot.guild_cache.put(guild_id, _snapshot(guild_conf), stamp)
+            _index_guild(self._bot.ticket_index, guild_conf)
+        return guild_conf
+
     async def get_guild(self, guild_id: int, options: Sequence[base.ExecutableOption] | None = None) -> models.Guild:
         """Get or create a guild from the database.
 
@@ -137,6 +621,8 @@ class OnlineConfig:
         we guarantee a guild will always be returned.
         It will be created if it does not exist.
         However, we do not commit the changes.
+        Existing guilds are read like in fetch_guild,
+        so only missing guilds are written.
 
         Args:
             guild_id: The guild ID.
@@ -150,14 +636,19 @@ class OnlineConfig:
                 Otherwise, attempting to access the relationships will
                 result in an error.
         """
-        if options:
+        guild_conf = await self.fetch_guild(guild_id, options)
+        if guild_conf is not None:
+            return guild_conf
+        new, guild_conf = await self._create(models.Guild, {"guild_id": guild_id})
+        if new:
+            # Not committed yet, so it must not be cached.
+            self._session.info.setdefault(_TOUCHED_GUILDS, set()).add(guild_id)
+            for rel in models.Guild.__mapper__.relationships:
+                orm.attributes.set_committed_value(guild_conf, rel.key, [])
+        elif options:
+            # Created concurrently, load the relationships.
             guild_conf = await self._session.scalar(
                 sql.select(models.Guild).where(models.Guild.guild_id == guild_id).options(*options))
-        else:
-            guild_conf = await self._session.scalar(sql.select(models.Guild).where(models.Guild.guild_id == guild_id))
-        if guild_conf is None:
-            guild_conf = models.Guild(guild_id=guild_id)
-            self._session.add(guild_conf)
         return guild_conf
 
     async def get_user(self, user_id: int, options: Sequence[base.ExecutableOption] | None = None) -> models.User:
@@ -181,23 +672,58 @@ class OnlineConfig:
                 Otherwise, attempting to access the relationships will
                 result in an error.
         """
-        if options:
-            user = await self._session.scalar(
-                sql.select(models.User).where(models.User.user_id == user_id).options(*options))
+        query = sql.select(models.User).where(models.User.user_id == user_id)
+        if not options:
+            new, user = await self._get_or_create(models.User, {"user_id": user_id})
         else:
-            user = await self._session.scalar(sql.select(models.User).where(models.User.user_id == user_id))
-        if user is None:
-            user = models.User(user_id=user_id)
-            self._session.add(user)
+            user = await self._session.scalar(query.options(*options))
+            if user is not None:
+                return user
+            new, user = await self._create(models.User, {"user_id": user_id})
+        if new:
+            orm.attributes.set_committed_value(user, "memberships", [])
+        elif options:
+            # Created concurrently, load the relationships.
+            user = await self._session.scalar(query.options(*options))
         return user
 
+    async def fetch_member(self, user_id: int, guild_id: int) -> models.Member | None:
+        """Fetch a member from the database.
+
+        Attempts to fetch a member from the database.
+        If the member does not exist, None is returned.
+        This is a single primary key lookup, with the block settings
+        of the guild joined in. Nothing is created, so use this
+        when you only need to read the member.
+        If you want to create a member if it does not exist,
+        use get_member instead.
+
+        Args:
+            user_id: The user ID.
+            guild_id: The guild ID.
+
+        Returns:
+            models.Member | None: The member.
+                The guild relationship is loaded, but only with
+                the block related columns. The user relationship
+                is not loaded.
+        """
+        member_conf = await self._session.get(models.Member, (user_id, guild_id),
+                                              options=[
+                                                  orm.joinedload(models.Member.guild).load_only(
+                                                      models.Guild.support_block, models.Guild.helping_block,
+                                                      models.Guild.strip_roles),
+                                                  orm.raiseload(models.Member.user),
+                                              ])
+        return member_conf
+
     async def get_member(self, user_id: int, guild_id: int) -> models.Member:
         """Get or create a member from the database.
 
         Fetches a member from the database.
         If the member does not exist, it will be created.
-        We also check if the guild exists and create it if it does not.
-        We also check if the user exists and create it if it does not.
+        Only then do we check if the guild and the user exist,
+        and create them if they do not.
 
         Args:
             user_id: The user ID.
@@ -206,30 +732,80 @@ class OnlineConfig:
         Returns:
             models.Member: The member.
                 As members have a one-to-one relationship with guilds,
-                and a one-to-one relationship with users, we automatically
-                load the guild and user relationships.
+                we automatically load the guild relationship.
+                The user relationship is only loaded on creation.
         """
+        member_conf = await self.fetch_member(user_id, guild_id)
+        if member_conf is not None:
+            return member_conf
         guild = await self.get_guild(guild_id)
         user = await self.get_user(user_id)
-        member_conf = await self._session.scalar(
-            sql.select(models.Member).where(models.Member.user == user, models.Member.guild == guild))
-        if member_conf is None:
-            member_conf = models.Member(user=user, guild=guild)
-            self._session.add(member_conf)
+        keys = {"user_id": user_id, "guild_id": guild_id}
+        _, member_conf = await self._create(models.Member, keys, {"guild": guild, "user": user})
         return member_conf
 
-    async def get_expired_members(self) -> Sequence[models.Member]:
-        """Get expired members from the database.
+    async def clear_expired_statuses(self, limit: int) -> Sequence[Tuple[int, int, int, int | None, int | None]]:
+        """Clear a chunk of expired member statuses.
 
-        Fetches all members with expired status from the database.
-        Used to clean up the roles.
+        Selects up to `limit` members whose status has expired,
+        with their old status and the block roles of their guilds,
+        so the caller can remove the roles, or restore the status
+        with `restore_statuses` if that fails.
+        Then resets their status in a single UPDATE ... RETURNING.
+        On PostgreSQL, rows locked by another transaction are skipped.
+
+        Args:
+            limit: The maximum number of statuses to clear.
+
+        Returns:
+            Sequence[Tuple[int, int, int, int | None, int | None]]: The user ID,
+                guild ID, old status, support block role ID and helping block
+                role ID of each cleared member.
+        """
+        now = datetime.datetime.utcnow()
+        found = (await self._session.execute(
+            expired_statuses_query(now, limit, self._session.bind.dialect.name == "postgresql"))).tuples().all()
+        if not found:
+            return []
+        # The status is checked again, it may have changed since the select on SQLite.
+        cleared = await self._session.execute(clear_statuses_stmt([member[:2] for member in found], now))
+        cleared_members = set(cleared.tuples().all())
+        return [member for member in found if member[:2] in cleared_members]
+
+    async def restore_statuses(self, statuses: Collection[Tuple[int, int, int]], till: datetime.datetime) -> None:
+        """Give cleared statuses back, until a new expiry time.
+
+        Used when the block roles of a cleared status
+        could not be removed, so it is cleared again later.
+        Members given a new status in the meantime are left alone.
+
+        Args:
+            statuses: The user ID, guild ID and old status of each member.
+            till: The new expiry time of the statuses.
+        """
+        if not statuses:
+            return
+        members = models.Member.__table__
+        stmt = sql.update(members).where(members.c.user_id == sql.bindparam("usr"),
+                                         members.c.guild_id == sql.bindparam("gld"),
+                                         members.c.status == 0).values(status=sql.bindparam("sts"), status_till=till)
+        await self._session.execute(stmt, [{"usr": usr, "gld": gld, "sts": sts} for usr, gld, sts in statuses])
+
+    async def get_status_deadlines(self) -> Sequence[Tuple[int, int, datetime.datetime]]:
+        """Get the status expiry times of all members.
+
+        Fetches the members with a temporary status.
+        Used to schedule the status cleanup.
 
         Returns:
-            Sequence[models.Member]: The members with expired status.
+            Sequence[Tuple[int, int, datetime.datetime]]: The user ID,
+                guild ID and status expiry time of each member.
         """
-        time = datetime.datetime.utcnow()
-        expr_members = await self._session.scalars(sql.select(models.Member).where(models.Member.status_till <= time))
-        return expr_members.all()
+        deadlines = await self._session.execute(
+            sql.select(models.Member.user_id,
+                       models.Member.guild_id, models.Member.status_till).where(models.Member.status != 0,
+                                                                                models.Member.status_till.isnot(None)))
+        return deadlines.tuples().all()
 
     async def get_ticket_bot(self, user_id: int, guild_id: int) -> Tuple[bool, models.TicketBot]:
         """Get or create a ticket bot from the database.
@@ -247,15 +823,15 @@ class OnlineConfig:
                 indicating if the ticket bot was created, and the ticket bot.
                 Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        ticket_user = await self._session.scalar(
-            sql.select(models.TicketBot).where(models.TicketBot.user_id == user_id, models.TicketBot.guild == guild))
-        new = False
-        if ticket_user is None:
-            new = True
-            ticket_user = models.TicketBot(user_id=user_id, guild=guild)
-            self._session.add(ticket_user)
-        return new, ticket_user
+        new, ticket_bot = await self._get_or_create(models.TicketBot, {
+            "user_id": user_id,
+            "guild_id": guild_id
+        },
+                                                    guild_id=guild_id)
+        if new:
+            # Inserted without a flush, so we record it ourselves.
+            self._session.info.setdefault(_TOUCHED_BOTS, set()).add(guild_id)
+        return new, ticket_bot
 
     async def check_ticket_bot(self, user_id: int, guild_id: int) -> bool:
         """Check if the ticket user exists.
@@ -275,9 +851,26 @@ class OnlineConfig:
         """
         ticket_user = await self._session.scalar(
             sql.select(models.TicketBot).where(models.TicketBot.user_id == user_id,
-                                               models.TicketBot.guild_id == guild_id))
+                                               models.TicketBot.guild_id == guild_id).options(
+                                                   orm.raiseload(models.TicketBot.guild)))
         return ticket_user is not None
 
+    async def get_ticket_bot_ids(self, guild_id: int) -> FrozenSet[int]:
+        """Get the user IDs of all ticket bots of a guild.
+
+        Lets the caller check many users with a single lookup.
+        The IDs are served from the bot's ticket bot cache
+        if possible, and cached otherwise.
+
+        Args:
+            guild_id: The guild ID.
+
+        Returns:
+            FrozenSet[int]: The user IDs of the ticket bots.
+        """
+        return await self._get_id_set(models.TicketBot, models.TicketBot.user_id, self._bot.ticket_bot_cache,
+                                      _TOUCHED_BOTS, guild_id)
+
     async def get_ticket_type(self,
                               guild_id: int,
                               name: str,
@@ -304,26 +897,21 @@ class OnlineConfig:
                 indicating if the ticket type was created, and the ticket type.
                 Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        ticket_type = await self._session.scalar(
-            sql.select(models.TicketType).where(models.TicketType.guild == guild, models.TicketType.prefix == name))
-        new = False
-        if ticket_type is None:
-            new = True
-            ticket_type = models.TicketType(guild=guild,
-                                            prefix=name,
-                                            comping=comping,
-                                            comaccs=comaccs,
-                                            strpbuttns=strpbuttns,
-                                            ignore=ignore)
-            self._session.add(ticket_type)
-        return new, ticket_type
+        return await self._get_or_create(models.TicketType, {
+            "guild_id": guild_id,
+            "prefix": name,
+            "comping": comping,
+            "comaccs": comaccs,
+            "strpbuttns": strpbuttns,
+            "ignore": ignore
+        },
+                                         guild_id=guild_id)
 
     async def get_ticket_types(self, guild_id: int) -> Sequence[models.TicketType]:
         """Get ticket types from the database.
 
         Fetches all ticket types from the database.
-        We also check if the guild exists and create it if it does not.
+        Nothing is created, guilds without a row have none.
 
         Args:
             guild_id: The guild ID.
@@ -331,10 +919,7 @@ class OnlineConfig:
         Returns:
             Sequence[models.TicketType]: The ticket types.
         """
-        guild = await self.get_guild(guild_id)
-        ticket_types = await self._session.scalars(
-            sql.select(models.TicketType).where(models.TicketType.guild == guild))
-        return ticket_types.all()
+        return await self._get_guild_rows(models.TicketType, guild_id)
 
     async def fetch_ticket(self, channel_id: int) -> models.Ticket | None:
         """Fetch a ticket from the database.
@@ -343,16 +928,118 @@ class OnlineConfig:
         If the ticket does not exist, None is returned.
         If you want to create a ticket if it does not exist,
         use get_ticket instead.
+        Only the ticket row is loaded, the guild is not,
+        use get_guild if you need it.
 
         Args:
             channel_id: The channel ID.
 
         Returns:
             models.Ticket | None: The ticket.
+                Attempting to access its guild will result in an error,
+                unless it was already loaded in this session.
         """
-        ticket = await self._session.get(models.Ticket, channel_id)
+        ticket = await self._session.get(models.Ticket, channel_id, options=[orm.raiseload(models.Ticket.guild)])
         return ticket
 
+    async def fetch_ticket_record(self, channel_id: int) -> cache.TicketRecord | None:
+        """Fetch the record of a ticket.
+
+        Prefer this to fetch_ticket if you only read the ticket.
+        Once the ticket index is loaded, this never touches the database.
+        Before that, only the ticket row is loaded.
+
+        Args:
+            channel_id: The channel ID.
+
+        Returns:
+            cache.TicketRecord | None: The record, or None if the
+                channel is not a ticket.
+        """
+        if self._bot.ticket_index.ready:
+            return self._bot.ticket_index.get_ticket(channel_id)
+        ticket = await self._session.get(models.Ticket, channel_id, options=[orm.raiseload(models.Ticket.guild)])
+        return None if ticket is None else _record(ticket)
+
+    async def fetch_thread_record(self, thread_id: int) -> cache.TicketRecord | None:
+        """Fetch the record of a ticket by its staff notes thread.
+
+        Works like fetch_ticket_record, but looks up the ticket
+        by the ID of its staff notes thread.
+
+        Args:
+            thread_id: The thread ID.
+
+        Returns:
+            cache.TicketRecord | None: The record, or None if the
+                thread is not the staff notes of a ticket.
+        """
+        if self._bot.ticket_index.ready:
+            return self._bot.ticket_index.get_thread(thread_id)
+        ticket = await self._session.scalar(
+            sql.select(models.Ticket).where(models.Ticket.staff_note_thread == thread_id).options(
+                orm.raiseload(models.Ticket.guild)))
+        return None if ticket is None else _record(ticket)
+
+    async def update_ticket(self, channel_id: int, **values: Any) -> None:
+        """Update the columns of a ticket.
+
+        Issues the UPDATE right away, without loading the ticket.
+        The record in the ticket index is updated once
+        the change is committed.
+
+        Args:
+            channel_id: The channel ID.
+            **values: The new column values, keyed by column name.
+        """
+        await self._session.execute(
+            sql.update(models.Ticket).where(models.Ticket.channel_id == channel_id).values(**values))
+        self._session.info.setdefault(_TICKET_UPDATES, {}).setdefault(channel_id, {}).update(values)
+
+    async def set_notified(self, channel_ids: Collection[int]) -> None:
+        """Mark tickets as warned about closing.
+
+        Issues a single UPDATE for all the tickets.
+        The records in the ticket index are updated once
+        the change is committed.
+
+        Args:
+            channel_ids: The channel IDs of the tickets.
+        """
+        await self._session.execute(
+            sql.update(models.Ticket).where(models.Ticket.channel_id.in_(channel_ids)).values(notified=True))
+        updates = self._session.info.setdefault(_TICKET_UPDATES, {})
+        for channel_id in channel_ids:
+            updates.setdefault(channel_id, {})["notified"] = True
+
+    async def update_responses(self, responses: Mapping[int, datetime.datetime]) -> None:
+        """Set the last response time of many tickets at once.
+
+        On PostgreSQL, this is a single UPDATE ... FROM (VALUES ...)
+        per batch. Elsewhere, the same UPDATE is executed for each ticket.
+        Tickets that no longer exist are skipped.
+        The ticket index is not touched, as the response buffer
+        already updated it.
+
+        Args:
+            responses: The response times, keyed by channel ID.
+        """
+        table = models.Ticket.__table__
+        items = list(responses.items())
+        if self._session.bind.dialect.name != "postgresql":
+            stmt = sql.update(table).where(table.c.channel_id == sql.bindparam("ticket")).values(
+                last_response=sql.bindparam("when"))
+            if items:
+                await self._session.execute(stmt, [{"ticket": ticket, "when": when} for ticket, when in items])
+            return
+        for start in range(0, len(items), _RESPONSE_BATCH):
+            values = sql.values(sql.column("channel_id", table.c.channel_id.type),
+                                sql.column("last_response", table.c.last_response.type),
+                                name="responses").data(items[start:start + _RESPONSE_BATCH])
+            await self._session.execute(
+                sql.update(table).values(last_response=values.c.last_response).where(
+                    table.c.channel_id == values.c.channel_id))
+
     async def get_ticket(self,
                          channel_id: int,
                          guild_id: int,
@@ -377,28 +1064,80 @@ class OnlineConfig:
                 indicating if the ticket was created, and the ticket.
                 Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        ticket = await self._session.get(models.Ticket, channel_id)
-        new = False
-        if ticket is None:
-            new = True
-            ticket = models.Ticket(channel_id=channel_id, guild=guild, user_id=user_id, staff_note_thread=staff_note)
-            self._session.add(ticket)
+        new, ticket = await self._get_or_create(models.Ticket, {
+            "channel_id": channel_id,
+            "guild_id": guild_id,
+            "user_id": user_id,
+            "staff_note_thread": staff_note
+        },
+                                                guild_id=guild_id)
+        if new:
+            # Inserted without a flush, so we record it ourselves.
+            self._session.info.setdefault(_TOUCHED_TICKETS, set()).add(ticket)
         return new, ticket
 
-    async def get_pending_tickets(self) -> Sequence[models.Ticket]:
+    async def load_ticket_index(self) -> None:
+        """Load the ticket index from the database.
+
+        Replaces the contents of the bot's ticket index with
+        the features of all guilds and all open tickets.
+        The rows are streamed, as there may be a lot of them.
+        Once done, the index is marked as ready.
+        """
+        index = self._bot.ticket_index
+        index.clear()
+        guilds = await self._session.stream(
+            sql.select(models.Guild.guild_id, models.Guild.msg_discovery,
+                       models.Guild.any_autoclose).execution_options(yield_per=_INDEX_BATCH))
+        async for row in guilds:
+            _index_guild(index, row)
+        columns = [models.Ticket.__table__.c[key] for key in cache.TicketRecord.__slots__]
+        tickets = await self._session.stream(sql.select(*columns).execution_options(yield_per=_INDEX_BATCH))
+        async for row in tickets:
+            index.add_ticket(_record(row))
+        index.ready = True
+
+    async def get_pending_tickets(self, channel_ids: Collection[int] | None = None) -> Sequence[models.Ticket]:
         """Get pending tickets from the database.
 
         Fetches all pending tickets from the database.
+        Those are the tickets whose user should be warned
+        about the ticket closing soon.
+        The warning time depends on the guild, and SQLite has no
+        interval arithmetic, so the deadlines are compared here,
+        like in get_warning_deadlines.
+
+        Args:
+            channel_ids: Only check these tickets.
+                If None, all tickets are checked.
 
         Returns:
             Sequence[models.Ticket]: The pending tickets.
+                The guild relationship is loaded.
         """
-        tickets = await self._session.scalars(
-            sql.select(models.Ticket).join(models.Guild).filter(
-                models.Guild.warn_autoclose.isnot(None), models.Ticket.notified.isnot(True), models.Ticket.last_response
-                <= models.UTCnow() - models.Guild.warn_autoclose))
-        return tickets.all()
+        tickets = await self._session.scalars(pending_tickets_query(channel_ids))
+        now = datetime.datetime.utcnow()
+        return [ticket for ticket in tickets if ticket.last_response + ticket.guild.warn_autoclose <= now]
+
+    async def get_warning_deadlines(self,
+                                    guild_id: int | None = None,
+                                    channel_ids: Collection[int] | None = None) -> Dict[int, datetime.datetime]:
+        """Get the times at which ticket users should be warned.
+
+        Fetches the tickets that were not warned yet,
+        in guilds with close warnings enabled.
+        Used to schedule the warnings.
+
+        Args:
+            guild_id: Only check the tickets of this guild.
+            channel_ids: Only check these tickets.
+
+        Returns:
+            Dict[int, datetime.datetime]: The warning times,
+                keyed by channel ID.
+        """
+        deadlines = await self._session.execute(warning_deadlines_query(guild_id, channel_ids))
+        return {channel_id: last_response + warn for channel_id, last_response, warn in deadlines.tuples()}
 
     async def fetch_tag(self, guild_id: int, tag: str) -> discord.Embed | str | None:
         """Fetch a tag from the database.
@@ -415,9 +1154,9 @@ class OnlineConfig:
         Returns:
             discord.Embed | str | None: The tag.
         """
-        guild = await self.get_guild(guild_id)
         embed = await self._session.scalar(
-            sql.select(models.Tag).where(models.Tag.guild == guild, models.Tag.tag_name == tag))
+            sql.select(models.Tag).where(models.Tag.guild_id == guild_id,
+                                         models.Tag.tag_name == tag).options(orm.raiseload(models.Tag.guild)))
         if embed is None:
             return None
         if embed.title:
@@ -457,23 +1196,21 @@ class OnlineConfig:
                 Basically, the arguments to pass to discord.Embed,
                 when using discord.Embed.from_dict.
         """
-        guild = await self.get_guild(guild_id)
-        tag = await self._session.scalar(
-            sql.select(models.Tag).where(models.Tag.guild == guild, models.Tag.tag_name == tag_name))
-        new = False
-        if tag is None:
-            new = True
-            if embed_args is None:
-                embed_args = {}
-            tag = models.Tag(guild=guild, tag_name=tag_name, description=description, **embed_args)
-            self._session.add(tag)
-        return new, tag
+        if embed_args is None:
+            embed_args = {}
+        return await self._get_or_create(models.Tag, {
+            "guild_id": guild_id,
+            "tag_name": tag_name,
+            "description": description,
+            **embed_args
+        },
+                                         guild_id=guild_id)
 
     async def get_tags(self, guild_id: int) -> Sequence[models.Tag]:
         """Get tags from the database.
 
         Fetches all tags from the database.
-        We also check if the guild exists and create it if it does not.
+        Nothing is created, guilds without a row have none.
 
         Args:
             guild_id: The guild ID.
@@ -481,9 +1218,7 @@ class OnlineConfig:
         Returns:
             Sequence[models.Tag]: The tags.
         """
-        guild = await self.get_guild(guild_id)
-        tags = await self._session.scalars(sql.select(models.Tag).where(models.Tag.guild == guild))
-        return tags.all()
+        return await self._get_guild_rows(models.Tag, guild_id)
 
     async def get_staff_role(self, role_id: int, guild_id: int) -> Tuple[bool, models.StaffRole]:
         """Get or create the staff role from the database.
@@ -501,13 +1236,14 @@ class OnlineConfig:
                 indicating if the staff role was created, and the staff role.
                 Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        staff_role = await self._session.get(models.StaffRole, role_id)
-        new = False
-        if staff_role is None:
-            new = True
-            staff_role = models.StaffRole(role_id=role_id, guild=guild)
-            self._session.add(staff_role)
+        new, staff_role = await self._get_or_create(models.StaffRole, {
+            "role_id": role_id,
+            "guild_id": guild_id
+        },
+                                                    guild_id=guild_id)
+        if new:
+            # Inserted without a flush, so we record it ourselves.
+            self._session.info.setdefault(_TOUCHED_STAFF, set()).add(guild_id)
         return new, staff_role
 
     async def get_all_staff_roles(self, guild_id: int) -> Sequence[models.StaffRole]:
@@ -523,9 +1259,23 @@ class OnlineConfig:
             Sequence[models.StaffRole]: A list of staff roles.
                 Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        staff_roles = await self._session.scalars(sql.select(models.StaffRole).where(models.StaffRole.guild == guild))
-        return staff_roles.all()
+        return await self._get_guild_rows(models.StaffRole, guild_id)
+
+    async def get_staff_role_ids(self, guild_id: int) -> FrozenSet[int]:
+        """Get the role IDs of all staff roles of a guild.
+
+        Lets the caller check a member with a single set operation.
+        The IDs are served from the bot's staff role cache
+        if possible, and cached otherwise.
+
+        Args:
+            guild_id: The guild ID.
+
+        Returns:
+            FrozenSet[int]: The role IDs of the staff roles.
+        """
+        return await self._get_id_set(models.StaffRole, models.StaffRole.role_id, self._bot.staff_role_cache,
+                                      _TOUCHED_STAFF, guild_id)
 
     async def check_staff_role(self, role_id: int) -> bool:
         """Check if the staff role exists.
@@ -540,7 +1290,7 @@ class OnlineConfig:
         Returns:
             bool: A boolean indicating if the staff role exists.
         """
-        staff_role = await self._session.get(models.StaffRole, role_id)
+        staff_role = await self._session.get(models.StaffRole, role_id, options=[orm.raiseload(models.StaffRole.guild)])
         return staff_role is not None
 
     async def get_observers_role(self, role_id: int, guild_id: int) -> Tuple[bool, models.ObserversRole]:
@@ -559,14 +1309,11 @@ class OnlineConfig:
                 indicating if the observer role was created, and the observers'
                 role. Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        observers_role = await self._session.get(models.ObserversRole, role_id)
-        new = False
-        if observers_role is None:
-            new = True
-            observers_role = models.ObserversRole(role_id=role_id, guild=guild)
-            self._session.add(observers_role)
-        return new, observers_role
+        return await self._get_or_create(models.ObserversRole, {
+            "role_id": role_id,
+            "guild_id": guild_id
+        },
+                                         guild_id=guild_id)
 
     async def get_all_observers_roles(self, guild_id: int) -> Sequence[models.ObserversRole]:
         """Get all observer roles from the database.
@@ -581,10 +1328,7 @@ class OnlineConfig:
             Sequence[models.ObserversRole]: A list of observer roles.
                 Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        observers_roles = await self._session.scalars(
-            sql.select(models.ObserversRole).where(models.ObserversRole.guild == guild))
-        return observers_roles.all()
+        return await self._get_guild_rows(models.ObserversRole, guild_id)
 
     async def check_observers_role(self, role_id: int) -> bool:
         """Check if the observer role exists.
@@ -599,7 +1343,9 @@ class OnlineConfig:
         Returns:
             bool: A boolean indicating if the observer role exists.
         """
-        observers_role = await self._session.get(models.ObserversRole, role_id)
+        observers_role = await self._session.get(models.ObserversRole,
+                                                 role_id,
+                                                 options=[orm.raiseload(models.ObserversRole.guild)])
         return observers_role is not None
 
     async def get_community_role(self, role_id: int, guild_id: int) -> Tuple[bool, models.CommunityRole]:
@@ -618,14 +1364,11 @@ class OnlineConfig:
                 indicating if the community role was created, and the community
                 role. Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        community_role = await self._session.get(models.CommunityRole, role_id)
-        new = False
-        if community_role is None:
-            new = True
-            community_role = models.CommunityRole(role_id=role_id, guild=guild)
-            self._session.add(community_role)
-        return new, community_role
+        return await self._get_or_create(models.CommunityRole, {
+            "role_id": role_id,
+            "guild_id": guild_id
+        },
+                                         guild_id=guild_id)
 
     async def get_all_community_roles(self, guild_id: int) -> Sequence[models.CommunityRole]:
         """Get all community roles from the database.
@@ -640,10 +1383,7 @@ class OnlineConfig:
             Sequence[models.CommunityRole]: A list of community roles.
                 Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        community_roles = await self._session.scalars(
-            sql.select(models.CommunityRole).where(models.CommunityRole.guild == guild))
-        return community_roles.all()
+        return await self._get_guild_rows(models.CommunityRole, guild_id)
 
     async def check_community_role(self, role_id: int) -> bool:
         """Check if the community role exists.
@@ -658,7 +1398,9 @@ class OnlineConfig:
         Returns:
             bool: A boolean indicating if the community role exists.
         """
-        community_role = await self._session.get(models.CommunityRole, role_id)
+        community_role = await self._session.get(models.CommunityRole,
+                                                 role_id,
+                                                 options=[orm.raiseload(models.CommunityRole.guild)])
         return community_role is not None
 
     async def get_community_ping(self, role_id: int, guild_id: int) -> Tuple[bool, models.CommunityPing]:
@@ -677,14 +1419,11 @@ class OnlineConfig:
                 indicating if the community ping was created, and the community
                 pings. Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        community_ping = await self._session.get(models.CommunityPing, role_id)
-        new = False
-        if community_ping is None:
-            new = True
-            community_ping = models.CommunityPing(role_id=role_id, guild=guild)
-            self._session.add(community_ping)
-        return new, community_ping
+        return await self._get_or_create(models.CommunityPing, {
+            "role_id": role_id,
+            "guild_id": guild_id
+        },
+                                         guild_id=guild_id)
 
     async def get_all_community_pings(self, guild_id: int) -> Sequence[models.CommunityPing]:
         """Get all community pings from the database.
@@ -699,10 +1438,7 @@ class OnlineConfig:
             Sequence[models.CommunityPing]: A list of community pings.
                 Relationships are loaded.
         """
-        guild = await self.get_guild(guild_id)
-        community_pings = await self._session.scalars(
-            sql.select(models.CommunityPing).where(models.CommunityPing.guild == guild))
-        return community_pings.all()
+        return await self._get_guild_rows(models.CommunityPing, guild_id)
 
     async def check_community_ping(self, role_id: int) -> bool:
         """Check if the community ping exists.
@@ -717,5 +1453,7 @@ class OnlineConfig:
         Returns:
             bool: A boolean indicating if the community ping exists.
         """
-        community_ping = await self._session.get(models.CommunityPing, role_id)
+        community_ping = await self._session.get(models.CommunityPing,
+                                                 role_id,
+                                                 options=[orm.raiseload(models.CommunityPing.guild)])
         return community_ping is not None
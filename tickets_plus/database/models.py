@@ -48,7 +48,6 @@ class UTCnow(sql.expression.FunctionElement):
 
 @cmplr.compiles(UTCnow, "postgresql")
 # This is as according to the docs, but pylint doesn't like it
-# Can't implement this for sqlite because it doesn't time objects
 # pylint: disable=unused-argument, invalid-name
 def pg_UTCnow(element, compiler, **kw):
     """Compile the utcnow function for postgresql
@@ -67,6 +66,27 @@ def pg_UTCnow(element, compiler, **kw):
     return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
 
 
+@cmplr.compiles(UTCnow, "sqlite")
+# SQLite has no interval type, so only the server defaults work.
+# Arithmetic with intervals is not supported.
+# pylint: disable=unused-argument, invalid-name
+def sqlite_UTCnow(element, compiler, **kw):
+    """Compile the utcnow function for sqlite
+
+    SQLite keeps the time in UTC already.
+    Used by the benchmarks, which also run on SQLite.
+
+    Args:
+      element: The element to compile so, in this case, the UTCnow object.
+      compiler: The Compiled object can be accessed to get information.
+      **kw: Keyword arguments.
+
+    Returns:
+        The compiled SQL expression.
+    """
+    return "CURRENT_TIMESTAMP"
+
+
 class Base(orm.DeclarativeBase):
     """Base of SQLAlchemy models
 
@@ -218,10 +238,13 @@ class TicketBot(Base):
     """
 
     __tablename__ = "ticket_bots"
-    __table_args__ = {
-        "comment": ("Users that open the ticket channels, mostly the Tickets bot,"
-                    " but can be other users due to whitelabel options.")
-    }
+    __table_args__ = (
+        sqlalchemy.Index("ix_ticket_bots_guild_id", "guild_id"),
+        {
+            "comment": ("Users that open the ticket channels, mostly the Tickets bot,"
+                        " but can be other users due to whitelabel options.")
+        },
+    )
 
     # Simple columns
     user_id: orm.Mapped[int] = orm.mapped_column(
@@ -265,7 +288,12 @@ class TicketType(Base):
     """
 
     __tablename__ = "ticket_types"
-    __table_args__ = {"comment": "Ticket types are stored here. Each guild can have multiple."}
+    __table_args__ = (
+        sqlalchemy.Index("ix_ticket_types_guild_id", "guild_id"),
+        {
+            "comment": "Ticket types are stored here. Each guild can have multiple."
+        },
+    )
 
     # Simple columns
     prefix: orm.Mapped[str] = orm.mapped_column(
@@ -328,7 +356,18 @@ class Ticket(Base):
     """
 
     __tablename__ = "tickets"
-    __table_args__ = {"comment": "Channels that are tickets are stored here."}
+    __table_args__ = (
+        # Used by the autoclose warnings, which only look at tickets
+        # that have not been notified yet.
+        sqlalchemy.Index("ix_tickets_pending",
+                         "guild_id",
+                         "last_response",
+                         postgresql_where=sql.text("notified = false"),
+                         sqlite_where=sql.text("notified = 0")),
+        {
+            "comment": "Channels that are tickets are stored here."
+        },
+    )
 
     # Simple columns
     channel_id: orm.Mapped[int] = orm.mapped_column(sqlalchemy.BigInteger(),
@@ -466,10 +505,13 @@ class StaffRole(Base):
     """
 
     __tablename__ = "staff_roles"
-    __table_args__ = {
-        "comment": ("Roles that are allowed to view ticket notes,"
-                    " and have access to staff commands.")
-    }
+    __table_args__ = (
+        sqlalchemy.Index("ix_staff_roles_guild_id", "guild_id"),
+        {
+            "comment": ("Roles that are allowed to view ticket notes,"
+                        " and have access to staff commands.")
+        },
+    )
 
     # Simple columns
     role_id: orm.Mapped[int] = orm.mapped_column(
@@ -514,7 +556,12 @@ class ObserversRole(Base):
     """
 
     __tablename__ = "observer_roles"
-    __table_args__ = {"comment": "Roles that are automatically added to tickets notes."}
+    __table_args__ = (
+        sqlalchemy.Index("ix_observer_roles_guild_id", "guild_id"),
+        {
+            "comment": "Roles that are automatically added to tickets notes."
+        },
+    )
 
     # Simple columns
     role_id: orm.Mapped[int] = orm.mapped_column(
@@ -559,7 +606,12 @@ class CommunityRole(Base):
     """
 
     __tablename__ = "community_roles"
-    __table_args__ = {"comment": "Roles that are allowed to view tickets, but aren't staff."}
+    __table_args__ = (
+        sqlalchemy.Index("ix_community_roles_guild_id", "guild_id"),
+        {
+            "comment": "Roles that are allowed to view tickets, but aren't staff."
+        },
+    )
 
     # Simple columns
     role_id: orm.Mapped[int] = orm.mapped_column(
@@ -604,11 +656,14 @@ class CommunityPing(Base):
     """
 
     __tablename__ = "community_pings"
-    __table_args__ = {
-        "comment": ("Table for community pings,"
-                    " pinged when a ticket is opened but"
-                    " after adding the community roles.")
-    }
+    __table_args__ = (
+        sqlalchemy.Index("ix_community_pings_guild_id", "guild_id"),
+        {
+            "comment": ("Table for community pings,"
+                        " pinged when a ticket is opened but"
+                        " after adding the community roles.")
+        },
+    )
 
     # Simple columns
     role_id: orm.Mapped[int] = orm.mapped_column(
@@ -655,11 +710,18 @@ class Member(Base):
     """
 
     __tablename__ = "members"
-    __table_args__ = {
-        "comment": ("Table for members,"
-                    " this is a combination of a user and a guild,"
-                    " as a user can be in multiple guilds.")
-    }
+    __table_args__ = (
+        # Used by the status cleanup, which only looks at blocked members.
+        sqlalchemy.Index("ix_members_status_till",
+                         "status_till",
+                         postgresql_where=sql.text("status <> 0"),
+                         sqlite_where=sql.text("status <> 0")),
+        {
+            "comment": ("Table for members,"
+                        " this is a combination of a user and a guild,"
+                        " as a user can be in multiple guilds.")
+        },
+    )
 
     # Simple columns
     user_id: orm.Mapped[int] = orm.mapped_column(
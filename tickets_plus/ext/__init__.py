@@ -2,14 +2,30 @@
 
 Those are various non-cog extensions used throughout the bot.
 Currently, this module contains the following extensions:
+    - tickets_plus.ext.auditlog
     - tickets_plus.ext.checks
+    - tickets_plus.ext.discovery
     - tickets_plus.ext.exceptions
+    - tickets_plus.ext.jobs
+    - tickets_plus.ext.metrics
+    - tickets_plus.ext.pipeline
+    - tickets_plus.ext.querylog
+    - tickets_plus.ext.scheduler
+    - tickets_plus.ext.topics
     - tickets_plus.ext.views
 
 Typical usage example:
     ```py
+    from tickets_plus.ext import auditlog
     from tickets_plus.ext import checks
+    from tickets_plus.ext import discovery
     from tickets_plus.ext import exceptions
+    from tickets_plus.ext import jobs
+    from tickets_plus.ext import metrics
+    from tickets_plus.ext import pipeline
+    from tickets_plus.ext import querylog
+    from tickets_plus.ext import scheduler
+    from tickets_plus.ext import topics
     from tickets_plus.ext import views
     ...
     ```
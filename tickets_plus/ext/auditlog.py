@@ -0,0 +1,129 @@
+"""Coalesced audit log lookups.
+
+Discord doesn't tell us who created a channel, so we have to look it up
+in the audit log. Doing that for every created channel means
+a request per channel, and a burst of channels (ticket panels,
+cloned categories, raids) quickly runs into the rate limits.
+Instead, the first channel of a guild is looked up right away,
+and the channels created in that guild while the audit log
+is being read are resolved together, with the next fetch.
+
+Typical usage example:
+    ```py
+    from tickets_plus.ext import auditlog
+    creators = auditlog.ChannelCreators()
+    creator_id = await creators.resolve(channel)
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import asyncio
+import logging
+from typing import Any, Dict, Mapping
+
+import discord
+
+_SLACK = 2
+"""Extra audit log entries fetched, for channels created by others."""
+
+
+def _settle(waiters: Mapping[int, asyncio.Future[int | None]], creators: Mapping[int, int]) -> None:
+    """Resolve the channels still waiting.
+
+    Args:
+        waiters: The waiting channels, keyed by ID.
+        creators: The known creators, keyed by channel ID.
+            Channels without one are resolved as unknown.
+    """
+    for channel_id, waiter in waiters.items():
+        if not waiter.done():
+            waiter.set_result(creators.get(channel_id))
+
+
+class ChannelCreators:
+    """Resolves who created channels, one audit log fetch at a time per guild.
+
+    The first channel of a guild is fetched right away. Channels
+    created in the same guild during a fetch wait for it to finish,
+    and are then resolved together, with a single fetch.
+    """
+
+    def __init__(self) -> None:
+        """Initialises the resolver, without any pending channels."""
+        self._pending: Dict[int, Dict[int, asyncio.Future[int | None]]] = {}
+        self._tasks: Dict[int, asyncio.Task[None]] = {}
+
+    async def resolve(self, channel: discord.abc.GuildChannel) -> int | None:
+        """Find out who created a channel.
+
+        Args:
+            channel: The newly created channel.
+
+        Returns:
+            int | None: The ID of the user who created the channel,
+                or None if it's not in the audit log, or the audit log
+                could not be read.
+        """
+        gld = channel.guild
+        pending = self._pending.setdefault(gld.id, {})
+        waiter = pending.get(channel.id)
+        if waiter is None:
+            waiter = pending[channel.id] = asyncio.get_running_loop().create_future()
+        if gld.id not in self._tasks:
+            self._tasks[gld.id] = asyncio.create_task(self._fetch_all(gld))
+        return await asyncio.shield(waiter)
+
+    async def _fetch_all(self, gld: discord.Guild) -> None:
+        """Resolve the channels waiting in a guild, until there are none.
+
+        If cancelled, the waiting channels are resolved as unknown.
+
+        Args:
+            gld: The guild to fetch the audit log of.
+        """
+        try:
+            while self._pending.get(gld.id):
+                pending = self._pending.pop(gld.id)
+                creators: Dict[int, int] = {}
+                try:
+                    creators = await self._fetch(gld, pending)
+                finally:
+                    _settle(pending, creators)
+                logging.debug("Resolved %i of %i created channels in %s.", len(creators), len(pending), gld.id)
+        finally:
+            # No await since the last check, so no channel is left behind.
+            del self._tasks[gld.id]
+            _settle(self._pending.pop(gld.id, {}), {})
+
+    @staticmethod
+    async def _fetch(gld: discord.Guild, pending: Mapping[int, Any]) -> Dict[int, int]:
+        """Read the creators of channels from the audit log.
+
+        Bursts larger than a single page of the audit log
+        are paged through by discord.py.
+
+        Args:
+            gld: The guild to fetch the audit log of.
+            pending: The channels to resolve, keyed by ID.
+
+        Returns:
+            Dict[int, int]: The creators found, keyed by channel ID.
+                Empty if the audit log could not be read.
+        """
+        creators: Dict[int, int] = {}
+        try:
+            async for entry in gld.audit_logs(limit=len(pending) + _SLACK,
+                                              action=discord.AuditLogAction.channel_create):
+                if entry.user and entry.target and entry.target.id in pending:
+                    creators.setdefault(entry.target.id, entry.user.id)
+                    if len(creators) == len(pending):
+                        break
+        except (discord.HTTPException, discord.RateLimited) as exc:
+            logging.warning("Failed to read the audit log of %s: %s", gld.id, exc)
+        return creators
@@ -24,12 +24,32 @@ Typical usage example:
 # in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
 # If later approved by the Initial Contributor, GPL-3.0-or-later.
 
+from typing import FrozenSet
+
 import discord
 from discord import app_commands
 
 from tickets_plus.ext import exceptions
 
 
+def is_staff_member(member: discord.Member, staff_roles: FrozenSet[int]) -> bool:
+    """Checks if a member has any of the staff roles.
+
+    Compares the raw role IDs of the member,
+    so no role objects need to be resolved.
+
+    Args:
+        member: The member to check.
+        staff_roles: The staff role IDs of the member's guild.
+            See `tickets_plus.database.layer.OnlineConfig.get_staff_role_ids`.
+
+    Returns:
+        bool: Whether the member has a staff role.
+    """
+    # pylint: disable=protected-access # skipcq: PYL-W0212
+    return not staff_roles.isdisjoint(member._roles)
+
+
 def is_owner_check():
     """A check for owner only commands.
 
@@ -64,12 +84,7 @@ def is_owner_check():
                 Raised if the user is not an owner. This is according to the
                 discord.py convention.
         """
-        app = await interaction.client.application_info()
-        if app.team:
-            # Split to avoid errors ie AttributeError
-            if interaction.user in app.team.members:
-                return True
-        if interaction.user == app.owner:
+        if interaction.user.id in await interaction.client.get_owner_ids():  # type: ignore
             return True
         raise exceptions.TicketsCheckFailure("You do not have permission to do this.")
 
@@ -111,20 +126,14 @@ def is_staff_check():
         """
         if interaction.guild is None:
             return False
-        app = await interaction.client.application_info()
-        if app.team:
-            # Bot owners are always staff, split to avoid errors
-            if interaction.user in app.team.members:
-                return True
-        if interaction.user == app.owner:
+        # Bot owners are always staff
+        if interaction.user.id in await interaction.client.get_owner_ids():  # type: ignore
             return True
-        async with interaction.client.get_connection() as conn:  # type: ignore
-            staff_roles = await conn.get_all_staff_roles(interaction.guild_id)
-            for role in staff_roles:
-                parsed_role = interaction.guild.get_role(role.role_id)
-                if parsed_role in interaction.user.roles:  # type: ignore
-                    # Already checked for member
-                    return True
+        if isinstance(interaction.user, discord.Member):
+            async with interaction.client.get_connection() as conn:  # type: ignore
+                staff_roles = await conn.get_staff_role_ids(interaction.guild.id)
+            if is_staff_member(interaction.user, staff_roles):
+                return True
         raise exceptions.TicketsCheckFailure("You do not have"
                                              " permission to do this here.")
 
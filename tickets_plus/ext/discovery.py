@@ -0,0 +1,174 @@
+"""Resolves message links posted in chat.
+
+Message discovery replies to a message link with the content of the
+linked message. Most messages contain no link at all, so they are
+rejected with a plain substring check before any regex runs.
+The linked messages are looked up in our own cache first,
+then in discord.py's message cache, and only then fetched over REST.
+Popular messages tend to be linked over and over again,
+so fetched messages are kept for a while.
+
+Typical usage example:
+    ```py
+    from tickets_plus.ext import discovery
+    engine = discovery.MessageDiscovery(bot, maxsize=1024, ttl=300, max_links=3)
+    for link in engine.find_links(message.content):
+        linked = await engine.resolve(link)
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import re
+import time
+from typing import List, NamedTuple, Tuple
+
+import discord
+from discord import utils
+
+from tickets_plus.database import cache
+
+_PREFILTER = "discord.com/channels/"
+"""A substring every message link contains."""
+_LINK = re.compile(r"https://(?:canary\.)?discord\.com/channels/(?P<srv>\d+)/(?P<cha>\d+)/(?P<msg>\d+)")
+"""The pattern of a message link."""
+
+
+class MessageLink(NamedTuple):
+    """The IDs a message link points to.
+
+    Attributes:
+        guild_id: The guild ID.
+        channel_id: The channel ID.
+        message_id: The message ID.
+    """
+
+    guild_id: int
+    channel_id: int
+    message_id: int
+
+
+def _points_to(link: MessageLink, message: discord.Message) -> bool:
+    """Check whether a link points to a message.
+
+    The guild and channel have to match too, a message with
+    the linked ID in another channel doesn't count.
+
+    Args:
+        link: The link.
+        message: The message.
+
+    Returns:
+        bool: Whether the link points to the message.
+    """
+    return (message.id == link.message_id and message.channel.id == link.channel_id and message.guild is not None and
+            message.guild.id == link.guild_id)
+
+
+class MessageDiscovery:
+    """Finds message links, and resolves them as cheaply as possible.
+
+    Attributes:
+        max_links: The most links resolved per message.
+        lookups: The number of links resolved.
+        cache_hits: The lookups answered by our cache.
+        local_hits: The lookups answered by discord.py's message cache.
+        rest_calls: The lookups that needed a REST call.
+    """
+
+    def __init__(self, client: discord.Client, maxsize: int, ttl: float, max_links: int) -> None:
+        """Initialises the engine.
+
+        Args:
+            client: The client to resolve the links with.
+            maxsize: The most fetched messages kept.
+            ttl: How long a fetched message is kept, in seconds.
+            max_links: The most links resolved per message.
+        """
+        self._client = client
+        self._ttl = ttl
+        self._cache: cache.LRUCache[MessageLink, Tuple[float, discord.Message | None]] = cache.LRUCache(maxsize)
+        self.max_links = max_links
+        self.lookups = 0
+        self.cache_hits = 0
+        self.local_hits = 0
+        self.rest_calls = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of lookups that didn't need a REST call."""
+        if not self.lookups:
+            return 0.0
+        return self.rest_saved / self.lookups
+
+    @property
+    def rest_saved(self) -> int:
+        """The number of REST calls avoided by the caches."""
+        return self.cache_hits + self.local_hits
+
+    def find_links(self, content: str) -> List[MessageLink]:
+        """Find the message links in a message.
+
+        Args:
+            content: The content of the message.
+
+        Returns:
+            List[MessageLink]: The distinct links, in order,
+                at most `max_links` of them.
+        """
+        if _PREFILTER not in content:
+            return []
+        links: List[MessageLink] = []
+        for match in _LINK.finditer(content):
+            link = MessageLink(int(match.group("srv")), int(match.group("cha")), int(match.group("msg")))
+            if link not in links:
+                links.append(link)
+                if len(links) >= self.max_links:
+                    break
+        return links
+
+    async def resolve(self, link: MessageLink) -> discord.Message | None:
+        """Get the message a link points to.
+
+        Failed fetches are cached as well,
+        so a broken link isn't fetched over and over again.
+        Messages are only used if they are from the linked
+        guild and channel, not just with the linked ID.
+
+        Args:
+            link: The link to resolve.
+
+        Returns:
+            discord.Message | None: The message, or None if it
+                doesn't exist or we can't see it.
+        """
+        self.lookups += 1
+        now = time.monotonic()
+        cached = self._cache.get(link)
+        if cached is not None and cached[0] > now:
+            self.cache_hits += 1
+            return cached[1]
+        local = utils.find(lambda msg: _points_to(link, msg), reversed(self._client.cached_messages))
+        if local is not None:
+            self.local_hits += 1
+            return local
+        gld = self._client.get_guild(link.guild_id)
+        chan = gld.get_channel_or_thread(link.channel_id) if gld else None
+        if not isinstance(chan, discord.abc.Messageable):
+            # Not worth caching, we didn't make a request.
+            return None
+        self.rest_calls += 1
+        try:
+            got_msg = await chan.fetch_message(link.message_id)
+        except discord.RateLimited:
+            # Don't cache it, the message may well exist.
+            return None
+        except discord.HTTPException:
+            got_msg = None
+        self._cache.put(link, (now + self._ttl, got_msg))
+        return got_msg
@@ -0,0 +1,251 @@
+"""A bounded queue of background jobs.
+
+Work triggered by the API, like creating tickets, used to run in the
+request coroutine, with no limit on how much ran at once. A burst of
+requests then opened a database session per request, and the pool
+has no overflow limit. Instead, the work is submitted as a job
+to a `JobQueue`, run by a fixed number of workers. When the queue
+is full, submitting fails right away, so the caller can push back.
+Every job gets an ID its status can be looked up with.
+
+Typical usage example:
+    ```py
+    from tickets_plus.ext import jobs
+    queue = jobs.JobQueue(workers=4, depth=100, history=1000)
+    queue.start()
+    try:
+        job = queue.submit("ticket 123", create_ticket, 123)
+    except asyncio.QueueFull:
+        ...
+    queue.get(job.job_id).status
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import asyncio
+import enum
+import functools
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from tickets_plus.database import cache
+
+
+class JobStatus(enum.Enum):
+    """The states of a job."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job:
+    """A unit of background work.
+
+    Attributes:
+        job_id: The unique ID of the job.
+        name: A description of the job, used in the logs.
+        status: The state of the job.
+        queued_at: When the job was submitted, as a UNIX timestamp.
+        started_at: When a worker started the job, if it did.
+        finished_at: When the job finished, if it did.
+        error: The error the job failed with, if it did.
+    """
+
+    __slots__ = ("job_id", "name", "status", "queued_at", "started_at", "finished_at", "error")
+
+    def __init__(self, name: str) -> None:
+        """Initialises a queued job.
+
+        Args:
+            name: A description of the job, used in the logs.
+        """
+        self.job_id = uuid.uuid4().hex
+        self.name = name
+        self.status = JobStatus.QUEUED
+        self.queued_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.error: str | None = None
+
+    def __repr__(self) -> str:
+        return f"<Job job_id={self.job_id} name={self.name} status={self.status.value}>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the job as a JSON serializable dictionary.
+
+        Returns:
+            Dict[str, Any]: The attributes of the job.
+        """
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "status": self.status.value,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Runs jobs in the background, with bounded concurrency.
+
+    At most `workers` jobs run at once, and at most `depth` jobs
+    wait for a worker. Finished jobs are remembered,
+    up to `history` of them, for status lookups.
+
+    Attributes:
+        succeeded: The number of jobs that succeeded.
+        failed: The number of jobs that failed.
+        rejected: The number of jobs rejected, as the queue was full,
+            or closed.
+        cancelled: The number of jobs cancelled on close.
+    """
+
+    def __init__(self, workers: int, depth: int, history: int) -> None:
+        """Initialises the queue, without starting the workers.
+
+        Args:
+            workers: The number of jobs run at once.
+            depth: The most jobs waiting to run.
+            history: The most finished jobs remembered.
+        """
+        self._workers = workers
+        self._queue: asyncio.Queue[Tuple[Job, Callable[[], Awaitable[Any]]]] = asyncio.Queue(depth)
+        self._active: Dict[str, Job] = {}
+        self._finished: cache.LRUCache[str, Job] = cache.LRUCache(history)
+        self._tasks: List[asyncio.Task[None]] = []
+        self._closing = False
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> int:
+        """The number of jobs currently running."""
+        return len(self._active) - self._queue.qsize()
+
+    def start(self) -> None:
+        """Start the workers.
+
+        Must be called from a running event loop.
+        Does nothing if the workers are already started.
+        """
+        if self._tasks:
+            return
+        self._closing = False
+        self._tasks = [asyncio.create_task(self._work(), name=f"job worker {num}") for num in range(self._workers)]
+
+    async def close(self, timeout: float) -> None:
+        """Stop the workers.
+
+        New jobs are rejected, and queued jobs are cancelled
+        without starting. Running jobs are given `timeout` seconds
+        to finish, and only cancelled if they don't.
+
+        Args:
+            timeout: Seconds to wait for the running jobs.
+        """
+        self._closing = True
+        while not self._queue.empty():
+            job, _ = self._queue.get_nowait()
+            job.status = JobStatus.CANCELLED
+            self._retire(job)
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Cancelling %i running jobs, still running after %.1fs.", self.running, timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, name: str, func: Callable[..., Awaitable[Any]], *args: Any) -> Job:
+        """Queue a job, without waiting.
+
+        Args:
+            name: A description of the job, used in the logs.
+            func: A coroutine function, the job itself.
+            *args: The arguments `func` is called with.
+
+        Returns:
+            Job: The queued job.
+
+        Raises:
+            asyncio.QueueFull: Too many jobs are waiting already,
+                or the queue is closing.
+        """
+        job = Job(name)
+        try:
+            if self._closing:
+                raise asyncio.QueueFull
+            self._queue.put_nowait((job, functools.partial(func, *args)))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        self._active[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """Look up a job.
+
+        Args:
+            job_id: The ID of the job.
+
+        Returns:
+            Job | None: The job, or None if it's unknown,
+                or finished too long ago.
+        """
+        return self._active.get(job_id) or self._finished.get(job_id)
+
+    def _retire(self, job: Job) -> None:
+        """Move a job that won't run anymore to the history.
+
+        Args:
+            job: The finished or cancelled job.
+        """
+        if job.status is JobStatus.CANCELLED:
+            self.cancelled += 1
+        job.finished_at = time.time()
+        del self._active[job.job_id]
+        self._finished.put(job.job_id, job)
+        self._queue.task_done()
+
+    async def _work(self) -> None:
+        """Run queued jobs, one at a time, forever."""
+        while True:
+            job, run = await self._queue.get()
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            try:
+                await run()
+            except Exception as exc:  # pylint: disable=broad-exception-caught # skipcq: PYL-W0718
+                job.status = JobStatus.FAILED
+                job.error = repr(exc)
+                self.failed += 1
+                logging.exception("Job %s (%s) failed.", job.name, job.job_id)
+            except asyncio.CancelledError:
+                job.status = JobStatus.CANCELLED
+                raise
+            else:
+                job.status = JobStatus.SUCCEEDED
+                self.succeeded += 1
+            finally:
+                self._retire(job)
+            logging.debug("Job %s (%s) %s in %.3fs, after %.3fs queued.", job.name, job.job_id, job.status.value,
+                          job.finished_at - job.started_at, job.started_at - job.queued_at)
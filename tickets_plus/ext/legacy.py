@@ -22,12 +22,14 @@ from __future__ import annotations
 
 import logging
 import string
+from typing import Sequence
+
 import discord
 
-from tickets_plus.database import models, layer
+from tickets_plus.database import models
 
 
-async def thread_create(channel: discord.TextChannel, guild: models.Guild, confg: layer.OnlineConfig) -> discord.Thread:
+async def thread_create(channel: discord.TextChannel, guild: models.Guild) -> discord.Thread:
     nts_thrd: discord.Thread = await channel.create_thread(
         name="Staff Notes",
         reason=f"Staff notes for Ticket {channel.name}",
@@ -35,8 +37,9 @@ async def thread_create(channel: discord.TextChannel, guild: models.Guild, confg
     )
     await nts_thrd.send(string.Template(guild.open_message).safe_substitute(channel=channel.mention))
     logging.info("Created thread %s for %s", nts_thrd.name, channel.name)
-    if guild.observers_roles:
-        observer_ids = await confg.get_all_observers_roles(guild.guild_id)
-        inv = await nts_thrd.send(" ".join([f"<@&{role.role_id}>" for role in observer_ids]))
-        await inv.delete()
     return nts_thrd
+
+
+async def observers_ping(nts_thrd: discord.Thread, observer_ids: Sequence[models.ObserversRole]) -> None:
+    inv = await nts_thrd.send(" ".join([f"<@&{role.role_id}>" for role in observer_ids]))
+    await inv.delete()
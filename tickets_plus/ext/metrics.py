@@ -0,0 +1,423 @@
+"""Lightweight metrics, exposed in the Prometheus text format.
+
+A small registry of counters, gauges and histograms, rendered
+by the API on `/metrics`. Recording is a dictionary update,
+cheap enough to stay enabled on the hot paths.
+Values that are already tracked elsewhere, like the gateway latency
+or the message discovery statistics, are copied into gauges
+by collectors, right before rendering.
+
+The metrics recorded by the bot are defined in this module.
+The bot instruments the gateway listeners, the database engine and
+pool, the REST requests to Discord, and the background routines.
+The query times are recorded by the `tickets_plus.ext.querylog` hooks.
+
+Typical usage example:
+    ```py
+    from tickets_plus.ext import metrics
+
+    @metrics.timed(metrics.EVENT_SECONDS, "on_message")
+    async def on_message(message):
+        ...
+
+    with metrics.ROUTINE_SECONDS.time("cleanup"):
+        ...
+
+    metrics.REGISTRY.render()
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import abc
+import bisect
+import contextlib
+import functools
+import time
+import types
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Sequence, Tuple, TypeVar
+
+import aiohttp
+from sqlalchemy import pool
+from sqlalchemy.ext import asyncio as sa_asyncio
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""The content type of the rendered metrics."""
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""The default histogram buckets, in seconds."""
+
+_T = TypeVar("_T")
+
+
+def _escape(value: str) -> str:
+    """Escape a label value.
+
+    Args:
+        value: The label value.
+
+    Returns:
+        str: The escaped value.
+    """
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format a label set.
+
+    Args:
+        names: The label names.
+        values: The label values, in the same order.
+
+    Returns:
+        str: The label set, with braces. Empty if there are no labels.
+    """
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric(abc.ABC):
+    """The base of all metrics.
+
+    Attributes:
+        name: The name of the metric.
+        documentation: The help text of the metric.
+        labelnames: The names of the labels of the metric.
+    """
+
+    kind = "untyped"
+    """The Prometheus type of the metric."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        """Initialises the metric, without values.
+
+        Args:
+            name: The name of the metric.
+            documentation: The help text of the metric.
+            labelnames: The names of the labels of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Get the samples of the metric.
+
+        Yields:
+            str: A sample line, in the text format.
+        """
+
+    def render(self) -> str:
+        """Render the metric.
+
+        Returns:
+            str: The help, type and samples, in the text format.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Increment the counter.
+
+        Args:
+            *labels: The label values.
+            amount: How much to increment by.
+        """
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def set(self, value: float, *labels: str) -> None:
+        """Set the counter, for counts kept elsewhere.
+
+        Args:
+            value: The current count.
+            *labels: The label values.
+        """
+        self._values[labels] = value
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(_Metric):
+    """A value that goes up and down."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        """Set the gauge.
+
+        Args:
+            value: The current value.
+            *labels: The label values.
+        """
+        self._values[labels] = value
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram(_Metric):
+    """The distribution of observed values, in buckets."""
+
+    kind = "histogram"
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = _BUCKETS) -> None:
+        """Initialises the histogram, without values.
+
+        Args:
+            name: The name of the metric.
+            documentation: The help text of the metric.
+            labelnames: The names of the labels of the metric.
+            buckets: The upper bounds of the buckets, in increasing order.
+                The infinite bucket is added implicitly.
+        """
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(buckets)
+        # Per label set: the (non-cumulative) bucket counts, and the sum.
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record a value.
+
+        Args:
+            value: The observed value.
+            *labels: The label values.
+        """
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = ([0] * (len(self._buckets) + 1), [0.0])
+        counts, total = entry
+        counts[bisect.bisect_left(self._buckets, value)] += 1
+        total[0] += value
+
+    @contextlib.contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Record how long the block takes, in seconds.
+
+        Args:
+            *labels: The label values.
+
+        Yields:
+            None: Nothing, run the block.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self) -> Iterator[str]:
+        bounds = [str(bound) for bound in self._buckets] + ["+Inf"]
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total[0]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    """A set of metrics, rendered together."""
+
+    def __init__(self) -> None:
+        """Initialises the empty registry."""
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> None:
+        """Add a metric to the registry.
+
+        Args:
+            metric: The metric.
+
+        Raises:
+            ValueError: A metric with the same name was already added.
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} was already registered.")
+        self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Add a function that updates metrics before rendering.
+
+        Args:
+            collector: The function. Called with no arguments.
+        """
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], None]) -> None:
+        """Remove a function added with `add_collector`.
+
+        Args:
+            collector: The function.
+        """
+        self._collectors.remove(collector)
+
+    def render(self) -> str:
+        """Run the collectors, and render all metrics.
+
+        Returns:
+            str: The metrics, in the Prometheus text format.
+        """
+        for collector in self._collectors:
+            collector()
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+"""The registry of the metrics recorded by the bot."""
+
+EVENT_SECONDS = Histogram("tickets_plus_event_seconds", "Time spent handling gateway events, per listener.",
+                          ("listener",))
+"""The time spent in the gateway event listeners."""
+ROUTINE_SECONDS = Histogram("tickets_plus_routine_seconds", "Duration of background routine ticks.", ("routine",))
+"""The duration of the background routine ticks, excluding waits."""
+DB_QUERY_SECONDS = Histogram("tickets_plus_db_query_seconds", "Database query execution time.")
+"""The time spent executing database queries."""
+DB_POOL_WAIT_SECONDS = Histogram("tickets_plus_db_pool_wait_seconds", "Time spent waiting for a pooled connection.")
+"""The time spent checking out a connection from the pool."""
+DB_POOL_CONNECTIONS = Gauge("tickets_plus_db_pool_connections", "Database pool connections, per state.", ("state",))
+"""The connections of the database pool, checked out or idle."""
+REST_SECONDS = Histogram("tickets_plus_rest_request_seconds", "Discord REST request latency.", ("method", "status"))
+"""The latency of the REST requests to Discord, per response status."""
+REST_RATE_LIMITED = Counter("tickets_plus_rest_rate_limited_total", "Discord REST requests answered with a 429.",
+                            ("scope",))
+"""The rate limited REST requests, per rate limit scope."""
+GATEWAY_LATENCY_SECONDS = Gauge("tickets_plus_gateway_latency_seconds", "Gateway heartbeat latency, per shard.",
+                                ("shard",))
+"""The heartbeat latency of each shard."""
+DISCOVERY_LOOKUPS = Counter("tickets_plus_discovery_lookups_total", "Message discovery lookups, per source.",
+                            ("source",))
+"""The message discovery lookups, by where the message was found."""
+JOBS = Gauge("tickets_plus_jobs", "Background jobs, per state.", ("state",))
+"""The background jobs queued or running."""
+JOBS_FINISHED = Counter("tickets_plus_jobs_finished_total", "Finished background jobs, per outcome.", ("outcome",))
+"""The background jobs finished, rejected as the queue was full, or cancelled on close."""
+
+for _metric in (EVENT_SECONDS, ROUTINE_SECONDS, DB_QUERY_SECONDS, DB_POOL_WAIT_SECONDS, DB_POOL_CONNECTIONS,
+                REST_SECONDS, REST_RATE_LIMITED, GATEWAY_LATENCY_SECONDS, DISCOVERY_LOOKUPS, JOBS, JOBS_FINISHED):
+    REGISTRY.register(_metric)
+
+
+def timed(histogram: Histogram, *labels: str) -> Callable[[Callable[..., Awaitable[_T]]], Callable[..., Awaitable[_T]]]:
+    """Record how long each call of a coroutine function takes.
+
+    Args:
+        histogram: The histogram to record into.
+        *labels: The label values.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(func: Callable[..., Awaitable[_T]]) -> Callable[..., Awaitable[_T]]:
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> _T:
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, *labels)
+
+        return wrapper
+
+    return decorator
+
+
+class TimedQueuePool(pool.AsyncAdaptedQueuePool):
+    """The async queue pool, recording how long checkouts wait.
+
+    Pass it as the `poolclass` of the engine.
+    """
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+
+def pool_collector(engine: sa_asyncio.AsyncEngine) -> Callable[[], None]:
+    """Record the pool usage of an engine.
+
+    The query times are recorded by the hooks of
+    `tickets_plus.ext.querylog`, so statements aren't hooked twice.
+
+    Args:
+        engine: The engine to watch.
+
+    Returns:
+        Callable[[], None]: A collector updating the pool gauges,
+            for `Registry.add_collector`.
+    """
+
+    def collect() -> None:
+        engine_pool = engine.pool
+        if isinstance(engine_pool, pool.QueuePool):
+            DB_POOL_CONNECTIONS.set(engine_pool.checkedout(), "in_use")
+            DB_POOL_CONNECTIONS.set(engine_pool.checkedin(), "idle")
+
+    return collect
+
+
+def http_trace() -> aiohttp.TraceConfig:
+    """Record the REST requests of a client.
+
+    Pass it as the `http_trace` of the `discord.Client`.
+
+    Returns:
+        aiohttp.TraceConfig: The trace configuration.
+    """
+
+    # pylint: disable=unused-argument
+    async def on_start(session: aiohttp.ClientSession, ctx: types.SimpleNamespace,
+                       params: aiohttp.TraceRequestStartParams) -> None:
+        ctx.started = time.perf_counter()
+
+    async def on_end(_: aiohttp.ClientSession, ctx: types.SimpleNamespace,
+                     params: aiohttp.TraceRequestEndParams) -> None:
+        status = params.response.status
+        REST_SECONDS.observe(time.perf_counter() - ctx.started, params.method, str(status))
+        if status == 429:
+            REST_RATE_LIMITED.inc(params.response.headers.get("X-RateLimit-Scope", "unknown"))
+
+    async def on_error(_: aiohttp.ClientSession, ctx: types.SimpleNamespace,
+                       params: aiohttp.TraceRequestExceptionParams) -> None:
+        REST_SECONDS.observe(time.perf_counter() - ctx.started, params.method, "error")
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_start)
+    trace.on_request_end.append(on_end)
+    trace.on_request_exception.append(on_error)
+    return trace
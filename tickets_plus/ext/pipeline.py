@@ -0,0 +1,178 @@
+"""A small executor for steps that depend on each other.
+
+Some handlers are a series of independent requests to Discord,
+like setting up a new ticket. Instead of awaiting them one by one,
+the steps are declared with the steps they depend on, and each step
+is started as soon as all of its dependencies are done.
+Every step is timed, and a failed step only skips the steps
+that depend on it.
+
+Typical usage example:
+    ```py
+    from tickets_plus.ext import pipeline
+    steps = pipeline.Pipeline("ticket setup")
+    steps.add("thread", create_thread)
+    # Called with the thread, once it was created.
+    steps.add("observers", ping_observers, after=("thread",))
+    results = await steps.run()
+    if not results["observers"].succeeded:
+        ...
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Sequence, Tuple
+
+
+class StepResult:
+    """The outcome of a single step.
+
+    Attributes:
+        name: The name of the step.
+        value: The return value of the step, if it succeeded.
+        error: The exception raised by the step, if it failed.
+        skipped: Whether the step was skipped,
+            because one of its dependencies did not succeed.
+        duration: How long the step ran, in seconds.
+    """
+
+    __slots__ = ("name", "value", "error", "skipped", "duration")
+
+    def __init__(self,
+                 name: str,
+                 value: Any = None,
+                 error: Exception | None = None,
+                 skipped: bool = False,
+                 duration: float = 0.0) -> None:
+        """Initialises the result.
+
+        Args:
+            name: The name of the step.
+            value: The return value of the step.
+            error: The exception raised by the step.
+            skipped: Whether the step was skipped.
+            duration: How long the step ran, in seconds.
+        """
+        self.name = name
+        self.value = value
+        self.error = error
+        self.skipped = skipped
+        self.duration = duration
+
+    def __repr__(self) -> str:
+        return f"<StepResult name={self.name} succeeded={self.succeeded} duration={self.duration:.3f}>"
+
+    @property
+    def succeeded(self) -> bool:
+        """Whether the step ran and succeeded."""
+        return not self.skipped and self.error is None
+
+
+class Pipeline:
+    """A set of async steps, run concurrently where possible.
+
+    Steps are added with the names of the steps they depend on.
+    As dependencies must be added first, the steps can't form a cycle.
+    A pipeline can only be run once.
+
+    Attributes:
+        name: The name of the pipeline, used in the logs.
+    """
+
+    def __init__(self, name: str) -> None:
+        """Initialises the empty pipeline.
+
+        Args:
+            name: The name of the pipeline, used in the logs.
+        """
+        self.name = name
+        self._steps: Dict[str, Tuple[Callable[..., Awaitable[Any]], Tuple[str, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def add(self, name: str, step: Callable[..., Awaitable[Any]], after: Sequence[str] = ()) -> None:
+        """Add a step to the pipeline.
+
+        Args:
+            name: The unique name of the step.
+            step: A coroutine function. It is called with
+                the return values of its dependencies, in order.
+            after: The names of the steps that must succeed
+                before this one starts.
+
+        Raises:
+            ValueError: The name is taken, or a dependency is unknown.
+        """
+        if name in self._steps:
+            raise ValueError(f"Step {name} was already added.")
+        for dep in after:
+            if dep not in self._steps:
+                raise ValueError(f"Step {name} depends on {dep}, which was not added yet.")
+        self._steps[name] = (step, tuple(after))
+
+    async def run(self) -> Dict[str, StepResult]:
+        """Run all steps, and wait for them to finish.
+
+        Each step starts once all of its dependencies succeeded.
+        Exceptions raised by a step are logged and stored in its result,
+        the steps depending on it are skipped. Cancellation
+        is not caught, and cancels the remaining steps.
+
+        Returns:
+            Dict[str, StepResult]: The result of each step, keyed by name.
+        """
+        started = time.perf_counter()
+        running: Dict[str, asyncio.Task[StepResult]] = {}
+        for name, (step, after) in self._steps.items():
+            deps = [running[dep] for dep in after]
+            running[name] = asyncio.create_task(self._run_step(name, step, deps), name=name)
+        try:
+            results = await asyncio.gather(*running.values())
+        finally:
+            for task in running.values():
+                task.cancel()
+        spans = ", ".join(f"{result.name}={result.duration:.3f}s" for result in results if not result.skipped)
+        logging.debug("%s finished %i steps in %.3fs (%s).", self.name, len(results),
+                      time.perf_counter() - started, spans)
+        return {result.name: result for result in results}
+
+    async def _run_step(self, name: str, step: Callable[..., Awaitable[Any]],
+                        deps: Sequence["asyncio.Task[StepResult]"]) -> StepResult:
+        """Run a single step once its dependencies are done.
+
+        Args:
+            name: The name of the step.
+            step: The coroutine function of the step.
+                Called with the values of its dependencies.
+            deps: The tasks of the steps it depends on.
+
+        Returns:
+            StepResult: The outcome of the step.
+        """
+        values = []
+        for dep in deps:
+            result = await dep
+            if not result.succeeded:
+                logging.debug("%s skipped %s, as %s did not succeed.", self.name, name, result.name)
+                return StepResult(name, skipped=True)
+            values.append(result.value)
+        started = time.perf_counter()
+        try:
+            value = await step(*values)
+        except Exception as exc:  # pylint: disable=broad-exception-caught # skipcq: PYL-W0718
+            duration = time.perf_counter() - started
+            logging.exception("%s step %s failed after %.3fs.", self.name, name, duration)
+            return StepResult(name, error=exc, duration=duration)
+        duration = time.perf_counter() - started
+        logging.debug("%s step %s took %.3fs.", self.name, name, duration)
+        return StepResult(name, value=value, duration=duration)
@@ -0,0 +1,226 @@
+"""Query telemetry, per logical operation.
+
+The relationships of the models are loaded eagerly with selectin loads,
+and a careless loop over them quickly turns into a query per row.
+To catch those, the statements are attributed to the operation
+that issued them, like a gateway event or a slash command.
+Operations issuing more statements than allowed are flagged,
+with the statements they repeated. Slow statements are logged,
+without their parameters, as those may contain user data.
+
+The current operation is kept in a context variable, so it follows
+the tasks the operation starts, and reaches the engine events
+through SQLAlchemy's greenlets.
+
+Typical usage example:
+    ```py
+    from tickets_plus.ext import querylog
+    querylog.instrument_engine(engine, slow=0.25, max_statements=20, explain=False)
+
+    @querylog.tracked("on_message")
+    async def on_message(message):
+        ...
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import collections
+import contextvars
+import functools
+import logging
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from sqlalchemy import engine as sa_engine
+from sqlalchemy import event
+from sqlalchemy.ext import asyncio as sa_asyncio
+
+from tickets_plus.ext import metrics
+
+_QUERY_START = "tickets_plus_querylog_start"
+"""The connection info key, for the start times of running queries."""
+_SHOWN_CHARS = 200
+"""How much of a statement is shown in the logs."""
+_SHOWN_REPEATS = 3
+"""How many of the most repeated statements are shown for a flagged operation."""
+
+_T = TypeVar("_T")
+
+
+class Operation:
+    """The statements issued by one logical operation.
+
+    Attributes:
+        name: The name of the operation, used in the logs.
+        statements: The number of statements issued.
+        duration: The time spent executing them, in seconds.
+        counts: How often each statement was issued.
+        flagged: Whether the operation issued too many statements.
+    """
+
+    __slots__ = ("name", "started", "statements", "duration", "counts", "flagged")
+
+    def __init__(self, name: str) -> None:
+        """Initialises the operation, without statements.
+
+        Args:
+            name: The name of the operation, used in the logs.
+        """
+        self.name = name
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.duration = 0.0
+        self.counts: collections.Counter[str] = collections.Counter()
+        self.flagged = False
+
+    def __repr__(self) -> str:
+        return f"<Operation name={self.name} statements={self.statements}>"
+
+    def finish(self) -> None:
+        """Log what the operation did.
+
+        Flagged operations are logged as warnings,
+        with their most repeated statements.
+        """
+        elapsed = time.perf_counter() - self.started
+        if not self.flagged:
+            if self.statements:
+                logging.debug("%s issued %i statements, %.3fs of %.3fs.", self.name, self.statements, self.duration,
+                              elapsed)
+            return
+        repeated = "\n".join(
+            f"  {count}x {statement[:_SHOWN_CHARS]}" for statement, count in self.counts.most_common(_SHOWN_REPEATS)
+            if count > 1)
+        logging.warning("%s issued %i statements, %.3fs of %.3fs. Most repeated:\n%s", self.name, self.statements,
+                        self.duration, elapsed, repeated or "  (none)")
+
+
+_CURRENT: contextvars.ContextVar[Operation | None] = contextvars.ContextVar("tickets_plus_operation", default=None)
+"""The operation the running code belongs to."""
+
+
+def begin(name: str) -> Operation:
+    """Start an operation in the current context.
+
+    The caller is responsible for finishing it.
+    Prefer `tracked` where possible.
+
+    Args:
+        name: The name of the operation, used in the logs.
+
+    Returns:
+        Operation: The new operation.
+    """
+    operation = Operation(name)
+    _CURRENT.set(operation)
+    return operation
+
+
+def tracked(name: str) -> Callable[[Callable[..., Awaitable[_T]]], Callable[..., Awaitable[_T]]]:
+    """Run each call of a coroutine function as an operation.
+
+    Args:
+        name: The name of the operation, used in the logs.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(func: Callable[..., Awaitable[_T]]) -> Callable[..., Awaitable[_T]]:
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> _T:
+            operation = Operation(name)
+            token = _CURRENT.set(operation)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _CURRENT.reset(token)
+                operation.finish()
+
+        return wrapper
+
+    return decorator
+
+
+def _explain(conn: sa_engine.Connection, statement: str, parameters: Any) -> str:
+    """Get the query plan of a statement.
+
+    Uses a separate cursor, so the results of the
+    statement itself are left alone.
+
+    Args:
+        conn: The connection the statement ran on.
+        statement: The statement.
+        parameters: The parameters of the statement.
+
+    Returns:
+        str: The query plan, a row per line.
+    """
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def instrument_engine(engine: sa_asyncio.AsyncEngine, slow: float, max_statements: int, explain: bool) -> None:
+    """Attribute the statements of an engine to the current operations.
+
+    The statement times are also recorded in `tickets_plus.ext.metrics`.
+
+    Args:
+        engine: The engine to instrument.
+        slow: Seconds after which a statement is logged as slow.
+        max_statements: How many statements an operation may issue
+            before it's flagged.
+        explain: Whether to log the query plan of the statement
+            an operation is flagged on, if it's a repeated select.
+    """
+
+    def before_execute(conn: sa_engine.Connection, *_: Any) -> None:
+        conn.info.setdefault(_QUERY_START, []).append(time.perf_counter())
+
+    # pylint: disable=unused-argument,too-many-arguments,too-many-positional-arguments
+    def after_execute(conn: sa_engine.Connection, cursor: Any, statement: str, parameters: Any, context: Any,
+                      executemany: bool) -> None:
+        duration = time.perf_counter() - conn.info[_QUERY_START].pop()
+        metrics.DB_QUERY_SECONDS.observe(duration)
+        operation = _CURRENT.get()
+        name = operation.name if operation else "no operation"
+        if duration >= slow:
+            logging.warning("Slow statement in %s, %.3fs (%i parameters redacted): %s", name, duration,
+                            len(parameters or ()), statement[:_SHOWN_CHARS])
+        if operation is None:
+            return
+        operation.statements += 1
+        operation.duration += duration
+        operation.counts[statement] += 1
+        if operation.flagged or operation.statements <= max_statements:
+            return
+        operation.flagged = True
+        logging.warning("%s exceeded %i statements.", name, max_statements)
+        if explain and not executemany and operation.counts[statement] > 1 and statement.lstrip().upper().startswith(
+                "SELECT"):
+            try:
+                plan = _explain(conn, statement, parameters)
+            except Exception:  # pylint: disable=broad-exception-caught # skipcq: PYL-W0718
+                logging.debug("Failed to explain a statement of %s.", name, exc_info=True)
+            else:
+                logging.warning("Query plan of the repeated statement in %s:\n%s", name, plan)
+
+    def on_error(context: sa_engine.ExceptionContext) -> None:
+        if context.connection is not None and context.connection.info.get(_QUERY_START):
+            context.connection.info[_QUERY_START].pop()
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_execute)
+    event.listen(engine.sync_engine, "handle_error", on_error)
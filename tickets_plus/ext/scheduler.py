@@ -0,0 +1,173 @@
+"""A deadline scheduler for background tasks.
+
+Instead of polling the database every few seconds for rows
+that are due, the background tasks keep the deadlines in memory,
+and sleep exactly until the next one is due.
+The deadlines are kept in a min-heap. Rescheduling or cancelling
+a key doesn't touch the heap, outdated entries are skipped
+once they reach the top.
+
+Typical usage example:
+    ```py
+    from tickets_plus.ext import scheduler
+    deadlines = scheduler.DeadlineScheduler()
+    deadlines.schedule(key, when)
+    due = await deadlines.wait_due()
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import asyncio
+import datetime
+import heapq
+import itertools
+from typing import Dict, Generic, Hashable, List, Tuple, TypeVar
+
+_KT = TypeVar("_KT", bound=Hashable)
+
+_COMPACT_MIN = 1024
+"""The heap size below which outdated entries are never compacted."""
+
+
+def _naive_utc(when: datetime.datetime) -> datetime.datetime:
+    """Converts a datetime to naive UTC, like the database uses.
+
+    Args:
+        when: The datetime. Naive datetimes are assumed to be UTC.
+
+    Returns:
+        datetime.datetime: The naive UTC datetime.
+    """
+    if when.tzinfo is None:
+        return when
+    return when.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class DeadlineScheduler(Generic[_KT]):
+    """Keeps track of deadlines, and waits for them to be due.
+
+    Each key has at most one deadline. Scheduling a key again
+    replaces its deadline. All times are in naive UTC,
+    aware datetimes are converted.
+    A single task is expected to call `wait_due` in a loop.
+    """
+
+    def __init__(self) -> None:
+        """Initialises the empty scheduler."""
+        self._heap: List[Tuple[datetime.datetime, int, _KT]] = []
+        self._deadlines: Dict[_KT, datetime.datetime] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: _KT) -> bool:
+        return key in self._deadlines
+
+    def deadline(self, key: _KT) -> datetime.datetime | None:
+        """Get the deadline of a key.
+
+        Args:
+            key: The key.
+
+        Returns:
+            datetime.datetime | None: The deadline, or None if
+                the key is not scheduled.
+        """
+        return self._deadlines.get(key)
+
+    def schedule(self, key: _KT, when: datetime.datetime) -> None:
+        """Schedule a key, or replace its deadline.
+
+        Wakes up the waiting task if the deadline is the new earliest.
+
+        Args:
+            key: The key.
+            when: The deadline. May be in the past,
+                in which case the key is due right away.
+        """
+        when = _naive_utc(when)
+        if self._deadlines.get(key) == when:
+            return
+        if not self._heap or when < self._heap[0][0]:
+            self._wakeup.set()
+        self._deadlines[key] = when
+        heapq.heappush(self._heap, (when, next(self._counter), key))
+        if len(self._heap) > max(_COMPACT_MIN, 2 * len(self._deadlines)):
+            self._compact()
+
+    def cancel(self, key: _KT) -> None:
+        """Cancel the deadline of a key.
+
+        Does nothing if the key is not scheduled.
+
+        Args:
+            key: The key.
+        """
+        self._deadlines.pop(key, None)
+
+    def clear(self) -> None:
+        """Cancel all deadlines."""
+        self._heap.clear()
+        self._deadlines.clear()
+        self._wakeup.set()
+
+    def next_deadline(self) -> datetime.datetime | None:
+        """Get the earliest deadline.
+
+        Returns:
+            datetime.datetime | None: The earliest deadline,
+                or None if nothing is scheduled.
+        """
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self) -> List[_KT]:
+        """Take all keys that are due out of the scheduler.
+
+        Returns:
+            List[_KT]: The due keys, earliest first.
+        """
+        now = datetime.datetime.utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) == when:
+                del self._deadlines[key]
+                due.append(key)
+        return due
+
+    async def wait_due(self) -> List[_KT]:
+        """Wait until at least one key is due.
+
+        Sleeps until the earliest deadline, or until
+        an earlier one is scheduled, whichever comes first.
+
+        Returns:
+            List[_KT]: The due keys, earliest first.
+        """
+        while True:
+            self._wakeup.clear()
+            deadline = self.next_deadline()
+            timeout = None
+            if deadline is not None:
+                timeout = (deadline - datetime.datetime.utcnow()).total_seconds()
+                if timeout <= 0:
+                    return self.pop_due()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _compact(self) -> None:
+        """Drop the outdated entries from the heap."""
+        self._heap = [entry for entry in self._heap if self._deadlines.get(entry[2]) == entry[0]]
+        heapq.heapify(self._heap)
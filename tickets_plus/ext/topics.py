@@ -0,0 +1,205 @@
+"""Rate limit aware channel topic updates.
+
+Discord only allows about two topic edits per channel every 10 minutes.
+Editing the topic inline means the caller can wait for minutes
+on a rate limit. Instead, callers hand the topic they want to the
+`TopicWriter`, which only keeps the latest topic of each channel,
+and writes it in the background once the channel's budget allows.
+
+Typical usage example:
+    ```py
+    from tickets_plus.ext import topics
+    writer = topics.TopicWriter()
+    writer.set(channel, "New topic")
+    # In a background task
+    await writer.write_due()
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+
+import asyncio
+import collections
+import datetime
+import logging
+from typing import Deque, Dict, Tuple
+
+import discord
+
+from tickets_plus.ext import scheduler
+
+_WINDOW = datetime.timedelta(minutes=10)
+"""The window in which the topic edits of a channel are limited."""
+_EDITS_PER_WINDOW = 2
+"""How many topic edits a channel gets per window."""
+
+
+class TopicWriter:
+    """Coalesces channel topic updates, and writes them within the limits.
+
+    Each channel has at most one pending topic, newer topics replace it.
+    The recent edits of each channel are tracked, and a pending topic
+    is scheduled for the moment the channel can be edited again.
+    Edits older than the window are dropped once per window.
+    A single task is expected to call `write_due` in a loop.
+    """
+
+    def __init__(self) -> None:
+        """Initialises the writer, without pending topics."""
+        self._pending: Dict[int, Tuple[discord.TextChannel, str]] = {}
+        self._edits: Dict[int, Deque[datetime.datetime]] = {}
+        self._due: scheduler.DeadlineScheduler[int] = scheduler.DeadlineScheduler()
+        self._pruned = datetime.datetime.utcnow()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def topic(self, channel: discord.TextChannel) -> str | None:
+        """Get the latest topic of a channel.
+
+        Args:
+            channel: The channel.
+
+        Returns:
+            str | None: The pending topic if there is one,
+                the current topic otherwise.
+        """
+        pending = self._pending.get(channel.id)
+        return pending[1] if pending else channel.topic
+
+    def set(self, channel: discord.TextChannel, topic: str) -> None:
+        """Set the topic of a channel, as soon as possible.
+
+        Replaces the pending topic of the channel, if any.
+        Never waits, the topic is written by `write_due`.
+
+        Args:
+            channel: The channel.
+            topic: The new topic.
+        """
+        if topic == self.topic(channel):
+            return
+        self._pending[channel.id] = (channel, topic)
+        if channel.id not in self._due:
+            self._due.schedule(channel.id, self._next_slot(channel.id))
+
+    def record(self, channel_id: int) -> None:
+        """Count a topic edit of a channel.
+
+        Edits made without the writer should be counted too.
+
+        Args:
+            channel_id: The ID of the edited channel.
+        """
+        edits = self._edits.setdefault(channel_id, collections.deque(maxlen=_EDITS_PER_WINDOW))
+        edits.append(datetime.datetime.utcnow())
+
+    def forget(self, channel_id: int) -> None:
+        """Drop everything known about a channel.
+
+        Used when the channel is deleted.
+
+        Args:
+            channel_id: The ID of the channel.
+        """
+        self._pending.pop(channel_id, None)
+        self._edits.pop(channel_id, None)
+        self._due.cancel(channel_id)
+
+    async def write_due(self) -> None:
+        """Wait for pending topics to be due, and write them.
+
+        The topics are written concurrently.
+        Topics that hit a rate limit anyway are retried later,
+        unless a newer topic was set in the meantime. The client
+        raises on long rate limits, see `timeout_ratelimit`,
+        so a limited channel doesn't hold up the others.
+        Waits at most a window, so the old edits are pruned
+        even if no topic is due.
+        """
+        try:
+            due = await asyncio.wait_for(self._due.wait_due(), _WINDOW.total_seconds())
+        except asyncio.TimeoutError:
+            due = []
+        self._prune()
+        await asyncio.gather(*(self._write(channel_id) for channel_id in due))
+
+    def _prune(self) -> None:
+        """Drop the channels with no edits in the window.
+
+        Does nothing if the last prune was less than a window ago.
+        """
+        now = datetime.datetime.utcnow()
+        if now - self._pruned < _WINDOW:
+            return
+        self._pruned = now
+        self._edits = {channel_id: edits for channel_id, edits in self._edits.items() if edits[-1] > now - _WINDOW}
+
+    def _next_slot(self, channel_id: int) -> datetime.datetime:
+        """Get the earliest time a channel's topic can be edited.
+
+        Args:
+            channel_id: The ID of the channel.
+
+        Returns:
+            datetime.datetime: The time, in naive UTC.
+        """
+        now = datetime.datetime.utcnow()
+        edits = self._edits.get(channel_id)
+        if edits is None:
+            return now
+        while edits and edits[0] <= now - _WINDOW:
+            edits.popleft()
+        if not edits:
+            del self._edits[channel_id]
+            return now
+        if len(edits) < _EDITS_PER_WINDOW:
+            return now
+        return edits[0] + _WINDOW
+
+    async def _write(self, channel_id: int) -> None:
+        """Write the pending topic of a channel.
+
+        Args:
+            channel_id: The ID of the channel.
+        """
+        pending = self._pending.pop(channel_id, None)
+        if pending is None:
+            return
+        channel, topic = pending
+        if topic == channel.topic:
+            return
+        wait = self._next_slot(channel_id) - datetime.datetime.utcnow()
+        if wait > datetime.timedelta(0):
+            # Someone else edited the topic meanwhile.
+            self._retry(channel, topic, wait)
+            return
+        try:
+            await channel.edit(topic=topic)
+        except discord.RateLimited as exc:
+            self._retry(channel, topic, datetime.timedelta(seconds=exc.retry_after))
+        except discord.NotFound:
+            self.forget(channel_id)
+        except discord.HTTPException as exc:
+            if exc.status == 429:
+                self._retry(channel, topic, _WINDOW)
+            else:
+                logging.warning("Failed to set the topic of %s: %s", channel_id, exc)
+        else:
+            self.record(channel_id)
+
+    def _retry(self, channel: discord.TextChannel, topic: str, delay: datetime.timedelta) -> None:
+        """Schedule a topic again, unless it was replaced.
+
+        Args:
+            channel: The channel.
+            topic: The topic that couldn't be written.
+            delay: How long to wait before trying again.
+        """
+        self._pending.setdefault(channel.id, (channel, topic))
+        self._due.schedule(channel.id, datetime.datetime.utcnow() + delay)
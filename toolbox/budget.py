@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""This script checks how many statements the hot paths issue.
+
+Every `OnlineConfig` method, the gateway event handlers and the
+slash command handlers are run against a small seeded dataset.
+The SQL statements each of them issues are counted, and compared
+to the budget declared for it below. The commands are called
+directly with a stand-in interaction, and the staff check
+is budgeted as a case of its own.
+Budgets hold for both PostgreSQL and SQLite.
+The script exits with a non-zero status if any of them is over budget,
+so it can guard against regressions, like a new selectin relationship
+sneaking into a hot path. CI runs it on every push, on SQLite
+and PostgreSQL, see `.github/workflows/budget.yml`.
+Everything is done in a single transaction, which is rolled back at the
+end, so the database is left untouched. Commits inside of the handlers
+are turned into savepoints.
+Uses the database from the config, unless a URL is given.
+
+Typical usage example:
+    $ python3 budget.py
+    OR
+    $ poetry run budget --url sqlite+aiosqlite://
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+import argparse
+import asyncio
+import datetime
+import pathlib
+import sys
+import types
+from typing import Any, Awaitable, Callable, List, NamedTuple, Sequence
+
+import discord
+import sqlalchemy
+from discord import app_commands
+from discord.ext import commands
+from sqlalchemy import event, sql
+from sqlalchemy.ext import asyncio as sa_asyncio
+
+_PROG_DIR = pathlib.Path(__file__).parent.parent.absolute()
+sys.path.append(str(_PROG_DIR))
+
+# pylint: disable=wrong-import-position
+# pylint: disable=import-error # It works, I promise.
+from tickets_plus import bot  # isort:skip # nopep8
+from tickets_plus.cogs import events, settings, staff  # isort:skip # nopep8
+from tickets_plus.database import cache, layer, models  # isort:skip # nopep8
+from tickets_plus.database.config import MiniConfig  # isort:skip # nopep8
+
+_ID = 10**15
+"""Offset for synthetic IDs, so they don't collide with real snowflakes."""
+_GUILD = _ID + 1
+"""The seeded guild."""
+_TICKET = _ID + 2
+"""The seeded ticket channel, opened by `_USER`."""
+_THREAD = _ID + 3
+"""The staff notes thread of the seeded ticket."""
+_USER = _ID + 4
+"""The seeded user, a member of the seeded guild."""
+_ROLE = _ID + 5
+"""The seeded staff, observers and community role, and community ping."""
+_TICKET_BOT = _ID + 6
+"""The seeded ticket bot."""
+_STAFF = _ID + 7
+"""A member of the seeded guild with the staff role, only known to Discord."""
+_UNKNOWN = _ID + 99
+"""An ID nothing was seeded for."""
+_IGNORED = ("SAVEPOINT", "RELEASE", "ROLLBACK", "BEGIN", "COMMIT")
+"""Transaction control statements, which are not counted."""
+
+
+class _Env(NamedTuple):
+    """What a case gets to run with.
+
+    Attributes:
+        bot: The bot, never connected to Discord.
+        cog: The events cog of the bot.
+        staff: The staff commands cog of the bot.
+        settings: The settings commands cog of the bot.
+        db: A fresh session, closed after the case.
+    """
+
+    bot: bot.TicketsPlusBot
+    cog: events.Events
+    staff: staff.StaffCmmd
+    settings: settings.Settings
+    db: layer.OnlineConfig
+
+
+class _Case(NamedTuple):
+    """A code path, and how many statements it may issue.
+
+    Attributes:
+        name: The name of the case.
+        budget: The most statements the case may issue.
+        run: The code path.
+        prime: Run before counting, like a previous event
+            that warmed the caches.
+    """
+
+    name: str
+    budget: int
+    run: Callable[[_Env], Awaitable[Any]]
+    prime: Callable[[_Env], Awaitable[Any]] | None = None
+
+
+class _Channel(discord.TextChannel):
+    """A text channel, without a connection state. Sending does nothing."""
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, channel_id: int, guild: Any) -> None:
+        self.id = channel_id
+        self.guild = guild
+        self.name = str(channel_id)
+
+    async def send(self, *args: Any, **kwargs: Any) -> None:  # pylint: disable=arguments-differ
+        """Pretend to send a message."""
+
+
+async def _nothing(*args: Any, **kwargs: Any) -> None:
+    """Stands in for the requests to Discord.
+
+    Args:
+        *args: Ignored.
+        **kwargs: Ignored.
+    """
+    del args, kwargs
+
+
+def _guild(guild_id: int) -> Any:
+    """A stand-in guild.
+
+    Args:
+        guild_id: The ID of the guild.
+
+    Returns:
+        Any: The guild. Has no roles, and every thread exists.
+    """
+    gld = discord.Object(guild_id)
+    gld.name = str(guild_id)  # type: ignore
+    thread = discord.Object(_THREAD)
+    thread.add_user = _nothing  # type: ignore
+    gld.get_thread = lambda thread_id: thread  # type: ignore
+    return gld
+
+
+class _Member(discord.Member):
+    """A member of the seeded guild, without a connection state.
+
+    Messages sent to it go nowhere.
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, user_id: int, roles: Sequence[int] = ()) -> None:
+        self._user = types.SimpleNamespace(id=user_id,
+                                           bot=False,
+                                           name=str(user_id),
+                                           global_name=None,
+                                           display_name=str(user_id))
+        self.guild = _guild(_GUILD)
+        self.nick = None
+        self._roles = roles  # type: ignore
+        self._permissions = 0
+
+    async def send(self, *args: Any, **kwargs: Any) -> None:  # pylint: disable=arguments-differ
+        """Pretend to send a message."""
+
+
+def _role(role_id: int) -> Any:
+    """A stand-in role.
+
+    Args:
+        role_id: The ID of the role.
+
+    Returns:
+        Any: The role.
+    """
+    rle = discord.Object(role_id)
+    rle.mention = f"<@&{role_id}>"  # type: ignore
+    return rle
+
+
+def _message(channel_id: int, guild_id: int = _GUILD, content: str = "Hello", author_id: int = _USER) -> Any:
+    """A stand-in message.
+
+    Args:
+        channel_id: The ID of the channel the message was sent in.
+        guild_id: The ID of the guild the message was sent in.
+        content: The content of the message.
+        author_id: The ID of the author. Defaults to the seeded user,
+            `_STAFF` has the staff role.
+
+    Returns:
+        Any: The message.
+    """
+    msg = discord.Object(_ID)
+    msg.author = _Member(author_id, [_ROLE] if author_id == _STAFF else [])  # type: ignore
+    msg.guild = _guild(guild_id)  # type: ignore
+    msg.channel = _Channel(channel_id, msg.guild)  # type: ignore
+    msg.content = content  # type: ignore
+    msg.embeds = []  # type: ignore
+    msg.delete = _nothing  # type: ignore
+    return msg
+
+
+def _interaction(env: _Env, channel_id: int = _TICKET) -> Any:
+    """A stand-in slash command interaction, by the staff member.
+
+    Args:
+        env: The environment of the case.
+        channel_id: The ID of the channel the command was used in.
+
+    Returns:
+        Any: The interaction. Responses go nowhere.
+    """
+    interaction = discord.Object(_ID)
+    interaction.client = env.bot  # type: ignore
+    interaction.guild_id = _GUILD  # type: ignore
+    interaction.guild = _guild(_GUILD)  # type: ignore
+    interaction.channel = _Channel(channel_id, interaction.guild)  # type: ignore
+    interaction.user = _Member(_STAFF, [_ROLE])  # type: ignore
+    interaction.response = interaction.followup = types.SimpleNamespace(defer=_nothing, send=_nothing)  # type: ignore
+    return interaction
+
+
+async def _application_info() -> Any:
+    """Stands in for the application info, owned by someone else.
+
+    Returns:
+        Any: The application info.
+    """
+    return types.SimpleNamespace(owner=discord.Object(_UNKNOWN), team=None)
+
+
+async def _anonymous_ticket(env: _Env) -> None:
+    """Make the seeded ticket anonymous, and load the ticket index.
+
+    Args:
+        env: The environment of the case.
+    """
+    await env.db.update_ticket(_TICKET, anonymous=True)
+    await env.db.commit()
+    await env.db.load_ticket_index()
+
+
+async def _open_ticket(env: _Env) -> None:
+    """Open the seeded ticket again, if a case closed it.
+
+    Args:
+        env: The environment of the case.
+    """
+    await env.db.get_ticket(_TICKET, _GUILD, _USER, _THREAD)
+    await env.db.commit()
+
+
+_CASES = [
+    # OnlineConfig, with cold caches
+    _Case("get_guild", 1, lambda env: env.db.get_guild(_GUILD)),
+    _Case("get_guild (cached)", 0, lambda env: env.db.get_guild(_GUILD), lambda env: env.db.get_guild(_GUILD)),
+    _Case("get_guild (new)", 2, lambda env: env.db.get_guild(_UNKNOWN)),
+    _Case("fetch_guild", 1, lambda env: env.db.fetch_guild(_GUILD)),
+    _Case("fetch_guild (unknown)", 1, lambda env: env.db.fetch_guild(_UNKNOWN)),
+    _Case("get_user", 1, lambda env: env.db.get_user(_USER)),
+    _Case("fetch_member", 1, lambda env: env.db.fetch_member(_USER, _GUILD)),
+    _Case("get_member", 1, lambda env: env.db.get_member(_USER, _GUILD)),
+    _Case("clear_expired_statuses", 1, lambda env: env.db.clear_expired_statuses(500)),
+    _Case("get_status_deadlines", 1, lambda env: env.db.get_status_deadlines()),
+    _Case("get_ticket_bot", 1, lambda env: env.db.get_ticket_bot(_TICKET_BOT, _GUILD)),
+    _Case("check_ticket_bot", 1, lambda env: env.db.check_ticket_bot(_TICKET_BOT, _GUILD)),
+    _Case("get_ticket_bot_ids", 1, lambda env: env.db.get_ticket_bot_ids(_GUILD)),
+    _Case("get_ticket_type", 1, lambda env: env.db.get_ticket_type(_GUILD, "ticket-")),
+    _Case("get_ticket_types", 2, lambda env: env.db.get_ticket_types(_GUILD)),
+    _Case("fetch_ticket", 1, lambda env: env.db.fetch_ticket(_TICKET)),
+    _Case("fetch_ticket_record", 1, lambda env: env.db.fetch_ticket_record(_TICKET)),
+    _Case("fetch_ticket_record (indexed)", 0, lambda env: env.db.fetch_ticket_record(_TICKET),
+          lambda env: env.db.load_ticket_index()),
+    _Case("fetch_thread_record", 1, lambda env: env.db.fetch_thread_record(_THREAD)),
+    _Case("update_ticket", 1, lambda env: env.db.update_ticket(_TICKET, notified=True)),
+    _Case("set_notified", 1, lambda env: env.db.set_notified([_TICKET])),
+    _Case("update_responses", 1, lambda env: env.db.update_responses({_TICKET: datetime.datetime.utcnow()})),
+    _Case("get_ticket", 1, lambda env: env.db.get_ticket(_TICKET, _GUILD, _USER)),
+    _Case("load_ticket_index", 2, lambda env: env.db.load_ticket_index()),
+    _Case("get_pending_tickets", 1, lambda env: env.db.get_pending_tickets()),
+    _Case("get_warning_deadlines", 1, lambda env: env.db.get_warning_deadlines(_GUILD)),
+    _Case("fetch_tag", 1, lambda env: env.db.fetch_tag(_GUILD, "tag")),
+    _Case("get_tag", 1, lambda env: env.db.get_tag(_GUILD, "tag", "Description")),
+    _Case("get_tags", 2, lambda env: env.db.get_tags(_GUILD)),
+    _Case("get_tags (unknown guild)", 1, lambda env: env.db.get_tags(_UNKNOWN)),
+    _Case("get_staff_role (new)", 3, lambda env: env.db.get_staff_role(_UNKNOWN, _GUILD)),
+    _Case("get_staff_role", 1, lambda env: env.db.get_staff_role(_ROLE, _GUILD)),
+    _Case("get_all_staff_roles", 2, lambda env: env.db.get_all_staff_roles(_GUILD)),
+    _Case("get_staff_role_ids", 1, lambda env: env.db.get_staff_role_ids(_GUILD)),
+    _Case("check_staff_role", 1, lambda env: env.db.check_staff_role(_ROLE)),
+    _Case("get_observers_role", 1, lambda env: env.db.get_observers_role(_ROLE, _GUILD)),
+    _Case("get_all_observers_roles", 2, lambda env: env.db.get_all_observers_roles(_GUILD)),
+    _Case("check_observers_role", 1, lambda env: env.db.check_observers_role(_ROLE)),
+    _Case("get_community_role", 1, lambda env: env.db.get_community_role(_ROLE, _GUILD)),
+    _Case("get_all_community_roles", 2, lambda env: env.db.get_all_community_roles(_GUILD)),
+    _Case("check_community_role", 1, lambda env: env.db.check_community_role(_ROLE)),
+    _Case("get_community_ping", 1, lambda env: env.db.get_community_ping(_ROLE, _GUILD)),
+    _Case("get_all_community_pings", 2, lambda env: env.db.get_all_community_pings(_GUILD)),
+    _Case("check_community_ping", 1, lambda env: env.db.check_community_ping(_ROLE)),
+    # Gateway events, with the ticket index loaded at startup
+    _Case("on_message (non-ticket channel)", 0, lambda env: env.cog.on_message(_message(_UNKNOWN)),
+          lambda env: env.db.load_ticket_index()),
+    _Case("on_message (unindexed guild)", 0, lambda env: env.cog.on_message(_message(_UNKNOWN, _UNKNOWN)),
+          lambda env: env.db.load_ticket_index()),
+    _Case("on_message (anonymous ticket, opener)", 1, lambda env: env.cog.on_message(_message(_TICKET)),
+          _anonymous_ticket),
+    _Case("on_message (anonymous ticket, staff)", 2,
+          lambda env: env.cog.on_message(_message(_TICKET, author_id=_STAFF)), _anonymous_ticket),
+    _Case("on_guild_channel_create (no ticket bots)", 1,
+          lambda env: env.cog.on_channel_create(_Channel(_UNKNOWN, _guild(_UNKNOWN)))),
+    _Case("on_guild_channel_delete (non-ticket channel)", 0,
+          lambda env: env.cog.on_channel_delete(_Channel(_UNKNOWN, _guild(_GUILD))),
+          lambda env: env.db.load_ticket_index()),
+    _Case("on_guild_channel_delete (ticket channel)", 2,
+          lambda env: env.cog.on_channel_delete(_Channel(_TICKET, _guild(_GUILD))),
+          lambda env: env.db.load_ticket_index()),
+    _Case("on_member_join (no status)", 1, lambda env: env.cog.on_member_join(_Member(_UNKNOWN))),
+    # Slash commands, last as they change the seeded rows
+    _Case("staff check", 1, lambda env: staff.StaffCmmd.respond.checks[0](_interaction(env))),
+    _Case("/respond", 1, lambda env: staff.StaffCmmd.respond.callback(env.staff, _interaction(env), "Hello"),
+          _open_ticket),
+    _Case("/join", 1, lambda env: staff.StaffCmmd.join.callback(env.staff, _interaction(env)), _open_ticket),
+    _Case("/anonymize", 2, lambda env: staff.StaffCmmd.anonymize.callback(env.staff, _interaction(env)), _open_ticket),
+    _Case(
+        "/register", 3, lambda env: staff.StaffCmmd.register.callback(env.staff, _interaction(env, _UNKNOWN),
+                                                                      discord.Object(_UNKNOWN))),
+    _Case(
+        "/usrstatus", 1, lambda env: staff.StaffCmmd.usrstatus.callback(env.staff, _interaction(env), _Member(_USER),
+                                                                        app_commands.Choice(name="None", value=0))),
+    _Case("/settings autocomplete", 2, lambda env: env.settings.ticket_types_autocomplete(_interaction(env), "")),
+    _Case("/settings ticketbot", 3,
+          lambda env: settings.Settings.change_tracked.callback(env.settings, _interaction(env), _Member(_UNKNOWN))),
+    _Case("/settings staff", 3,
+          lambda env: settings.Settings.change_staff.callback(env.settings, _interaction(env), _role(_UNKNOWN))),
+    _Case("/settings observers", 3,
+          lambda env: settings.Settings.change_observers.callback(env.settings, _interaction(env), _role(_UNKNOWN))),
+    _Case(
+        "/settings communitysupport", 3, lambda env: settings.Settings.change_community_roles.callback(
+            env.settings, _interaction(env), _role(_UNKNOWN))),
+    _Case(
+        "/settings communityping", 3, lambda env: settings.Settings.change_community_ping_roles.callback(
+            env.settings, _interaction(env), _role(_UNKNOWN))),
+    _Case("/settings openmsg", 2,
+          lambda env: settings.Settings.change_openmsg.callback(env.settings, _interaction(env), "Notes")),
+    _Case(
+        "/settings penrole", 2, lambda env: settings.Settings.change_penrole.callback(
+            env.settings, _interaction(env), _role(_ROLE), app_commands.Choice(name="Support Block", value=0))),
+    _Case("/settings staffteamname", 2,
+          lambda env: settings.Settings.change_staffteamname.callback(env.settings, _interaction(env), "Staff")),
+    _Case(
+        "/settings timings", 3, lambda env: settings.Settings.change_autoclose.callback(
+            env.settings, _interaction(env), app_commands.Choice(name="Ticket Close Warning", value=2), hours=1)),
+    _Case(
+        "/settings toggle", 2, lambda env: settings.Settings.toggle_value.callback(
+            env.settings, _interaction(env), app_commands.Choice(name="Message Discovery", value=0))),
+    _Case("/settings tickettype", 3,
+          lambda env: settings.Settings.create_ticket_type.callback(env.settings, _interaction(env), "other-")),
+    _Case(
+        "/settings edittickettype", 1, lambda env: settings.Settings.edit_ticket_type.callback(
+            env.settings, _interaction(env), "ticket-", comping=True)),
+]
+"""The cases, and their budgets."""
+
+
+async def _seed(conn: sa_asyncio.AsyncConnection) -> None:
+    """Seeds a guild with a ticket and a row in every table.
+
+    Args:
+        conn: The connection to seed with.
+    """
+    await conn.execute(sql.insert(models.Guild).values(guild_id=_GUILD))
+    await conn.execute(sql.insert(models.User).values(user_id=_USER))
+    await conn.execute(sql.insert(models.Member).values(user_id=_USER, guild_id=_GUILD))
+    await conn.execute(
+        sql.insert(models.Ticket).values(channel_id=_TICKET,
+                                         guild_id=_GUILD,
+                                         user_id=_USER,
+                                         staff_note_thread=_THREAD,
+                                         date_created=datetime.datetime.utcnow(),
+                                         last_response=datetime.datetime.utcnow()))
+    await conn.execute(sql.insert(models.TicketBot).values(user_id=_TICKET_BOT, guild_id=_GUILD))
+    await conn.execute(sql.insert(models.TicketType).values(prefix="ticket-", guild_id=_GUILD))
+    await conn.execute(sql.insert(models.Tag).values(tag_name="tag", guild_id=_GUILD, description="Synthetic tag"))
+    for table in (models.StaffRole, models.ObserversRole, models.CommunityRole, models.CommunityPing):
+        await conn.execute(sql.insert(table).values(role_id=_ROLE, guild_id=_GUILD))
+
+
+async def throwaway(engine: sa_asyncio.AsyncEngine) -> List[str]:
+    """Runs everything that needs async.
+
+    This is a throwaway function to run the async stuff.
+    The transaction is always rolled back.
+
+    Args:
+        engine: The engine to connect with.
+
+    Returns:
+        List[str]: The names of the cases over budget.
+    """
+    counted: List[str] = []
+
+    # pylint: disable=unused-argument,too-many-arguments,too-many-positional-arguments
+    def count(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        if not statement.lstrip().upper().startswith(_IGNORED):
+            counted.append(statement)
+
+    over = []
+    bot_instance = bot.TicketsPlusBot(db_engine=engine,
+                                      intents=discord.Intents.none(),
+                                      command_prefix=commands.when_mentioned)
+    # Never connected, so the owners are not known
+    bot_instance.application_info = _application_info  # type: ignore
+    cog = events.Events(bot_instance)
+    staff_cog = staff.StaffCmmd(bot_instance)
+    settings_cog = settings.Settings(bot_instance)
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            if conn.dialect.name == "postgresql":
+                await conn.execute(sqlalchemy.schema.CreateSchema("tickets_plus", if_not_exists=True))
+            await conn.run_sync(models.Base.metadata.create_all)
+            await _seed(conn)
+            bot_instance.sessions = sa_asyncio.async_sessionmaker(conn,
+                                                                  expire_on_commit=False,
+                                                                  join_transaction_mode="create_savepoint")
+            event.listen(engine.sync_engine, "before_cursor_execute", count)
+            print(f"{'Case':<50} {'Used':>4} {'Budget':>6}")
+            for case in _CASES:
+                bot_instance.guild_cache.clear()
+                bot_instance.ticket_bot_cache.clear()
+                bot_instance.staff_role_cache.clear()
+                bot_instance.ticket_index = cache.TicketIndex(cache.GuildFeature.MSG_DISCOVERY)
+                if case.prime is not None:
+                    async with bot_instance.get_connection() as db:
+                        await case.prime(_Env(bot_instance, cog, staff_cog, settings_cog, db))
+                counted.clear()
+                async with bot_instance.get_connection() as db:
+                    await case.run(_Env(bot_instance, cog, staff_cog, settings_cog, db))
+                status = "OK" if len(counted) <= case.budget else "OVER"
+                print(f"{case.name:<50} {len(counted):>4} {case.budget:>6} {status}")
+                if status == "OVER":
+                    over.append(case.name)
+                    for statement in counted:
+                        print(f"    {' '.join(statement.split())[:200]}")
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", count)
+            await trans.rollback()
+            print("\nRolled back. Exiting...")
+    await engine.dispose()
+    return over
+
+
+def main():
+    """Counts the statements of the hot paths, and checks their budgets.
+
+    Exits with status 1 if any of them is over budget.
+    """
+    parser = argparse.ArgumentParser(description="Check the statement budgets of the hot paths.")
+    parser.add_argument("--url", default=None, help="Database URL to use instead of the configured one.")
+    args = parser.parse_args()
+    url = args.url or MiniConfig().get_url()
+    if sqlalchemy.make_url(url).get_backend_name() == "sqlite":
+        # SQLite has no schemas.
+        engine = sa_asyncio.create_async_engine(url, execution_options={"schema_translate_map": {"tickets_plus": None}})
+    else:
+        engine = sa_asyncio.create_async_engine(url)
+    over = asyncio.run(throwaway(engine))
+    if over:
+        print(f"{len(over)} of {len(_CASES)} cases over budget: {', '.join(over)}")
+        sys.exit(1)
+    print(f"All {len(_CASES)} cases within budget.")
+
+
+if __name__ == "__main__":
+    main()
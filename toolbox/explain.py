@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""This script will print the query plans of the routine queries.
+
+It seeds a large synthetic dataset and runs EXPLAIN ANALYZE on the
+queries used by the routines and the hot paths, first without and then
+with the indexes declared in the models.
+Everything is done in a single transaction, which is rolled back at the
+end, so the database is left untouched.
+Only PostgreSQL is supported. As dropping the indexes locks the tables
+until the rollback, this should only be used in development.
+
+Typical usage example:
+    $ python3 explain.py --rows 1000000
+    OR
+    $ poetry run explain --rows 1000000
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2021-present The Tickets+ Contributors
+# This Source Code may also be made available under the following
+# Secondary Licenses when the conditions for such availability set forth
+# in the Eclipse Public License, v. 2.0 are satisfied: GPL-3.0-only OR
+# If later approved by the Initial Contributor, GPL-3.0-or-later.
+import argparse
+import asyncio
+import datetime
+import pathlib
+import sys
+from typing import Dict
+
+import sqlalchemy
+from sqlalchemy import sql
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext import asyncio as sa_asyncio
+
+_PROG_DIR = pathlib.Path(__file__).parent.parent.absolute()
+sys.path.append(str(_PROG_DIR))
+
+# pylint: disable=wrong-import-position
+# pylint: disable=import-error # It works, I promise.
+from tickets_plus.database import layer, models  # isort:skip # nopep8
+from tickets_plus.database.config import MiniConfig  # isort:skip # nopep8
+
+_ROWS_PER_GUILD = 100
+"""How many tickets and members each synthetic guild gets."""
+_GUILD_OFFSET = 10**15
+"""Offset for synthetic IDs, so they don't collide with real snowflakes."""
+_STATUS_CHUNK = 500
+"""How many expired statuses the status cleanup clears per statement."""
+
+
+def _queries(guild_id: int) -> Dict[str, sql.Executable]:
+    """The queries to explain.
+
+    The routine queries are built by `tickets_plus.database.layer`,
+    so they are the statements the bot sends.
+
+    Args:
+        guild_id: The guild to use for the guild-scoped lookups.
+
+    Returns:
+        Dict[str, sql.Executable]: The queries, keyed by a readable name.
+    """
+    now = datetime.datetime.utcnow()
+    # A chunk of members, only the shape of the keys matters for the plan.
+    keys = [(_GUILD_OFFSET + num * 100, guild_id) for num in range(1, _STATUS_CHUNK + 1)]
+    return {
+        "expired statuses": layer.expired_statuses_query(now, _STATUS_CHUNK, skip_locked=True),
+        "clear statuses": layer.clear_statuses_stmt(keys, now),
+        "pending tickets": layer.pending_tickets_query(),
+        "warning deadlines": layer.warning_deadlines_query(),
+        "ticket bots by guild": sql.select(models.TicketBot).where(models.TicketBot.guild_id == guild_id),
+        "ticket types by guild": sql.select(models.TicketType).where(models.TicketType.guild_id == guild_id),
+        "staff roles by guild": sql.select(models.StaffRole).where(models.StaffRole.guild_id == guild_id),
+        "community roles by guild": sql.select(models.CommunityRole).where(models.CommunityRole.guild_id == guild_id),
+        "tags by guild": sql.select(models.Tag).where(models.Tag.guild_id == guild_id),
+    }
+
+
+async def _seed(conn: sa_asyncio.AsyncConnection, rows: int) -> None:
+    """Seeds the synthetic dataset.
+
+    Creates one guild per _ROWS_PER_GUILD rows, every tenth of them
+    with autoclose warnings enabled. Then creates the tickets, users
+    and members. About one percent of the members are blocked, and
+    about two percent of the tickets are not notified yet.
+    A handful of roles, ticket bots, ticket types and tags
+    are created for every guild.
+
+    Args:
+        conn: The connection to seed with.
+        rows: The number of tickets and members to create.
+    """
+    guilds = max(rows // _ROWS_PER_GUILD, 1)
+    offset = sql.literal(_GUILD_OFFSET, sqlalchemy.BigInteger())
+    hour = sql.literal_column("INTERVAL '1 hour'", sqlalchemy.Interval())
+    ser = sql.func.generate_series(1, guilds).table_valued("n").render_derived()
+    await conn.execute(
+        sql.insert(models.Guild).from_select(["guild_id", "warn_autoclose"],
+                                             sql.select(offset + ser.c.n,
+                                                        sql.case((ser.c.n % 10 == 0, hour * 24), else_=None))))
+    for table in (models.StaffRole, models.ObserversRole, models.CommunityRole, models.CommunityPing):
+        ser = sql.func.generate_series(1, guilds * 5).table_valued("n").render_derived()
+        await conn.execute(
+            sql.insert(table).from_select(["role_id", "guild_id"],
+                                          sql.select(offset + ser.c.n, offset + 1 + ser.c.n % guilds)))
+    ser = sql.func.generate_series(1, guilds * 5).table_valued("n").render_derived()
+    guild_id = offset + 1 + ser.c.n % guilds
+    name = sql.cast(ser.c.n, models.Tag.tag_name.type)
+    bot_id = offset + ser.c.n
+    await conn.execute(sql.insert(models.TicketBot).from_select(["user_id", "guild_id"], sql.select(bot_id, guild_id)))
+    await conn.execute(sql.insert(models.TicketType).from_select(["prefix", "guild_id"], sql.select(name, guild_id)))
+    await conn.execute(
+        sql.insert(models.Tag).from_select(["tag_name", "guild_id", "description"],
+                                           sql.select(name, guild_id, sql.literal("Synthetic tag"))))
+    ser = sql.func.generate_series(1, rows).table_valued("n").render_derived()
+    await conn.execute(sql.insert(models.User).from_select(["user_id"], sql.select(offset + ser.c.n)))
+    await conn.execute(
+        sql.insert(models.Member).from_select(["user_id", "guild_id", "status", "status_till"],
+                                              sql.select(
+                                                  offset + ser.c.n,
+                                                  offset + 1 + ser.c.n % guilds,
+                                                  sql.case((ser.c.n % 100 == 0, 1), else_=0),
+                                                  sql.case((ser.c.n % 200 == 0, models.UTCnow()), else_=None),
+                                              )))
+    await conn.execute(
+        sql.insert(models.Ticket).from_select(["channel_id", "guild_id", "user_id", "last_response", "notified"],
+                                              sql.select(
+                                                  offset + ser.c.n,
+                                                  offset + 1 + ser.c.n % guilds,
+                                                  offset + ser.c.n,
+                                                  models.UTCnow() - hour * (ser.c.n % 72),
+                                                  ser.c.n % 50 != 0,
+                                              )))
+    for table in models.Base.metadata.sorted_tables:
+        await conn.execute(sql.text(f"ANALYZE {table.schema}.{table.name}"))
+
+
+async def _explain(conn: sa_asyncio.AsyncConnection, title: str) -> None:
+    """Prints the query plans of all queries.
+
+    Each query runs in a savepoint that is rolled back,
+    as EXPLAIN ANALYZE executes the updates.
+
+    Args:
+        conn: The connection to explain with.
+        title: The heading to print above the plans.
+    """
+    print(f"\n{'=' * 20} {title} {'=' * 20}")
+    for name, query in _queries(_GUILD_OFFSET + 1).items():
+        compiled = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+        savepoint = await conn.begin_nested()
+        try:
+            plan = (await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}")).scalars().all()
+        finally:
+            await savepoint.rollback()
+        print(f"\n--- {name} ---")
+        for line in plan:
+            print(line)
+
+
+async def throwaway(engine: sa_asyncio.AsyncEngine, rows: int) -> None:
+    """Runs everything that needs async.
+
+    This is a throwaway function to run the async stuff.
+    The transaction is always rolled back.
+
+    Args:
+        engine: The engine to connect with.
+        rows: The number of tickets and members to seed.
+    """
+    indexes = [idx for table in models.Base.metadata.sorted_tables for idx in table.indexes]
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            print(f"Seeding {rows} rows...")
+            await _seed(conn, rows)
+            for idx in indexes:
+                await conn.execute(sql.text(f"DROP INDEX IF EXISTS {idx.table.schema}.{idx.name}"))
+            await _explain(conn, "WITHOUT INDEXES")
+            for idx in indexes:
+                await conn.run_sync(idx.create)
+            for table in {idx.table for idx in indexes}:
+                await conn.execute(sql.text(f"ANALYZE {table.schema}.{table.name}"))
+            await _explain(conn, "WITH INDEXES")
+        finally:
+            await trans.rollback()
+            print("\nRolled back. Exiting...")
+    await engine.dispose()
+
+
+def main():
+    """Seeds a synthetic dataset and explains the routine queries.
+
+    The dataset is rolled back at the end.
+    """
+    parser = argparse.ArgumentParser(description="Explain the routine queries on a synthetic dataset.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of tickets and members to seed.")
+    args = parser.parse_args()
+    engine = sa_asyncio.create_async_engine(MiniConfig().get_url())
+    if engine.dialect.name != "postgresql":
+        print("Only PostgreSQL is supported. Aborting.")
+        return
+    asyncio.run(throwaway(engine, args.rows))
+
+
+if __name__ == "__main__":
+    main()